@@ -1,16 +1,18 @@
-import os
 import streamlit as st
 import pandas as pd
 import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
-from dotenv import load_dotenv
-from pymongo import MongoClient
 import random
 import datetime
 
-load_dotenv()
+import data_layer
+from database import pool_stats
+from live_view import LiveView
+
+# Seconds between refreshes of the live tabs
+LIVE_REFRESH_SECONDS = 2
 
 # Set page configuration
 st.set_page_config(
@@ -20,22 +22,17 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Database setup and connection
-client = MongoClient(os.getenv("MONGO_URI"))
-db = client["smartbin"]
 
-# Collections
-dustbin_col = db["dustbins"]
-notification_col = db["notification"]
-collect_rubbish_col = db["collectRubbish"]
-useraccount_col = db["userAccount"]
-rubbish_col = db["rubbish"]
+@st.cache_resource
+def get_live_view() -> LiveView:
+    """One live view per server process, shared by all sessions"""
+    view = LiveView().start()
+    # Give the first snapshot a moment, once; until it is loaded the live tabs fall back to cached reads
+    view.wait_ready(timeout=5)
+    return view
+
 
-dustbin_df = pd.DataFrame(list(dustbin_col.find()))
-notification_df = pd.DataFrame(list(notification_col.find()))
-collect_rubbish_df = pd.DataFrame(list(collect_rubbish_col.find()))
-useraccount_df = pd.DataFrame(list(useraccount_col.find()))
-rubbish_df = pd.DataFrame(list(rubbish_col.find()))
+live_view = get_live_view()
 
 # Sidebar
 st.sidebar.title("Admin Controls")
@@ -60,19 +57,21 @@ with st.sidebar.form("new_address_form"):
     if submit_button:
         if new_location and new_dustbin_id:
             # Optional: Prevent duplicates
-            if (dustbin_col.find_one({"dustbin_id": new_dustbin_id}) or dustbin_col.find_one({"location": new_location})):
+            if not data_layer.add_dustbin(new_dustbin_id, new_location, new_status):
                 st.warning("Dustbin ID already exists!")
             else:
-                dustbin_col.insert_one({
-                    "dustbin_id": new_dustbin_id,
-                    "status": new_status,
-                    "location": new_location
-                })
                 st.success("New dustbin location added successfully!")
                 st.rerun()
         else:
             st.error("Please fill in both Dustbin ID and Location.")
 
+# Sidebar - Shared database client health
+with st.sidebar.expander("Database Connection Pool"):
+    st.json(pool_stats())
+
+with st.sidebar.expander("Live Updates"):
+    st.json(live_view.stats())
+
 # Main dashboard
 st.title("🗑️ Waste Management Admin Dashboard")
 
@@ -82,7 +81,13 @@ st.markdown("---")
 tab1, tab2, tab3, tab4, tab5 = st.tabs(["Dustbin Location", "Notifications", "Reward Calculator", "History", "Smartbin Installation Order"])
 
 # Tab 1: Address List
-with tab1:
+@st.fragment(run_every=LIVE_REFRESH_SECONDS)
+def show_dustbins(statuses):
+    # Patched in memory by the live view's change feed; filtered without a query
+    if live_view.ready:
+        dustbin_df = live_view.dustbins(statuses)
+    else:
+        dustbin_df = data_layer.load_dustbins(statuses)
 
     if not dustbin_df.empty:
         # Optional formatting
@@ -100,44 +105,44 @@ with tab1:
 
         # Display full bins
         st.subheader("⚠️ Full Dustbins")
-        # Apply status filter (Empty, Half, Full)
-        if status_filter:
-            full_bins = full_bins[full_bins['Status'].isin(status_filter)]
         st.dataframe(full_bins[['Dustbin ID', 'Location', 'Status']], use_container_width=True)
 
         # Display
         st.subheader("♻ Recycle Waste")
-        if status_filter:
-            recycle_bins = recycle_bins[recycle_bins['Status'].isin(status_filter)]
         st.dataframe(recycle_bins[['Dustbin ID', 'Location', 'Status']], use_container_width=True)
 
         # Display 
         st.subheader("✅ Normal Waste")
-        if status_filter:
-            waste_bins = waste_bins[waste_bins['Status'].isin(status_filter)]
         st.dataframe(waste_bins[['Dustbin ID', 'Location', 'Status']], use_container_width=True)
         
     else:
         st.info("No dustbin records found in database.")
 
+
 # Tab 2: Notifications
-with tab2:
+@st.fragment(run_every=LIVE_REFRESH_SECONDS)
+def show_notifications():
     st.header("Notifications")
     
-    if not notification_df.empty:
-        # Display notifications
-        uncollected_df = notification_df[notification_df['isCollected'] == False]
-
-        if not uncollected_df.empty:
-            st.subheader("Notification Records")
-            display_df = uncollected_df.copy()
-            display_df = display_df.drop(['_id', 'isCollected'], axis=1, errors='ignore')
-            display_df.columns = ['Dustbin ID', 'Location', 'Time', 'Notification Type']
-            st.dataframe(display_df, use_container_width=True)
-        else:
-            st.info("All recycle items have been collected.")
+    # Only uncollected notifications are kept in the live view
+    if live_view.ready:
+        display_df = live_view.uncollected_notifications()
+    else:
+        display_df = data_layer.load_uncollected_notifications()
+
+    if not display_df.empty:
+        st.subheader("Notification Records")
+        display_df.columns = ['Dustbin ID', 'Location', 'Time', 'Notification Type']
+        st.dataframe(display_df, use_container_width=True)
     else:
-        st.info("No notifications available.")
+        st.info("All recycle items have been collected.")
+
+
+with tab1:
+    show_dustbins(status_filter)
+
+with tab2:
+    show_notifications()
 
 # Tab 3: Recycling Calculator
 with tab3:
@@ -151,6 +156,7 @@ with tab3:
     chart_data = []
     updated_prices = {}
 
+    rubbish_df = data_layer.load_rubbish_types()
     if not rubbish_df.empty:
         for index, row in rubbish_df.iterrows():
             rubbish_type = row["type"]
@@ -191,11 +197,7 @@ with tab3:
 
         # Submit Button for MongoDB update
         if st.button("Submit Price Updates"):
-            for rubbish_type, new_price in updated_prices.items():
-                rubbish_col.update_one(
-                    {"type": rubbish_type},
-                    {"$set": {"price": new_price}}
-                )
+            data_layer.update_prices(updated_prices)
             st.success("Prices updated successfully.")
     else:
         st.info("No rubbish types available.")
@@ -204,65 +206,36 @@ with tab3:
     st.subheader("Calculation Results")
     st.info(f"**Total Weight**: {total_weight:.2f} kg\n\n**Total Value**: ${total_value:.2f}")
 
-    if not useraccount_df.empty and not notification_df.empty:
-        # Step 1: Get uncollected dustbin IDs from notifications
-        uncollected_dustbins = notification_df[notification_df["isCollected"] == False]["dustbin_id"].unique()
-
-        # Step 2: Filter user accounts whose dustbin_id is in the uncollected list
-        filtered_users = useraccount_df[useraccount_df["dustbin_id"].isin(uncollected_dustbins)]
-
-        if not filtered_users.empty:
-            with st.form("reward_form"):
-                # Dropdown with filtered owner names
-                owner_names = filtered_users["owner_name"].tolist()
-                selected_owner = st.selectbox("Select Owner", ["-- Select Owner --"] + owner_names)
-
-                # Show total value to be added
-                st.markdown(f"**Total Reward to Add**: ${total_value:.2f}")
-
-                # Submit button (MUST be inside the form)
-                submitted = st.form_submit_button("Submit Reward")
-
-                if submitted and selected_owner != "-- Select Owner --":
-                    # Fetch user from MongoDB and update total_reward
-                    user_doc = useraccount_col.find_one({"owner_name": selected_owner})
-                    if user_doc:
-                        current_reward = user_doc.get("total_reward", 0)
-                        new_reward = current_reward + total_value
-
-                        useraccount_col.update_one(
-                            {"owner_name": selected_owner},
-                            {"$set": {"total_reward": new_reward}}
-                        )
-
-                        notification_col.update_one(
-                            {"dustbin_id": user_doc["dustbin_id"], "isCollected": False},
-                            {"$set": {"isCollected": True}}
-                        )
-
-                        dustbin_col.update_one(
-                            {"dustbin_id": user_doc["dustbin_id"]},
-                            {"$set": {"status": 'Empty'}}
-                        )
-
-                        for entry in chart_data:
-                            collect_rubbish_col.insert_one({
-                                "dustbin_id": user_doc["dustbin_id"],
-                                "timestamp": datetime.datetime.now(),
-                                "rubbish_type": entry["Rubbish Type"],
-                                "weight": entry["Weight (kg)"],
-                                "price": entry["Value ($)"]
-                            })
-
+    # Owners of dustbins with uncollected notifications, joined on the server
+    filtered_users = data_layer.users_with_uncollected_bins()
+
+    if not filtered_users.empty:
+        with st.form("reward_form"):
+            # Dropdown with filtered owner names
+            owner_names = filtered_users["owner_name"].tolist()
+            selected_owner = st.selectbox("Select Owner", ["-- Select Owner --"] + owner_names)
+
+            # Show total value to be added
+            st.markdown(f"**Total Reward to Add**: ${total_value:.2f}")
+
+            # Submit button (MUST be inside the form)
+            submitted = st.form_submit_button("Submit Reward")
+
+            if submitted and selected_owner != "-- Select Owner --":
+                # Update total_reward, close the notification and record the collection
+                try:
+                    new_reward = data_layer.settle_reward(selected_owner, total_value, chart_data)
+                except Exception as e:
+                    st.error(f"Reward could not be settled: {e}")
+                else:
+                    if new_reward is not None:
                         st.success(f"Reward of ${total_value:.2f} added to {selected_owner}. New Total: ${new_reward:.2f}")
                     else:
                         st.error("Selected owner not found in database.")
-                elif submitted:
-                    st.warning("Please select an owner before submitting.")
-        else:
-            st.info("No matching users found with uncollected dustbins.")
+            elif submitted:
+                st.warning("Please select an owner before submitting.")
     else:
-        st.info("No user accounts or notifications available.")
+        st.info("No matching users found with uncollected dustbins.")
 
     if chart_data:
         chart_df = pd.DataFrame(chart_data)
@@ -281,19 +254,21 @@ with tab4:
     st.header("Recycle History")
     
     col1, col2 = st.columns(2)
-    
-    if not collect_rubbish_df.empty:
-        # Show full collection history
+
+    total_records = data_layer.count_collection_history()
+    if total_records:
+        # Show one page of the collection history, newest first
         st.subheader("Collection Records")
-        display_df = collect_rubbish_df.copy()
-        display_df = display_df.drop(['_id', 'image'], axis=1, errors='ignore')
+        page_count = (total_records - 1) // data_layer.HISTORY_PAGE_SIZE + 1
+        page = st.number_input(f"Page (of {page_count})", min_value=1, max_value=page_count, value=1, step=1)
+        display_df = data_layer.load_collection_history(page - 1)
         display_df.columns = ['Dustbin ID', 'Time', 'Rubbish Type', 'Weight (kg)', 'Price (RM)']
         st.dataframe(display_df, use_container_width=True)
 
         # Rubbish type weight summary
         st.subheader("Total Weight by Rubbish Type")
 
-        weight_summary = collect_rubbish_df.groupby("rubbish_type")["weight"].sum().reset_index()
+        weight_summary = data_layer.collection_totals_by_type()[["rubbish_type", "weight"]]
         weight_summary.columns = ["Rubbish Type", "Total Weight (kg)"]
 
         fig = px.bar(
@@ -307,6 +282,27 @@ with tab4:
         fig.update_traces(texttemplate='%{text:.2s}', textposition='outside')
         fig.update_layout(uniformtext_minsize=8, uniformtext_mode='hide')
         st.plotly_chart(fig, use_container_width=True)
+
+        with col1:
+            # Weight collected per period and rubbish type
+            period = st.selectbox("Period", data_layer.PERIOD_UNITS, index=2)
+            period_summary = data_layer.collection_totals_by_period(period)
+            period_summary.columns = ["Period", "Rubbish Type", "Weight (kg)", "Value (RM)"]
+            fig = px.bar(
+                period_summary,
+                x="Period",
+                y="Weight (kg)",
+                color="Rubbish Type",
+                title=f"Weight Collected per {period.capitalize()}"
+            )
+            st.plotly_chart(fig, use_container_width=True)
+
+        with col2:
+            # Dustbins with the most collected weight
+            st.markdown("**Top Dustbins by Weight**")
+            bin_summary = data_layer.collection_totals_by_dustbin()
+            bin_summary.columns = ["Dustbin ID", "Weight (kg)", "Value (RM)", "Collections", "Last Collected"]
+            st.dataframe(bin_summary, use_container_width=True)
     else:
         st.info("No rubbish collection data available.")
 
@@ -1,34 +1,25 @@
 import os
+import sys
+import logging
 import streamlit as st
 from PIL import Image
 import io
-from dotenv import load_dotenv
-from pymongo import MongoClient
-import pandas as pd
-import datetime
 
-load_dotenv()
+# The shared data layer lives at the repository root; Streamlit reruns this file, so add it once
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if root not in sys.path:
+    sys.path.insert(0, root)
+import data_layer
 
 # Import your services directly
 from prediction_service import PredictionService
 from waste_classification import WasteClassificationService
 
-# Database setup and connection
-client = MongoClient(os.getenv("MONGO_URI"))
-db = client["smartbin"]
-
-# Collections
-dustbin_col = db["dustbins"]
-notification_col = db["notification"]
-collect_rubbish_col = db["collectRubbish"]
-useraccount_col = db["userAccount"]
-rubbish_col = db["rubbish"]
-
-dustbin_df = pd.DataFrame(list(dustbin_col.find()))
-notification_df = pd.DataFrame(list(notification_col.find()))
-collect_rubbish_df = pd.DataFrame(list(collect_rubbish_col.find()))
-useraccount_df = pd.DataFrame(list(useraccount_col.find()))
-rubbish_df = pd.DataFrame(list(rubbish_col.find()))
+# Load the classifier once per process; Streamlit reruns reuse the shared model registry
+try:
+    PredictionService.warm_up(["AlexNet"])
+except Exception as e:
+    logging.getLogger(__name__).warning(f"Model warm-up failed: {e}")
 
 dustbin_hard = "BIN001" 
 
@@ -75,11 +66,11 @@ with tab2:
     st.header("📦 Place Collection Order & Earn Reward Points")
 
     dustbin_id = dustbin_hard
-    existing_dustbin = dustbin_col.find_one({'dustbin_id': dustbin_id})
+    existing_dustbin = data_layer.get_dustbin(dustbin_id)
 
     if existing_dustbin:
         # Retrieve total_reward from userAccount collection
-        user_account = useraccount_col.find_one({'dustbin_id': dustbin_id})
+        user_account = data_layer.get_user_account(dustbin_id)
 
         if user_account:
             total_reward = user_account.get('total_reward', 0)  # Default to 0 if field missing
@@ -103,60 +94,8 @@ with tab2:
                 st.write(f"📧 **Email:** {email}")
                 st.write(f"🏠 **Address:** {address}")
 
-                # Static dustbin_id for now; you can later make this dynamic
-                location = address  # Using the mailing address as dustbin location
-                current_time = datetime.datetime.utcnow()
-
-                # --- Check if dustbin exists ---
-                existing_dustbin = dustbin_col.find_one({'dustbin_id': dustbin_id})
-
-                if existing_dustbin:
-                    # Update status to "Full"
-                    dustbin_col.update_one(
-                        {'dustbin_id': dustbin_id},
-                        {'$set': {'status': 'Full', 'timeUpdate': current_time, 'location': address}}
-                    )
-
-                    useraccount_col.update_one(
-                        {'dustbin_id': dustbin_id},
-                        {'$set': {
-                            'owner_name': name,
-                            'location': address,
-                            'email': email,
-                            'phone': phone
-                        }}
-                    )
-
-                else:
-                    # Create new dustbin entry
-                    new_dustbin = {
-                        'dustbin_id': dustbin_id,
-                        'status': 'Full',
-                        'location': address,
-                        'timeUpdate': current_time,
-                        'type': 'recycle'
-                    }
-                    dustbin_col.insert_one(new_dustbin)
-
-                    new_user = {
-                        'owner_name': name,
-                        'dustbin_id': dustbin_id,
-                        'location': address,
-                        'total_reward': 0,
-                        'email': email,
-                        'phone': phone
-                    }
-                    useraccount_col.insert_one(new_user)
-
-                # --- Create notification ---
-                new_notification = {
-                    'dustbin_id': dustbin_id,
-                    'location': address,
-                    'timestamp': current_time,
-                    'notification_type': 'call',
-                    'isCollected': False
-                }
-                notification_col.insert_one(new_notification)
+                # Static dustbin_id for now; the mailing address is used as dustbin location
+                data_layer.place_collection_order(dustbin_id, name, phone, email, address)
 
                 st.success(f"✅ Order submitted successfully!")
                 st.write(f"📩 **Confirmation Message:** Thank you for supporting sustainable waste management!")
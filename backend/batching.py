@@ -0,0 +1,173 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+
+import torch
+from PIL import Image
+
+from predictions import Prediction
+
+
+class _Request:
+    """A single queued image waiting to be batched"""
+
+    __slots__ = ("tensor", "future", "enqueued_at")
+
+    def __init__(self, tensor: torch.Tensor):
+        self.tensor = tensor
+        self.future: Future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class BatchingEngine:
+    """
+    Dynamic micro-batching front end for a Prediction instance.
+
+    Callers submit images from any thread and receive a Future. A worker thread
+    (``num_workers``, one by default) coalesces queued images into batches of up to ``max_batch_size``,
+    waiting at most ``max_wait_ms`` after the first image of a batch arrives,
+    runs one forward pass and resolves each caller's future with its own
+    (prediction, confidence) pair.
+
+    Throughput/latency knobs:
+        - max_batch_size: larger batches raise throughput under load.
+        - max_wait_ms: how long a lone request may wait for company; 0 disables waiting.
+        - max_queue_size: bound on pending images; submit blocks (backpressure) when full, 0 is unbounded.
+        - num_workers: batches dispatched concurrently; only useful when the model runs
+          forward passes outside the GIL-holding thread, e.g. a ProcessPoolModel.
+    """
+
+    def __init__(
+            self,
+            predictor: Prediction,
+            max_batch_size: int = 8,
+            max_wait_ms: float = 5.0,
+            max_queue_size: int = 0,
+            num_workers: int = 1,
+            logger: Optional[logging.Logger] = None
+    ):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.predictor = predictor
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.logger = logger or predictor.logger
+        self._queue: "queue.Queue[Optional[_Request]]" = queue.Queue(maxsize=max_queue_size)
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._images = 0
+        self._queue_wait = 0.0
+        self._stopped = False
+        self._workers = [
+            threading.Thread(target=self._run, name=f"batching-engine-{i}", daemon=True)
+            for i in range(num_workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, image: Image.Image) -> Future:
+        """
+        Queue an image for prediction.
+
+        Preprocessing runs in the calling thread so it parallelises across callers;
+        only the forward pass is serialised through the batching worker.
+
+        :param image: Input image (PIL Image object).
+        :return: Future resolving to a (predicted category, confidence) tuple.
+        """
+        return self.submit_tensor(self.predictor.preprocess_image(image))
+
+    def submit_tensor(self, image_tensor: torch.Tensor) -> Future:
+        """
+        Queue an already preprocessed image for prediction.
+
+        :param image_tensor: Preprocessed tensor of shape (1, C, H, W).
+        :return: Future resolving to a (predicted category, confidence) tuple.
+        """
+        if self._stopped:
+            raise RuntimeError("Batching engine has been stopped")
+        request = _Request(image_tensor)
+        self._queue.put(request)
+        return request.future
+
+    def predict(self, image: Image.Image, timeout: Optional[float] = None) -> Tuple[str, float]:
+        """
+        Submit an image and block until its result is available.
+
+        :param image: Input image (PIL Image object).
+        :param timeout: Maximum seconds to wait for the result.
+        :return: Predicted category and confidence score.
+        """
+        return self.submit(image).result(timeout=timeout)
+
+    def stop(self, timeout: Optional[float] = None):
+        """
+        Stop the workers after the queued images have been processed.
+
+        :param timeout: Maximum seconds to wait for each worker to exit.
+        """
+        if not self._stopped:
+            self._stopped = True
+            for _ in self._workers:
+                self._queue.put(None)
+        for worker in self._workers:
+            worker.join(timeout)
+
+    def stats(self) -> Dict[str, float]:
+        """
+        :return: Counters describing how well requests are being coalesced.
+        """
+        with self._stats_lock:
+            return {
+                "batches": self._batches,
+                "images": self._images,
+                "mean_batch_size": self._images / self._batches if self._batches else 0.0,
+                "mean_queue_wait_ms": 1000 * self._queue_wait / self._images if self._images else 0.0,
+                "pending": self._queue.qsize(),
+            }
+
+    def _collect_batch(self, first: _Request) -> Tuple[List[_Request], bool]:
+        """Gather queued requests until the batch is full or the wait deadline passes"""
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait_ms / 1000
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                request = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if request is None:
+                return batch, True
+            batch.append(request)
+        return batch, False
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is None:
+                break
+            batch, stopping = self._collect_batch(first)
+            # Futures cancelled by their caller are skipped
+            batch = [r for r in batch if r.future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            started = time.perf_counter()
+            try:
+                results = self.predictor.predict_batch_tensor(torch.cat([r.tensor for r in batch]))
+            except Exception as e:
+                self.logger.error(f"Batched prediction failed for {len(batch)} images: {e}")
+                for request in batch:
+                    request.future.set_exception(e)
+            else:
+                for request, result in zip(batch, results):
+                    request.future.set_result(result)
+
+            with self._stats_lock:
+                self._batches += 1
+                self._images += len(batch)
+                self._queue_wait += sum(started - r.enqueued_at for r in batch)
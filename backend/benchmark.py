@@ -0,0 +1,407 @@
+import io
+import os
+import sys
+import argparse
+import json
+import time
+import platform
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import torch
+import torchvision.transforms as transforms
+from PIL import Image
+
+from model_choose import ModelChoose
+from prediction_service import PredictionService
+from model_registry import model_registry
+from preprocessing import IMAGE_EXTENSIONS, Preprocessor, default_preprocessor
+from worker_pool import scaling_benchmark
+
+
+def synthetic_images(count: int, size=(640, 480), seed: int = 0) -> List[Image.Image]:
+    """
+    Generate random RGB images so benchmarks run offline without a dataset.
+
+    :param count: Number of images.
+    :param size: (width, height) of every image.
+    :param seed: Random seed for reproducible inputs.
+    :return: List of PIL images.
+    """
+    rng = np.random.default_rng(seed)
+    return [
+        Image.fromarray(rng.integers(0, 256, (size[1], size[0], 3), dtype=np.uint8), "RGB")
+        for _ in range(count)
+    ]
+
+
+def time_per_item(func: Callable[[], int], repeats: int = 3) -> float:
+    """
+    Run ``func`` several times and return the best seconds-per-item.
+
+    :param func: Callable performing the work and returning the number of items processed.
+    :param repeats: Number of timed runs.
+    :return: Best observed seconds per item.
+    """
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        items = func()
+        best = min(best, (time.perf_counter() - start) / items)
+    return best
+
+
+def legacy_transform(image: Image.Image) -> torch.Tensor:
+    """The original per-call Resize -> ToTensor -> Normalize pipeline, kept as the baseline"""
+    return transforms.Compose([
+        transforms.Resize((224, 224)),
+        transforms.ToTensor(),
+        transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
+    ])(image).unsqueeze(0)
+
+
+def bench_preprocess(images: List[Image.Image], batch_size: int) -> Dict[str, float]:
+    """
+    Compare per-image preprocessing cost of the legacy per-call Compose with the Preprocessor.
+
+    :param images: Input images.
+    :param batch_size: Batch size for the batched tensor path.
+    :return: Milliseconds per image for each variant.
+    """
+    def legacy():
+        for image in images:
+            legacy_transform(image)
+        return len(images)
+
+    preprocessor = Preprocessor()
+
+    def single():
+        for image in images:
+            preprocessor(image)
+        return len(images)
+
+    def batched():
+        for i in range(0, len(images), batch_size):
+            preprocessor.normalize_batch([preprocessor.load(image) for image in images[i:i + batch_size]])
+        return len(images)
+
+    # Agreement between the old and new path on the first image
+    reference = legacy_transform(images[0])
+    max_abs_diff = (reference - preprocessor(images[0])).abs().max().item()
+
+    return {
+        "legacy_compose_ms": 1000 * time_per_item(legacy),
+        "preprocessor_single_ms": 1000 * time_per_item(single),
+        "preprocessor_batched_ms": 1000 * time_per_item(batched),
+        "max_abs_diff": max_abs_diff,
+    }
+
+
+def labelled_images(path: str, limit: int) -> List[Tuple[str, str]]:
+    """
+    Collect (file, label) pairs from a folder laid out as <path>/<class name>/<image>.
+
+    :param path: Root of the labelled folder.
+    :param limit: Maximum number of pairs, spread across classes in sorted order.
+    :return: List of (image path, class name) pairs.
+    """
+    pairs = []
+    for label in sorted(os.listdir(path)):
+        class_dir = os.path.join(path, label)
+        if os.path.isdir(class_dir):
+            pairs.extend(
+                (os.path.join(class_dir, name), label)
+                for name in sorted(os.listdir(class_dir)) if name.lower().endswith(IMAGE_EXTENSIONS)
+            )
+    return pairs[:limit]
+
+
+def model_size_mb(model: torch.nn.Module) -> float:
+    """Serialized size of a model's state dict in megabytes"""
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell() / 2 ** 20
+
+
+def bench_quantization(model_names: List[str], data_path: Optional[str], limit: int,
+                       reference: str = "AlexNet") -> Dict[str, Dict[str, float]]:
+    """
+    Accuracy-vs-latency report of quantized variants against the fp32 reference model.
+
+    With a labelled folder top-1 accuracy is reported; agreement with the reference
+    model's predictions is always reported, so synthetic images still give a signal.
+
+    :param model_names: Models to compare, including the reference.
+    :param data_path: Optional labelled folder (<class>/<image>); synthetic images when None.
+    :param limit: Number of images to evaluate.
+    :param reference: Name of the fp32 model predictions are compared against.
+    :return: Per-model metrics.
+    """
+    if data_path:
+        pairs = labelled_images(data_path, limit)
+        inputs = [default_preprocessor.load(path) for path, _ in pairs]
+        labels = [label for _, label in pairs]
+    else:
+        inputs = [default_preprocessor.load(image) for image in synthetic_images(limit)]
+        labels = None
+    batch = default_preprocessor.normalize_batch(inputs).clone()
+
+    report, reference_predictions = {}, None
+    for name in [reference] + [n for n in model_names if n != reference]:
+        start = time.perf_counter()
+        predictor = PredictionService.get_predictor(name)
+        load_s = time.perf_counter() - start
+
+        predictions = [p for p, _ in predictor.predict_batch_tensor(batch)]
+        if reference_predictions is None:
+            reference_predictions = predictions
+
+        def single():
+            for i in range(batch.shape[0]):
+                predictor.predict_batch_tensor(batch[i:i + 1])
+            return batch.shape[0]
+
+        metrics = {
+            "load_s": load_s,
+            "size_mb": model_size_mb(predictor.model),
+            "latency_ms": 1000 * time_per_item(single),
+            "agreement_with_reference": float(np.mean([a == b for a, b in zip(predictions, reference_predictions)])),
+        }
+        if labels:
+            metrics["accuracy"] = float(np.mean([p == l for p, l in zip(predictions, labels)]))
+        report[name] = metrics
+    return report
+
+
+def bench_cascade(data_path: str, limit: int, thresholds: List[float]) -> Dict[str, Dict[str, float]]:
+    """
+    Mean time, escalation rate and accuracy of the cascade at several thresholds versus each stage alone.
+
+    :param data_path: Labelled folder laid out as <class>/<image>.
+    :param limit: Number of images to evaluate.
+    :param thresholds: Confidence thresholds to try.
+    :return: Metrics keyed by configuration.
+    """
+    pairs = labelled_images(data_path, limit)
+    images = []
+    for path, _ in pairs:
+        with Image.open(path) as image:
+            images.append(image.convert("RGB"))
+    labels = [label for _, label in pairs]
+
+    def evaluate(predict) -> Dict[str, float]:
+        start = time.perf_counter()
+        results = [predict(image) for image in images]
+        return {
+            "mean_ms": 1000 * (time.perf_counter() - start) / len(images),
+            "accuracy": float(np.mean([r.get("prediction") == l for r, l in zip(results, labels)])),
+            "escalation_rate": float(np.mean([r.get("escalated", False) for r in results])),
+        }
+
+    PredictionService.warm_up(PredictionService.CASCADE_STAGES)
+    report = {name: evaluate(lambda image, name=name: PredictionService.predict_image(image, name))
+              for name in PredictionService.CASCADE_STAGES}
+    for threshold in thresholds:
+        report[f"cascade@{threshold}"] = evaluate(
+            lambda image: PredictionService.predict_cascade(image, threshold=threshold))
+    return report
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """p50/p90/p99/mean of latency samples given in seconds, reported in milliseconds"""
+    values = 1000 * np.asarray(samples)
+    return {
+        "p50_ms": float(np.percentile(values, 50)),
+        "p90_ms": float(np.percentile(values, 90)),
+        "p99_ms": float(np.percentile(values, 99)),
+        "mean_ms": float(values.mean()),
+    }
+
+
+def bench_pipeline(model_name: str, images: int, batch_sizes: List[int], thread_counts: List[int],
+                   repeats: int) -> Dict:
+    """
+    Stage-by-stage benchmark of the prediction pipeline on synthetic images.
+
+    Expects autograd to be disabled by the caller. Measures cold model load,
+    preprocess, forward and postprocess cost per image,
+    end-to-end PredictionService.predict_image latency percentiles (cache disabled)
+    and forward throughput for every batch size x thread count combination.
+
+    :param model_name: Model to benchmark.
+    :param images: Number of synthetic images.
+    :param batch_sizes: Batch sizes for the throughput sweep.
+    :param thread_counts: torch intra-op thread counts for the throughput sweep.
+    :param repeats: Timed repetitions per measurement.
+    :return: Machine-readable results.
+    """
+    config = PredictionService.build_config(model_name)
+    start = time.perf_counter()
+    ModelChoose(config).initialize_model()
+    cold_load_s = time.perf_counter() - start
+
+    predictor = PredictionService.get_predictor(model_name)
+    inputs = synthetic_images(images)
+    batch = default_preprocessor.normalize_batch([default_preprocessor.load(image) for image in inputs]).clone()
+    logits = predictor.model(batch[:1])
+
+    def preprocess():
+        for image in inputs:
+            predictor.preprocess_image(image)
+        return len(inputs)
+
+    def forward():
+        for i in range(batch.shape[0]):
+            predictor.model(batch[i:i + 1])
+        return batch.shape[0]
+
+    def postprocess():
+        for _ in range(1000):
+            confidence, idx = torch.max(torch.softmax(logits, dim=1), dim=1)
+            predictor.classes[idx.item()], confidence.item()
+        return 1000
+
+    cache_enabled, PredictionService.CACHE_ENABLED = PredictionService.CACHE_ENABLED, False
+    try:
+        PredictionService.predict_image(inputs[0], model_name)  # start the batching engine
+        latencies = []
+        for _ in range(repeats):
+            for image in inputs:
+                start = time.perf_counter()
+                PredictionService.predict_image(image, model_name)
+                latencies.append(time.perf_counter() - start)
+    finally:
+        PredictionService.CACHE_ENABLED = cache_enabled
+
+    default_threads = torch.get_num_threads()
+    throughput = []
+    try:
+        for threads in thread_counts:
+            torch.set_num_threads(threads)
+            for batch_size in batch_sizes:
+                probe = batch[:batch_size] if batch_size <= batch.shape[0] else batch[:1].expand(batch_size, -1, -1, -1)
+                predictor.model(probe)  # warm-up at this shape
+                per_image = time_per_item(lambda: predictor.model(probe).shape[0], repeats)
+                throughput.append({"threads": threads, "batch_size": batch_size, "images_per_sec": 1 / per_image})
+    finally:
+        torch.set_num_threads(default_threads)
+
+    return {
+        "model": model_name,
+        "cold_load_s": cold_load_s,
+        "preprocess_ms": 1000 * time_per_item(preprocess, repeats),
+        "forward_ms": 1000 * time_per_item(forward, repeats),
+        "postprocess_ms": 1000 * time_per_item(postprocess, repeats),
+        "end_to_end": percentiles(latencies),
+        "throughput": throughput,
+    }
+
+
+def environment() -> Dict[str, str]:
+    """Describe the machine so results from different hosts are not compared blindly"""
+    return {
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "torch_threads": torch.get_num_threads(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def compare_to_baseline(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """
+    List latency metrics that regressed by more than ``tolerance`` (fractional) against a baseline run.
+
+    :param results: Current pipeline results.
+    :param baseline: Pipeline results of a previous release.
+    :param tolerance: Allowed relative slowdown, e.g. 0.1 for 10%.
+    :return: Human-readable regression descriptions; empty when none.
+    """
+    current = dict(results, **{f"end_to_end.{k}": v for k, v in results["end_to_end"].items()})
+    previous = dict(baseline, **{f"end_to_end.{k}": v for k, v in baseline["end_to_end"].items()})
+    regressions = []
+    for key in ["cold_load_s", "preprocess_ms", "forward_ms", "postprocess_ms", "end_to_end.p50_ms", "end_to_end.p99_ms"]:
+        if key in previous and current[key] > previous[key] * (1 + tolerance):
+            regressions.append(f"{key}: {previous[key]:.3f} -> {current[key]:.3f}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks for the prediction pipeline")
+    parser.add_argument("--output", default=None, help="Also write the results JSON to this file")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    preprocess = subparsers.add_parser("preprocess", help="Per-image preprocessing cost before and after")
+    preprocess.add_argument("--images", type=int, default=64)
+    preprocess.add_argument("--batch-size", type=int, default=16)
+
+    quantization = subparsers.add_parser("quantization", help="Accuracy vs latency of quantized models")
+    quantization.add_argument("--models", nargs="+", default=None,
+                              help="Defaults to AlexNet and its INT8 variants (static only with calibration images)")
+    quantization.add_argument("--data", default=None, help="Labelled folder laid out as <class>/<image>")
+    quantization.add_argument("--calibration-data", default=None,
+                              help="Image folder to calibrate static INT8 models on (defaults to --data)")
+    quantization.add_argument("--images", type=int, default=128)
+
+    profile = subparsers.add_parser("models", help="Latency/memory profile of every available model")
+    profile.add_argument("--models", nargs="+", default=None)
+
+    cascade = subparsers.add_parser("cascade", help="Cascade cost/accuracy against single models")
+    cascade.add_argument("--data", required=True, help="Labelled folder laid out as <class>/<image>")
+    cascade.add_argument("--images", type=int, default=256)
+    cascade.add_argument("--thresholds", type=float, nargs="+", default=[0.7, 0.85, 0.95])
+
+    scaling = subparsers.add_parser("scaling", help="Process pool throughput across worker counts")
+    scaling.add_argument("--model", default="AlexNet")
+    scaling.add_argument("--max-workers", type=int, default=os.cpu_count())
+    scaling.add_argument("--threads-per-worker", type=int, default=1)
+    scaling.add_argument("--batches", type=int, default=32)
+    scaling.add_argument("--batch-size", type=int, default=8)
+
+    pipeline = subparsers.add_parser("pipeline", help="Stage timings, latency percentiles and throughput sweep")
+    pipeline.add_argument("--model", default="AlexNet")
+    pipeline.add_argument("--images", type=int, default=32)
+    pipeline.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    pipeline.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, os.cpu_count()])
+    pipeline.add_argument("--repeats", type=int, default=3)
+    pipeline.add_argument("--baseline", default=None, help="Results JSON of a previous run to compare against")
+    pipeline.add_argument("--tolerance", type=float, default=0.10, help="Allowed relative slowdown")
+
+    args = parser.parse_args()
+    torch.set_grad_enabled(False)
+
+    if args.command == "preprocess":
+        results = bench_preprocess(synthetic_images(args.images), args.batch_size)
+    elif args.command == "quantization":
+        PredictionService.CALIBRATION_DATA_PATH = args.calibration_data or args.data
+        models = args.models or [name for name in ["AlexNet", "AlexNet-INT8-Dynamic", "AlexNet-INT8-Static"]
+                                 if name in PredictionService.default_models()]
+        results = bench_quantization(models, args.data, args.images)
+    elif args.command == "cascade":
+        results = bench_cascade(args.data, args.images, args.thresholds)
+    elif args.command == "scaling":
+        entry = model_registry.get(PredictionService.build_config(args.model))
+        results = scaling_benchmark(entry.model, entry.config.num_classes, list(range(1, args.max_workers + 1)),
+                                    args.batches, args.batch_size, args.threads_per_worker)
+    elif args.command == "models":
+        results = {name: p.to_dict() for name, p in PredictionService.profile_models(args.models).items()}
+    elif args.command == "pipeline":
+        results = bench_pipeline(args.model, args.images, args.batch_sizes, sorted(set(args.threads)), args.repeats)
+
+    report = {"benchmark": args.command, "environment": environment(), "results": results}
+    print(json.dumps(report, indent=4))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+
+    if args.command == "pipeline" and args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_to_baseline(results, json.load(f)["results"], args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
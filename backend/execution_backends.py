@@ -0,0 +1,66 @@
+import os
+from typing import Optional
+
+import torch
+
+try:
+    import onnxruntime
+except ImportError:  # Optional dependency, only needed for the "onnxruntime" backend
+    onnxruntime = None
+
+# Execution backends selectable through TrainingConfig.backend
+EAGER = "eager"
+TORCHSCRIPT = "torchscript"
+ONNXRUNTIME = "onnxruntime"
+SUPPORTED_BACKENDS = (EAGER, TORCHSCRIPT, ONNXRUNTIME)
+
+# File suffix of the exported artifact for each non-eager backend
+EXPORT_SUFFIXES = {
+    TORCHSCRIPT: ".torchscript.pt",
+    ONNXRUNTIME: ".onnx",
+}
+
+
+def exported_path(export_dir: str, model_name: str, backend: str) -> str:
+    """
+    Location of a model's exported graph for a backend.
+
+    :param export_dir: Directory holding exported models.
+    :param model_name: Registered model name.
+    :param backend: Non-eager backend name.
+    :return: File path of the exported artifact.
+    """
+    if backend not in EXPORT_SUFFIXES:
+        raise ValueError(f"Backend '{backend}' has no exported format. Choose one of {list(EXPORT_SUFFIXES)}")
+    return os.path.join(export_dir, model_name + EXPORT_SUFFIXES[backend])
+
+
+def load_torchscript(path: str, device: torch.device) -> torch.nn.Module:
+    """
+    Load a frozen TorchScript graph and apply inference-only optimisations.
+
+    :param path: Path of the exported TorchScript file.
+    :param device: Device to map the graph to.
+    :return: Optimised ScriptModule.
+    """
+    module = torch.jit.load(path, map_location=device).eval()
+    return torch.jit.optimize_for_inference(module)
+
+
+class OnnxRuntimeModule(torch.nn.Module):
+    """Runs an exported ONNX graph on the ONNX Runtime CPU provider behind the nn.Module call interface"""
+
+    def __init__(self, path: str, num_threads: Optional[int] = None):
+        super(OnnxRuntimeModule, self).__init__()
+        if onnxruntime is None:
+            raise ImportError("The 'onnxruntime' backend requires the onnxruntime package")
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = onnxruntime.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        output = self.session.run(None, {self.input_name: x.detach().cpu().numpy()})[0]
+        return torch.from_numpy(output)
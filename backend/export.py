@@ -0,0 +1,129 @@
+import os
+import sys
+import argparse
+from typing import List
+
+import torch
+
+from execution_backends import EAGER, ONNXRUNTIME, TORCHSCRIPT, exported_path
+from model_choose import QUANTIZED_VARIANTS
+from model_registry import model_registry
+from prediction_service import PredictionService
+
+
+def example_input(batch_size: int = 1) -> torch.Tensor:
+    """Dummy input with the shape the preprocessing pipeline produces"""
+    return torch.randn(batch_size, 3, 224, 224)
+
+
+def export_torchscript(model: torch.nn.Module, path: str):
+    """
+    Trace a model to TorchScript and freeze its weights into the graph.
+
+    :param model: Eager model in eval mode.
+    :param path: Output file.
+    """
+    with torch.no_grad():
+        traced = torch.jit.trace(model, example_input())
+    frozen = torch.jit.freeze(traced.eval())
+    torch.jit.save(frozen, path)
+
+
+def export_onnx(model: torch.nn.Module, path: str, opset: int = 17):
+    """
+    Export a model to ONNX with constant-folded weights and a dynamic batch dimension.
+
+    :param model: Eager model in eval mode.
+    :param path: Output file.
+    :param opset: ONNX opset version.
+    """
+    torch.onnx.export(
+        model,
+        example_input(),
+        path,
+        input_names=["input"],
+        output_names=["logits"],
+        dynamic_axes={"input": {0: "batch"}, "logits": {0: "batch"}},
+        do_constant_folding=True,
+        opset_version=opset
+    )
+
+
+EXPORTERS = {
+    TORCHSCRIPT: export_torchscript,
+    ONNXRUNTIME: export_onnx,
+}
+
+# Quantized variants cannot be traced/exported; only the fp32 models are
+EXPORTABLE_MODELS = [name for name in PredictionService.AVAILABLE_MODELS if name not in QUANTIZED_VARIANTS]
+
+
+def verify_parity(model_name: str, backend: str, atol: float = 1e-4, batch_size: int = 4) -> float:
+    """
+    Check that an exported graph produces the same logits as the eager model.
+
+    :param model_name: Registered model name.
+    :param backend: Backend whose exported graph is checked.
+    :param atol: Maximum allowed absolute difference.
+    :param batch_size: Batch size of the random probe input (exercises the dynamic batch axis).
+    :return: Maximum absolute difference observed.
+    """
+    eager = model_registry.get(PredictionService.build_config(model_name, EAGER))
+    exported = model_registry.get(PredictionService.build_config(model_name, backend))
+    inputs = example_input(batch_size)
+    with torch.no_grad():
+        expected = eager.model(inputs.to(eager.config.device)).cpu()
+        actual = exported.model(inputs.to(exported.config.device)).cpu()
+    max_diff = (expected - actual).abs().max().item()
+    if max_diff > atol:
+        raise AssertionError(f"{model_name} ({backend}) differs from eager by {max_diff:.2e} > {atol:.0e}")
+    return max_diff
+
+
+def export_model(model_name: str, backends: List[str], export_dir: str, check: bool = True):
+    """
+    Export one registered model to the requested formats.
+
+    :param model_name: Registered model name.
+    :param backends: Backends to export for.
+    :param export_dir: Output directory.
+    :param check: Run the parity check after exporting.
+    """
+    config = PredictionService.build_config(model_name, EAGER)
+    # Export from a CPU copy so the graph is device independent
+    config.device = torch.device("cpu")
+    model = model_registry.get(config).model
+    for backend in backends:
+        path = exported_path(export_dir, model_name, backend)
+        EXPORTERS[backend](model, path)
+        print(f"Exported {model_name} -> {path}")
+        if check:
+            print(f"  parity OK (max abs diff {verify_parity(model_name, backend):.2e})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export registered models to TorchScript/ONNX")
+    parser.add_argument("--models", nargs="+", default=EXPORTABLE_MODELS)
+    parser.add_argument("--formats", nargs="+", choices=list(EXPORTERS), default=list(EXPORTERS))
+    parser.add_argument("--out", default=PredictionService.EXPORT_DIR)
+    parser.add_argument("--no-check", action="store_true", help="Skip the eager vs exported parity check")
+    args = parser.parse_args()
+    for model_name in args.models:
+        if model_name in QUANTIZED_VARIANTS:
+            parser.error(f"{model_name} is quantized and not exportable; export its fp32 base "
+                         f"{QUANTIZED_VARIANTS[model_name][0]} instead")
+
+    os.makedirs(args.out, exist_ok=True)
+    PredictionService.EXPORT_DIR = args.out
+    failed = False
+    for model_name in args.models:
+        try:
+            export_model(model_name, args.formats, args.out, check=not args.no_check)
+        except Exception as e:
+            failed = True
+            print(f"Export of {model_name} failed: {e}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
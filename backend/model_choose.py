@@ -1,9 +1,29 @@
 import os
 import logging
+from functools import partial
 import torch
-from typing import Optional, Dict, Callable
+from torchvision import models as tv_models
+from typing import Optional, Dict, Callable, Tuple
+from torch.ao.quantization import QuantWrapper, convert, fuse_modules, get_default_qconfig, prepare, quantize_dynamic
 
+from execution_backends import EAGER, ONNXRUNTIME, SUPPORTED_BACKENDS, TORCHSCRIPT, OnnxRuntimeModule, load_torchscript
 from model import AlexNet
+from weight_store import is_flat_file, load_flat
+from preprocessing import IMAGE_EXTENSIONS, default_preprocessor
+
+# Quantized variants: name -> (fp32 base model, quantization mode). Quantized kernels are CPU-only.
+QUANTIZED_VARIANTS: Dict[str, Tuple[str, str]] = {
+    "AlexNet-INT8-Dynamic": ("AlexNet", "dynamic"),
+    "AlexNet-INT8-Static": ("AlexNet", "static"),
+}
+
+
+def needs_calibration(model_name: str) -> bool:
+    """True for statically quantized variants, which cannot load without calibration images"""
+    return QUANTIZED_VARIANTS.get(model_name, (None, None))[1] == "static"
+
+# Conv + ReLU pairs in AlexNet.features fused before static quantization
+ALEXNET_FUSE_GROUPS = [["0", "1"], ["3", "4"], ["6", "7"], ["8", "9"], ["10", "11"]]
 
 class TrainingConfig:
     """Training configuration class for managing basic model training parameters"""
@@ -15,7 +35,11 @@ class TrainingConfig:
             num_classes: int = 12,
             test_data_path: str = '../data/split-data/test',
             image_path: str = '',
-            pretrained_weights: Optional[str] = None
+            pretrained_weights: Optional[str] = None,
+            calibration_data_path: Optional[str] = None,
+            calibration_images: int = 64,
+            backend: str = EAGER,
+            exported_model_path: Optional[str] = None
     ):
         # Initialize training configuration parameters
         self.model_name = model_name
@@ -24,14 +48,29 @@ class TrainingConfig:
         self.num_classes = num_classes
         self.image_path = image_path
         self.pretrained_weights = pretrained_weights
+        # Sample images used to calibrate static quantization (required by static INT8 variants)
+        self.calibration_data_path = calibration_data_path
+        self.calibration_images = calibration_images
+        # Execution backend and, for non-eager backends, the exported graph it runs
+        if backend not in SUPPORTED_BACKENDS:
+            raise ValueError(f"Unknown backend '{backend}'. Choose one of {list(SUPPORTED_BACKENDS)}")
+        self.backend = backend
+        self.exported_model_path = exported_model_path
         # Automatically detect and select the available device (GPU/CPU)
-        if torch.cuda.is_available():
+        if model_name in QUANTIZED_VARIANTS or backend == ONNXRUNTIME:
+            self.device = torch.device("cpu")  # Quantized kernels only run on CPU
+        elif torch.cuda.is_available():
             self.device = torch.device("cuda")
         elif torch.backends.mps.is_available():
             self.device = torch.device("mps")  # Mac M1/M2/M3
         else:
             self.device = torch.device("cpu")  # CPU
 
+    @property
+    def model_file(self) -> Optional[str]:
+        """File the model is loaded from: the exported graph for non-eager backends, else the weights"""
+        return self.pretrained_weights if self.backend == EAGER else self.exported_model_path
+
 class ModelChoose:
     """Model selection and initialization class, supporting multiple deep learning models and handling pretrained weights"""
 
@@ -46,6 +85,18 @@ class ModelChoose:
         # Define a mapping of supported models
         self.supported_models: Dict[str, Callable] = {
             "AlexNet": self._create_alexnet,
+            # "ResNet" is the architecture of the bundled ResNet_model_98.14%.pth checkpoint
+            "ResNet": partial(self._create_resnet, tv_models.resnet50),
+            "ResNet18": partial(self._create_resnet, tv_models.resnet18),
+            "ResNet34": partial(self._create_resnet, tv_models.resnet34),
+            "ResNet50": partial(self._create_resnet, tv_models.resnet50),
+            "ResNet101": partial(self._create_resnet, tv_models.resnet101),
+            "ResNet152": partial(self._create_resnet, tv_models.resnet152),
+        }
+        # Loaders for exported graphs, keyed by execution backend
+        self.supported_backends: Dict[str, Callable] = {
+            TORCHSCRIPT: lambda: load_torchscript(self.config.exported_model_path, self.config.device),
+            ONNXRUNTIME: lambda: OnnxRuntimeModule(self.config.exported_model_path),
         }
 
     def _create_model_factory(self, model_func: Callable) -> torch.nn.Module:
@@ -57,32 +108,122 @@ class ModelChoose:
         """
         return model_func(num_classes=self.config.num_classes).to(self.config.device)
     
-    def _create_alexnet(self) -> torch.nn.Module:
-        return AlexNet(num_classes=self.config.num_classes, init_weights=True).to(self.config.device)
+    def _create_alexnet(self, init_weights: bool = True) -> torch.nn.Module:
+        return AlexNet(num_classes=self.config.num_classes, init_weights=init_weights)
+
+    def _create_resnet(self, architecture: Callable, init_weights: bool = True) -> torch.nn.Module:
+        # torchvision always initialises; under the meta device this costs nothing
+        return architecture(num_classes=self.config.num_classes)
+
+    def _get_model_creator(self, model_name: str) -> Callable:
+        """
+        Look up the creation function of a model, rejecting unknown names
+
+        :param model_name: Name of the model
+        :return: Model creation function
+        """
+        if model_name not in self.supported_models:
+            raise ValueError(
+                f"Unsupported model '{model_name}'. Choose one of {sorted(self.supported_models) + sorted(QUANTIZED_VARIANTS)}"
+            )
+        return self.supported_models[model_name]
 
     def initialize_model(self) -> torch.nn.Module:
         """
         Initialize the model and load pretrained weights
+
+        When pretrained weights are given the model skeleton is built on the
+        ``meta`` device, so no memory is allocated and no random
+        initialisation runs before the checkpoint tensors are assigned.
         """
+        if self.config.backend != EAGER:
+            return self.supported_backends[self.config.backend]()
+
+        if self.config.model_name in QUANTIZED_VARIANTS:
+            return self._initialize_quantized_model()
+
         # Retrieve the model creation function from the mapping dictionary
-        model_creator = self.supported_models.get(
-            self.config.model_name,
-            self._create_alexnet  
-        )
-        model = model_creator()
-        state = torch.load(
-            self.config.pretrained_weights,
-            map_location=self.config.device
-        )
-        
+        model_creator = self._get_model_creator(self.config.model_name)
+        if not self.config.pretrained_weights:
+            return model_creator().to(self.config.device)
+
+        state = self._load_state_dict(self.config.pretrained_weights)
+        with torch.device("meta"):
+            model = model_creator(init_weights=False)
+        model.load_state_dict(state, assign=True)
+
+        return model.to(self.config.device)
+
+    def _load_state_dict(self, path: str) -> Dict[str, torch.Tensor]:
+        """
+        Load a state dict from a flat weight file (memory-mapped) or a .pth checkpoint
+
+        .pth files are read with ``weights_only=True``, so checkpoints containing a
+        pickled model are rejected; convert them once with ``python weight_store.py``.
+
+        :param path: Weights file
+        :return: State dict
+        """
+        if is_flat_file(path):
+            return load_flat(path)
+
+        state = torch.load(path, map_location="cpu", weights_only=True)
         if isinstance(state, dict) and 'state_dict' in state:
-            model.load_state_dict(state['state_dict'])
-        elif isinstance(state, dict):
-            model.load_state_dict(state)
-        else:
-            model = state
+            state = state['state_dict']
+        if not isinstance(state, dict):
+            raise ValueError(f"{path} does not contain a state dict; convert it with weight_store.py")
+        return state
+
+    def _initialize_quantized_model(self) -> torch.nn.Module:
+        """
+        Load the fp32 base model and convert it to an INT8 variant
+
+        - dynamic: Linear layers of the classifier use int8 weights with activations quantized on the fly
+        - static: additionally fuses Conv+ReLU and quantizes the conv stack with activation
+          ranges observed over a calibration image folder
+
+        :return: Quantized model in eval mode
+        """
+        base_name, mode = QUANTIZED_VARIANTS[self.config.model_name]
+        base_config = TrainingConfig(
+            model_name=base_name,
+            num_classes=self.config.num_classes,
+            pretrained_weights=self.config.pretrained_weights
+        )
+        base_config.device = torch.device("cpu")
+        model = ModelChoose(base_config).initialize_model().eval()
+
+        if mode == "static":
+            fuse_modules(model.features, ALEXNET_FUSE_GROUPS, inplace=True)
+            model.features = QuantWrapper(model.features)
+            model.features.qconfig = get_default_qconfig(torch.backends.quantized.engine)
+            prepare(model.features, inplace=True)
+            self._calibrate(model)
+            convert(model.features, inplace=True)
+
+        return quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+    def _calibrate(self, model: torch.nn.Module):
+        """
+        Run calibration images through a prepared model so observers record activation ranges
+
+        :param model: Model with observers inserted by torch.ao.quantization.prepare
+        """
+        path = self.config.calibration_data_path
+        if not path:
+            raise ValueError(f"{self.config.model_name} needs calibration images; set calibration_data_path")
+        files = []
+        for root, _, names in os.walk(path):
+            files.extend(os.path.join(root, n) for n in sorted(names) if n.lower().endswith(IMAGE_EXTENSIONS))
+        files = files[:self.config.calibration_images]
+        if not files:
+            raise ValueError(f"No calibration images found in '{path}'")
 
-        return model
+        self.logger.info(f"Calibrating {self.config.model_name} on {len(files)} images from {path}")
+        with torch.no_grad():
+            for i in range(0, len(files), 16):
+                batch = [default_preprocessor.load(f) for f in files[i:i + 16]]
+                model(default_preprocessor.normalize_batch(batch))
 
     def _setup_logger(self):
         """
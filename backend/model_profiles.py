@@ -0,0 +1,77 @@
+import os
+import time
+from typing import Dict, Optional
+
+import torch
+
+from predictions import Prediction
+
+
+class ModelProfile:
+    """Measured cost of serving one model, used to choose a model under a latency budget"""
+
+    def __init__(self, model_name: str, latency_ms: float, weights_mb: float, file_mb: float,
+                 accuracy: Optional[float]):
+        self.model_name = model_name
+        self.latency_ms = latency_ms
+        self.weights_mb = weights_mb
+        self.file_mb = file_mb
+        self.accuracy = accuracy
+
+    def to_dict(self) -> Dict:
+        return {
+            "model": self.model_name,
+            "latency_ms": round(self.latency_ms, 3),
+            "weights_mb": round(self.weights_mb, 2),
+            "file_mb": round(self.file_mb, 2),
+            "accuracy": self.accuracy,
+        }
+
+
+def tensor_memory_mb(model: torch.nn.Module) -> float:
+    """
+    Memory held by a model's parameters and buffers, including packed quantized weights.
+
+    :param model: Loaded model.
+    :return: Size in megabytes.
+    """
+    state = model.state_dict()
+    total = 0
+    for value in state.values():
+        if isinstance(value, torch.Tensor):
+            total += value.element_size() * value.nelement()
+        elif isinstance(value, tuple):
+            # Packed params of quantized Linear layers are stored as (weight, bias) tuples
+            total += sum(t.element_size() * t.nelement() for t in value if isinstance(t, torch.Tensor))
+    return total / 2 ** 20
+
+
+def profile_predictor(predictor: Prediction, accuracy: Optional[float] = None, runs: int = 10,
+                      warmup: int = 2) -> ModelProfile:
+    """
+    Measure single-image forward latency (median) and memory footprint of a predictor.
+
+    :param predictor: Predictor wrapping the loaded model.
+    :param accuracy: Validation accuracy of the checkpoint in percent, if known.
+    :param runs: Number of timed forward passes.
+    :param warmup: Number of untimed forward passes run first.
+    :return: The measured profile.
+    """
+    probe = torch.randn(1, 3, 224, 224)
+    for _ in range(warmup):
+        predictor.predict_batch_tensor(probe)
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        predictor.predict_batch_tensor(probe)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+
+    model_file = predictor.config.model_file
+    return ModelProfile(
+        model_name=predictor.config.model_name,
+        latency_ms=1000 * timings[len(timings) // 2],
+        weights_mb=tensor_memory_mb(predictor.model),
+        file_mb=os.path.getsize(model_file) / 2 ** 20 if model_file and os.path.isfile(model_file) else 0.0,
+        accuracy=accuracy
+    )
@@ -0,0 +1,122 @@
+import os
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import torch
+
+from model_choose import ModelChoose, TrainingConfig
+
+# (model_name, backend, device, absolute model file path, model file mtime)
+RegistryKey = Tuple[str, str, str, str, float]
+
+
+class LoadedModel:
+    """A model held by the registry together with the configuration it was built from"""
+
+    def __init__(self, key: RegistryKey, config: TrainingConfig, model: torch.nn.Module):
+        self.key = key
+        self.config = config
+        self.model = model
+
+
+class ModelRegistry:
+    """
+    Process-wide cache of initialized models.
+
+    Models are keyed by (model_name, backend, device, model file, file mtime),
+    loaded once, switched to eval mode once and shared by every caller in the
+    process. The model file is the weights checkpoint for eager execution and the
+    exported graph otherwise. Replacing the file on disk changes its mtime, so the
+    next lookup loads the new version and drops the stale entry.
+    """
+
+    def __init__(self, logger: Optional[logging.Logger] = None):
+        self.logger = logger or logging.getLogger(__name__)
+        self._models: Dict[RegistryKey, LoadedModel] = {}
+        self._lock = threading.Lock()
+        self._load_locks: Dict[RegistryKey, threading.Lock] = {}
+
+    @staticmethod
+    def make_key(config: TrainingConfig) -> RegistryKey:
+        """
+        Build the registry key for a configuration.
+
+        :param config: Training configuration describing the model.
+        :return: Registry key tuple.
+        """
+        path = config.model_file
+        if not path or not os.path.isfile(path):
+            raise FileNotFoundError(f"Model file for {config.model_name} ({config.backend}) not found: {path}")
+        path = os.path.abspath(path)
+        return config.model_name, config.backend, str(config.device), path, os.path.getmtime(path)
+
+    def get(self, config: TrainingConfig) -> LoadedModel:
+        """
+        Return the cached model for a configuration, loading it on first use.
+
+        :param config: Training configuration describing the model.
+        :return: The loaded model entry.
+        """
+        key = self.make_key(config)
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is not None:
+                return entry
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        # Loading happens outside the registry lock so different models can load concurrently
+        with load_lock:
+            with self._lock:
+                entry = self._models.get(key)
+            if entry is not None:
+                return entry
+
+            self.logger.info(f"Loading model {config.model_name} ({config.backend}) on {config.device} from {key[3]}")
+            model = ModelChoose(config).initialize_model()
+            model.eval()
+            entry = LoadedModel(key, config, model)
+
+            with self._lock:
+                # Drop entries for older versions of the same model file
+                for stale in [k for k in self._models if k[:4] == key[:4]]:
+                    del self._models[stale]
+                    self._load_locks.pop(stale, None)
+                self._models[key] = entry
+            return entry
+
+    def warm_up(self, configs: Iterable[TrainingConfig]) -> List[LoadedModel]:
+        """
+        Load the given models ahead of the first request.
+
+        :param configs: Configurations of the models to load.
+        :return: The loaded model entries.
+        """
+        return [self.get(config) for config in configs]
+
+    def unload(self, model_name: Optional[str] = None) -> int:
+        """
+        Release cached models.
+
+        :param model_name: Only unload this model; unload everything when None.
+        :return: Number of entries removed.
+        """
+        with self._lock:
+            keys = [k for k in self._models if model_name is None or k[0] == model_name]
+            for key in keys:
+                del self._models[key]
+                self._load_locks.pop(key, None)
+        if keys and torch.cuda.is_available():
+            torch.cuda.empty_cache()
+        return len(keys)
+
+    def loaded(self) -> List[RegistryKey]:
+        """
+        :return: Keys of the models currently held.
+        """
+        with self._lock:
+            return list(self._models)
+
+
+# Shared instance used by PredictionService, Prediction and the Streamlit app
+model_registry = ModelRegistry()
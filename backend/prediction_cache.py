@@ -0,0 +1,207 @@
+import copy
+import json
+import logging
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from PIL import Image
+
+# A 64-bit perceptual hash is split into this many bands for near-duplicate lookup;
+# two hashes within (PHASH_BANDS - 1) bits of each other share at least one band.
+PHASH_BANDS = 4
+PHASH_BAND_BITS = 64 // PHASH_BANDS
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(image: Image.Image) -> str:
+    """
+    Hash of the decoded pixels, so re-encoded uploads of the same picture match.
+
+    :param image: Input image (PIL Image object).
+    :return: Hex digest.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{image.mode}:{image.size[0]}x{image.size[1]}".encode())
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+def perceptual_hash(image: Image.Image) -> int:
+    """
+    64-bit difference hash (dHash): robust to resizing, recompression and small edits.
+
+    :param image: Input image (PIL Image object).
+    :return: Hash as an unsigned 64-bit integer.
+    """
+    pixels = list(image.convert("L").resize((9, 8), Image.BILINEAR).getdata())
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            value = (value << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return value
+
+
+def _bands(phash: int):
+    mask = (1 << PHASH_BAND_BITS) - 1
+    return [(i, (phash >> (i * PHASH_BAND_BITS)) & mask) for i in range(PHASH_BANDS)]
+
+
+class PredictionCache:
+    """
+    Two-tier cache of prediction results keyed by image content and model version.
+
+    The memory tier is a bounded LRU; the optional disk tier is a SQLite file that
+    survives restarts and is opened on first use. Exact matches use a hash of the
+    decoded pixels. Near-duplicate matching is opt-in: when ``max_phash_distance`` > 0,
+    images whose perceptual hash is within that many bits of a memory-tier entry for
+    the same model version are also served (photos sharing a background can collide).
+    Results are copied in and out, so callers may modify what they get.
+    """
+
+    def __init__(self, max_entries: int = 1024, db_path: Optional[str] = None, max_phash_distance: int = 0):
+        if max_phash_distance >= PHASH_BANDS:
+            raise ValueError(f"max_phash_distance must be below {PHASH_BANDS}")
+        self.max_entries = max_entries
+        self.max_phash_distance = max_phash_distance
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[int, Dict]]" = OrderedDict()
+        # (model version, band index, band value) -> content keys, for near-duplicate lookup
+        self._band_index: Dict[Tuple[str, int, int], set] = {}
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.db_path = db_path
+        self._db = None
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        """
+        The disk tier, opened on first use. Caller holds the lock.
+
+        :return: The connection, or None without a db_path or when the file cannot be opened.
+        """
+        if self._db is None and self.db_path:
+            try:
+                db = sqlite3.connect(self.db_path, check_same_thread=False)
+                db.execute("PRAGMA journal_mode=WAL")
+                db.execute(
+                    "CREATE TABLE IF NOT EXISTS prediction_cache ("
+                    " content_key TEXT NOT NULL, model_version TEXT NOT NULL, phash INTEGER NOT NULL,"
+                    " result TEXT NOT NULL, created_at REAL NOT NULL,"
+                    " PRIMARY KEY (content_key, model_version))"
+                )
+                db.commit()
+                self._db = db
+            except sqlite3.Error as e:
+                logger.warning(f"Prediction cache disk tier disabled, cannot open {self.db_path}: {e}")
+                self.db_path = None
+        return self._db
+
+    def get(self, image: Image.Image, model_version: str) -> Optional[Dict]:
+        """
+        Look up a cached result for an image.
+
+        :param image: Input image (PIL Image object).
+        :param model_version: Identifier of the model name and weights version.
+        :return: Copy of the cached result with a "cache" field ("memory", "disk" or "perceptual"), or None.
+        """
+        key = content_hash(image)
+        with self._lock:
+            entry = self._entries.get((key, model_version))
+            if entry is not None:
+                self._entries.move_to_end((key, model_version))
+                self.hits += 1
+                return dict(copy.deepcopy(entry[1]), cache="memory")
+
+        with self._lock:
+            db = self._connection()
+            row = None if db is None else db.execute(
+                "SELECT phash, result FROM prediction_cache WHERE content_key = ? AND model_version = ?",
+                (key, model_version)
+            ).fetchone()
+        if row is not None:
+            result = json.loads(row[1])
+            self._remember(key, model_version, row[0] & 0xFFFFFFFFFFFFFFFF, copy.deepcopy(result))
+            with self._lock:
+                self.hits += 1
+            return dict(result, cache="disk")
+
+        if self.max_phash_distance:
+            result = self._get_near(perceptual_hash(image), model_version)
+            if result is not None:
+                return dict(copy.deepcopy(result), cache="perceptual")
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, image: Image.Image, model_version: str, result: Dict):
+        """
+        Store a successful prediction result.
+
+        :param image: Input image (PIL Image object).
+        :param model_version: Identifier of the model name and weights version.
+        :param result: Prediction result dictionary.
+        """
+        key, phash = content_hash(image), perceptual_hash(image)
+        # Keep a private copy: callers go on to decorate their result dict in place
+        self._remember(key, model_version, phash, copy.deepcopy(result))
+        with self._lock:
+            db = self._connection()
+            if db is not None:
+                # SQLite integers are signed 64-bit
+                signed = phash - (1 << 64) if phash >= 1 << 63 else phash
+                db.execute(
+                    "INSERT OR REPLACE INTO prediction_cache VALUES (?, ?, ?, ?, ?)",
+                    (key, model_version, signed, json.dumps(result, ensure_ascii=False), time.time())
+                )
+                db.commit()
+
+    def clear(self):
+        """Drop every entry from both tiers."""
+        with self._lock:
+            self._entries.clear()
+            self._band_index.clear()
+            db = self._connection()
+            if db is not None:
+                db.execute("DELETE FROM prediction_cache")
+                db.commit()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits,
+                    "near_hits": self.near_hits, "misses": self.misses}
+
+    def _remember(self, key: str, model_version: str, phash: int, result: Dict):
+        """Insert into the memory tier, evicting the least recently used entries"""
+        with self._lock:
+            self._entries[(key, model_version)] = (phash, result)
+            self._entries.move_to_end((key, model_version))
+            for band in _bands(phash):
+                self._band_index.setdefault((model_version,) + band, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                (old_key, old_version), (old_phash, _) = self._entries.popitem(last=False)
+                for band in _bands(old_phash):
+                    keys = self._band_index.get((old_version,) + band)
+                    if keys is not None:
+                        keys.discard(old_key)
+                        if not keys:
+                            del self._band_index[(old_version,) + band]
+
+    def _get_near(self, phash: int, model_version: str) -> Optional[Dict]:
+        """Find a memory-tier entry whose perceptual hash is within max_phash_distance bits"""
+        with self._lock:
+            candidates = set()
+            for band in _bands(phash):
+                candidates |= self._band_index.get((model_version,) + band, set())
+            for key in candidates:
+                cached_phash, result = self._entries[(key, model_version)]
+                if bin(cached_phash ^ phash).count("1") <= self.max_phash_distance:
+                    self._entries.move_to_end((key, model_version))
+                    self.near_hits += 1
+                    return result
+        return None
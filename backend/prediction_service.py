@@ -1,11 +1,24 @@
-from typing import Dict
+import os
+import logging
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, Optional
 from PIL import Image
-import json
 
 # Assuming these are your own modules, make sure they are implemented correctly
-from model_choose import ModelChoose, TrainingConfig
+from model_choose import QUANTIZED_VARIANTS, TrainingConfig, needs_calibration
+from batching import BatchingEngine
+from execution_backends import EAGER, exported_path
+from model_profiles import ModelProfile, profile_predictor
+from metrics import metrics
+from prediction_cache import PredictionCache
+from weight_store import preferred_weights
+from worker_pool import ProcessPoolModel
+from model_registry import model_registry
 from predictions import Prediction
 
+logger = logging.getLogger(__name__)
+
 class PredictionService:
     """
     Service class to handle predictions on images using different deep learning models.
@@ -14,13 +27,70 @@ class PredictionService:
     # Available models mapping to pretrained weights paths
     AVAILABLE_MODELS = {
         "AlexNet": "./weights/AlexNet_model_92.04%.pth",
+        "AlexNet-INT8-Dynamic": "./weights/AlexNet_model_92.04%.pth",
+        "AlexNet-INT8-Static": "./weights/AlexNet_model_92.04%.pth",
+        "ResNet": "./weights/ResNet_model_98.14%.pth",
+    }
+
+    # Validation accuracy (%) of each checkpoint. Quantized variants stay None (ranked below every
+    # measured model by select_model) until `benchmark.py quantization` measures them
+    MODEL_ACCURACY = {
+        "AlexNet": 92.04,
+        "AlexNet-INT8-Dynamic": None,
+        "AlexNet-INT8-Static": None,
+        "ResNet": 98.14,
     }
 
+    # Sample images used to calibrate statically quantized models; without them those models
+    # are left out of the default model set
+    CALIBRATION_DATA_PATH = None
+
+    # Execution backend ("eager", "torchscript" or "onnxruntime") and where export.py writes graphs
+    EXECUTION_BACKEND = EAGER
+    EXPORT_DIR = "./exported"
+
+    # Models latency-budget selection chooses from; None uses default_models(). They are
+    # profiled by warm_up(profile=True), never while serving a request
+    SELECTION_CANDIDATES: Optional[List[str]] = None
+
+    # Cascade mode: stages run cheapest first; a stage answers when its confidence reaches the threshold
+    CASCADE_STAGES = ["AlexNet-INT8-Dynamic", "ResNet"]
+    CASCADE_CONFIDENCE_THRESHOLD = 0.85
+
+    # Results of repeated uploads are served from the cache (memory LRU + SQLite file next to the
+    # weights, opened on first use). Only identical pixels match; set max_phash_distance to also
+    # serve near-duplicates
+    CACHE_ENABLED = True
+    CACHE = PredictionCache(max_entries=1024,
+                            db_path=os.path.join(os.path.dirname(os.path.abspath(__file__)), "weights",
+                                                 "prediction_cache.db"))
+
+    # Log every result dictionary at INFO; off by default because it is pure hot-path overhead
+    LOG_RESULTS = False
+
+    # Micro-batching knobs: raise the batch size for throughput, lower the wait for latency
+    BATCH_MAX_SIZE = 8
+    BATCH_MAX_WAIT_MS = 5.0
+    BATCH_MAX_QUEUE = 256
+
+    # Execution mode: "thread" runs forward passes in-process; "process" fans batches out to
+    # PROCESS_WORKERS worker processes that share one copy of the weights. Only float eager models
+    # can be shared; quantized and exported models are served in-process with a warning
+    EXECUTION_MODE = "thread"
+    PROCESS_WORKERS = 4
+    THREADS_PER_WORKER = 1
+
+    # Predictors and batching engines are reused while the registry keeps serving the same model
+    _predictors: Dict[str, Prediction] = {}
+    _engines: Dict[str, BatchingEngine] = {}
+    _predictors_lock = threading.Lock()
+    _profiles: Dict[str, ModelProfile] = {}
+
     @staticmethod
     def is_model_available(model_name: str) -> bool:
         """
         Check if the requested model is available and has weights file.
-        
+
         Args:
             model_name (str): Name of the model.
 
@@ -31,37 +101,371 @@ class PredictionService:
                PredictionService.AVAILABLE_MODELS[model_name] is not None
 
     @staticmethod
-    def predict_image(image: Image.Image, model_name: str = "AlexNet") -> Dict:
+    def default_models() -> List[str]:
         """
-        Predict the class of an image using the specified model.
-        
+        Models used when no explicit list is given.
+
+        Returns:
+            List[str]: Available models, without static INT8 variants unless CALIBRATION_DATA_PATH is set.
+        """
+        return [name for name in PredictionService.AVAILABLE_MODELS
+                if PredictionService.CALIBRATION_DATA_PATH or not needs_calibration(name)]
+
+    @staticmethod
+    def build_config(model_name: str, backend: Optional[str] = None) -> TrainingConfig:
+        """
+        Build the configuration used to load a model.
+
         Args:
-            image (PIL.Image.Image): Input image.
-            model_name (str): Name of the model to use.
+            model_name (str): Name of the model.
+            backend (str, optional): Execution backend; EXECUTION_BACKEND when omitted.
 
         Returns:
-            Dict: A dictionary containing prediction results.
+            TrainingConfig: Configuration pointing at the model's pretrained weights.
         """
-        # Step 3: Check if model is available
         if not PredictionService.is_model_available(model_name):
             raise ValueError(f"Model '{model_name}' is not available or pretrained weights are missing.")
 
-        # Step 4: Set up the training configuration
-        config = TrainingConfig(
+        backend = backend or PredictionService.EXECUTION_BACKEND
+        return TrainingConfig(
             model_name=model_name,
             num_classes=12,  # Adjust if your task has a different number of classes
-            pretrained_weights=PredictionService.AVAILABLE_MODELS[model_name]
+            pretrained_weights=preferred_weights(PredictionService.AVAILABLE_MODELS[model_name]),
+            calibration_data_path=PredictionService.CALIBRATION_DATA_PATH,
+            backend=backend,
+            exported_model_path=None if backend == EAGER else
+            exported_path(PredictionService.EXPORT_DIR, model_name, backend)
         )
 
-        # Step 5: Initialize the model
-        model_selector = ModelChoose(config)
-        model = model_selector.initialize_model()
+    @staticmethod
+    def get_predictor(model_name: str = "AlexNet") -> Prediction:
+        """
+        Return the shared predictor for a model, loading the model through the registry.
 
-        # Step 6: Run prediction
-        predictor = Prediction(config, model, logger=model_selector.logger)
-        result_json = predictor.run(image)
+        Args:
+            model_name (str): Name of the model.
+
+        Returns:
+            Prediction: Predictor bound to the registry's model instance.
+        """
+        entry = model_registry.get(PredictionService.build_config(model_name))
+        with PredictionService._predictors_lock:
+            predictor = PredictionService._predictors.get(model_name)
+            if predictor is None or PredictionService._source_model(predictor) is not entry.model:
+                if predictor is not None and isinstance(predictor.model, ProcessPoolModel):
+                    predictor.model.close()
+                model = entry.model
+                if PredictionService.EXECUTION_MODE == "process" and \
+                        not PredictionService.supports_process_pool(entry.config):
+                    logger.warning(f"{model_name} ({entry.config.backend}) cannot run in worker processes; "
+                                   f"serving it in-process")
+                elif PredictionService.EXECUTION_MODE == "process":
+                    model = ProcessPoolModel(
+                        entry.model,
+                        num_classes=entry.config.num_classes,
+                        num_workers=PredictionService.PROCESS_WORKERS,
+                        threads_per_worker=PredictionService.THREADS_PER_WORKER,
+                        max_batch_size=PredictionService.BATCH_MAX_SIZE
+                    )
+                predictor = Prediction(entry.config, model, log_results=PredictionService.LOG_RESULTS)
+                PredictionService._predictors[model_name] = predictor
+            return predictor
 
-        # Step 7: Return result as a dictionary
-        return json.loads(result_json)
+    @staticmethod
+    def supports_process_pool(config: TrainingConfig) -> bool:
+        """
+        Check whether a model can be served by a ProcessPoolModel.
 
+        Args:
+            config (TrainingConfig): Configuration the model was loaded with.
+
+        Returns:
+            bool: True for float eager models; quantized packed weights and exported
+                graphs (TorchScript, ONNX Runtime sessions) cannot be shared with workers.
+        """
+        return config.backend == EAGER and config.model_name not in QUANTIZED_VARIANTS
+
+    @staticmethod
+    def _source_model(predictor: Prediction):
+        """The registry model behind a predictor, unwrapping a process pool"""
+        model = predictor.model
+        return model.source if isinstance(model, ProcessPoolModel) else model
+
+    @staticmethod
+    def model_version(model_name: str) -> str:
+        """
+        Identify the exact model that would serve a request, for cache keys.
+
+        Args:
+            model_name (str): Name of the model.
+
+        Returns:
+            str: Model name, backend, model file and file mtime joined into one string.
+        """
+        name, backend, _, path, mtime = model_registry.make_key(PredictionService.build_config(model_name))
+        return f"{name}|{backend}|{os.path.basename(path)}|{mtime}"
+
+    @staticmethod
+    def get_engine(model_name: str = "AlexNet") -> BatchingEngine:
+        """
+        Return the batching engine serving a model, starting it on first use.
+
+        Args:
+            model_name (str): Name of the model.
+
+        Returns:
+            BatchingEngine: Engine that coalesces concurrent requests for the model.
+        """
+        predictor = PredictionService.get_predictor(model_name)
+        with PredictionService._predictors_lock:
+            engine = PredictionService._engines.get(model_name)
+            if engine is None or engine.predictor is not predictor:
+                stale = engine
+                engine = BatchingEngine(
+                    predictor,
+                    max_batch_size=PredictionService.BATCH_MAX_SIZE,
+                    max_wait_ms=PredictionService.BATCH_MAX_WAIT_MS,
+                    max_queue_size=PredictionService.BATCH_MAX_QUEUE,
+                    num_workers=predictor.model.num_workers if isinstance(predictor.model, ProcessPoolModel) else 1
+                )
+                PredictionService._engines[model_name] = engine
+            else:
+                stale = None
+        if stale is not None:
+            stale.stop()
+        return engine
+
+    @staticmethod
+    def warm_up(model_names: Optional[Iterable[str]] = None, profile: bool = False) -> List[str]:
+        """
+        Load models into the registry before the first request arrives.
+
+        Args:
+            model_names (Iterable[str], optional): Models to load; default_models() when omitted.
+            profile (bool): Also profile SELECTION_CANDIDATES, so requests with a latency
+                budget can be served.
+
+        Returns:
+            List[str]: Names of the models that are ready.
+        """
+        names = list(model_names or PredictionService.default_models())
+        for name in names:
+            PredictionService.get_engine(name)
+        if profile:
+            PredictionService.profile_models(PredictionService.SELECTION_CANDIDATES)
+        return names
+
+    @staticmethod
+    def unload(model_name: Optional[str] = None) -> int:
+        """
+        Release cached models and their predictors.
 
+        Args:
+            model_name (str, optional): Model to release; all models when omitted.
+
+        Returns:
+            int: Number of registry entries removed.
+        """
+        with PredictionService._predictors_lock:
+            names = list(PredictionService._engines) if model_name is None else [model_name]
+            engines = [PredictionService._engines.pop(name, None) for name in names]
+            predictors = list(PredictionService._predictors.values()) if model_name is None else \
+                [PredictionService._predictors.get(model_name)]
+            if model_name is None:
+                PredictionService._predictors.clear()
+            else:
+                PredictionService._predictors.pop(model_name, None)
+        for engine in engines:
+            if engine is not None:
+                engine.stop()
+        for predictor in predictors:
+            if predictor is not None and isinstance(predictor.model, ProcessPoolModel):
+                predictor.model.close()
+        return model_registry.unload(model_name)
+
+    @staticmethod
+    def profile_models(model_names: Optional[Iterable[str]] = None, refresh: bool = False) -> Dict[str, ModelProfile]:
+        """
+        Measure latency and memory of models, caching the profiles for model selection.
+
+        Models that fail to load are logged and left out.
+
+        Args:
+            model_names (Iterable[str], optional): Models to profile; default_models() when omitted.
+            refresh (bool): Re-measure models that already have a profile.
+
+        Returns:
+            Dict[str, ModelProfile]: Profiles keyed by model name.
+        """
+        names = list(model_names or PredictionService.default_models())
+        for name in names:
+            if refresh or name not in PredictionService._profiles:
+                try:
+                    PredictionService._profiles[name] = profile_predictor(
+                        PredictionService.get_predictor(name),
+                        accuracy=PredictionService.MODEL_ACCURACY.get(name)
+                    )
+                except Exception as e:
+                    logger.warning(f"Skipping {name} in model profiling: {e}")
+        return {name: PredictionService._profiles[name] for name in names if name in PredictionService._profiles}
+
+    @staticmethod
+    def select_model(latency_budget_ms: float, candidates: Optional[Iterable[str]] = None) -> str:
+        """
+        Pick the most accurate model whose profiled latency fits the budget.
+
+        Only profiles measured earlier (warm_up(profile=True) or profile_models) are
+        looked at. Models without a measured accuracy are only picked when no measured
+        model fits. Falls back to the fastest model when none fits.
+
+        Args:
+            latency_budget_ms (float): Maximum acceptable forward latency in milliseconds.
+            candidates (Iterable[str], optional): Models to choose from; SELECTION_CANDIDATES when omitted.
+
+        Returns:
+            str: Name of the selected model.
+        """
+        names = candidates or PredictionService.SELECTION_CANDIDATES or PredictionService.default_models()
+        profiles = [PredictionService._profiles[name] for name in names if name in PredictionService._profiles]
+        if not profiles:
+            raise ValueError("No model profiles for latency-budget selection; run warm_up(profile=True) first")
+        within_budget = [p for p in profiles if p.latency_ms <= latency_budget_ms]
+        if not within_budget:
+            return min(profiles, key=lambda p: p.latency_ms).model_name
+        # Unmeasured accuracy ranks below any measured model
+        return max(within_budget, key=lambda p: (p.accuracy is not None, p.accuracy or 0.0,
+                                                 -p.latency_ms)).model_name
+
+    @staticmethod
+    def predict_image(image: Image.Image, model_name: str = "AlexNet",
+                      latency_budget_ms: Optional[float] = None) -> Dict:
+        """
+        Predict the class of an image using the specified model.
+
+        Args:
+            image (PIL.Image.Image): Input image.
+            model_name (str): Name of the model to use.
+            latency_budget_ms (float, optional): When given, the most accurate model meeting
+                this forward latency is used instead of model_name.
+
+        Returns:
+            Dict: A dictionary containing prediction results.
+        """
+        try:
+            if latency_budget_ms is not None:
+                model_name = PredictionService.select_model(latency_budget_ms)
+
+            # Step 1: Serve repeated images from the prediction cache
+            if PredictionService.CACHE_ENABLED:
+                version = PredictionService.model_version(model_name)
+                cached = PredictionService.CACHE.get(image, version)
+                if cached is not None:
+                    metrics.inc("prediction_cache_hits_total", {"model": model_name})
+                    return cached
+
+            # Step 2: Fetch the shared batching engine (model is loaded once per process)
+            engine = PredictionService.get_engine(model_name)
+
+            # Step 3: Queue the image; it is coalesced with concurrent requests into one forward pass
+            start_time = time.perf_counter()
+            prediction, confidence = engine.predict(image)
+            total_time = time.perf_counter() - start_time
+            metrics.observe("prediction_latency_seconds", total_time, {"model": model_name})
+            result = engine.predictor.build_result(prediction, confidence, total_time)
+            if engine.predictor.log_results:
+                engine.logger.info(f"Prediction completed: {result}")
+            if PredictionService.CACHE_ENABLED:
+                PredictionService.CACHE.put(image, version, result)
+        except Exception as e:
+            result = Prediction.build_error(e)
+            logger.error(f"Prediction failed: {result}")
+
+        # Step 4: Return result as a dictionary
+        return result
+
+    @staticmethod
+    def predict_cascade(image: Image.Image, stages: Optional[List[str]] = None,
+                        threshold: Optional[float] = None) -> Dict:
+        """
+        Predict with a cascade: a fast model first, escalating to heavier models on low confidence.
+
+        The image is preprocessed once and shared by every stage. The last stage
+        always answers, whatever its confidence.
+
+        Args:
+            image (PIL.Image.Image): Input image.
+            stages (List[str], optional): Models ordered cheapest first; CASCADE_STAGES when omitted.
+            threshold (float, optional): Softmax confidence in [0, 1] needed to stop at a stage;
+                CASCADE_CONFIDENCE_THRESHOLD when omitted.
+
+        Returns:
+            Dict: Prediction results of the answering stage, plus "cascade_stage" (0-based index),
+                "escalated" and the per-stage "stage_confidences".
+        """
+        stages = stages or PredictionService.CASCADE_STAGES
+        threshold = PredictionService.CASCADE_CONFIDENCE_THRESHOLD if threshold is None else threshold
+
+        try:
+            start_time = time.perf_counter()
+            image_tensor = None
+            stage_confidences = []
+            for stage, name in enumerate(stages):
+                # Later stages are only loaded when the image escalates to them
+                engine = PredictionService.get_engine(name)
+                if image_tensor is None:
+                    image_tensor = engine.predictor.preprocess_image(image)
+                prediction, confidence = engine.submit_tensor(image_tensor).result()
+                stage_confidences.append(round(confidence, 4))
+                if confidence >= threshold:
+                    break
+
+            total_time = time.perf_counter() - start_time
+            metrics.observe("prediction_latency_seconds", total_time, {"model": "cascade"})
+            result = engine.predictor.build_result(prediction, confidence, total_time)
+            result["cascade_stage"] = stage
+            result["escalated"] = stage > 0
+            result["stage_confidences"] = stage_confidences
+            if engine.predictor.log_results:
+                engine.logger.info(f"Prediction completed: {result}")
+        except Exception as e:
+            result = Prediction.build_error(e)
+            logger.error(f"Prediction failed: {result}")
+        return result
+
+    @staticmethod
+    def predict_batch(images: Iterable, model_name: str = "AlexNet", batch_size: int = 32,
+                      num_workers: int = 4) -> Iterator[Dict]:
+        """
+        Classify a stream of images, yielding results incrementally.
+
+        Args:
+            images (Iterable): Image file paths or PIL images.
+            model_name (str): Name of the model to use.
+            batch_size (int): Number of images per forward pass.
+            num_workers (int): Number of decode/preprocess threads.
+
+        Returns:
+            Iterator[Dict]: One result dictionary per input image, in input order.
+        """
+        predictor = PredictionService.get_predictor(model_name)
+        return predictor.predict_batch(images, batch_size=batch_size, num_workers=num_workers)
+
+    @staticmethod
+    def predict_directory(path: str, model_name: str = "AlexNet", recursive: bool = True,
+                          batch_size: int = 32, num_workers: int = 4) -> Iterator[Dict]:
+        """
+        Classify every image under a directory, yielding results incrementally.
+
+        Args:
+            path (str): Directory to scan.
+            model_name (str): Name of the model to use.
+            recursive (bool): Also descend into subdirectories.
+            batch_size (int): Number of images per forward pass.
+            num_workers (int): Number of decode/preprocess threads.
+
+        Returns:
+            Iterator[Dict]: One result dictionary per image file, each with a "source" key.
+        """
+        predictor = PredictionService.get_predictor(model_name)
+        return predictor.predict_directory(path, recursive=recursive, batch_size=batch_size,
+                                           num_workers=num_workers)
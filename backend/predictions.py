@@ -1,23 +1,73 @@
+import os
+import sys
 import logging
 import json
 import time
+from collections import deque
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, Union
 import torch
-import torchvision.transforms as transforms
 from PIL import Image
-from model_choose import ModelChoose, TrainingConfig
+from model_choose import TrainingConfig
+from metrics import metrics
+from model_registry import model_registry
+from preprocessing import IMAGE_EXTENSIONS, default_preprocessor
+
+
+def _bounded_map(executor: Executor, func: Callable, items: Iterable, prefetch: int) -> Iterator:
+    """
+    Ordered, lazy counterpart of Executor.map that keeps at most ``prefetch`` tasks in flight.
+
+    :param executor: Executor running the tasks.
+    :param func: Function applied to every item.
+    :param items: Input iterable, consumed incrementally.
+    :param prefetch: Maximum number of submitted but not yet yielded tasks.
+    :return: Iterator over the results in input order.
+    """
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(func, item))
+        if len(pending) >= prefetch:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def iter_image_files(path: str, recursive: bool = True) -> Iterator[str]:
+    """
+    Lazily lists image files under a directory in a stable order.
+
+    :param path: Directory to scan.
+    :param recursive: Also descend into subdirectories.
+    :return: Iterator of image file paths.
+    """
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                yield os.path.join(root, name)
+        if not recursive:
+            break
+
+
+STAGE_METRIC = "prediction_stage_seconds"
 
 
 class Prediction:
-    def __init__(self, config: TrainingConfig, model, logger=None):
+    def __init__(self, config: TrainingConfig, model=None, logger=None, log_results: bool = False):
         """
         Initializes the Prediction class.
 
         :param config: Training configuration.
-        :param model: The trained model for prediction.
+        :param model: The trained model for prediction (optional, taken from the shared model registry when omitted).
         :param logger: Logger instance for logging (optional).
+        :param log_results: Log every result dictionary at INFO (off by default to keep the hot path cheap).
         """
         self.config = config
         self.logger = logger or logging.getLogger(__name__)
+        self.log_results = log_results
+        if model is None and config.model_file:
+            model = model_registry.get(config).model
         self.model = model
         self.classes = [
             'battery', 'biological', 'brown-glass', 'cardboard', 'clothes',
@@ -25,6 +75,7 @@ class Prediction:
         ]
         if self.model is None:
             raise ValueError("Model is not initialized. Please provide a valid model instance.")
+        self.model.eval()
 
     @staticmethod
     def preprocess_image(image):
@@ -35,15 +86,8 @@ class Prediction:
         :return: Preprocessed image tensor.
         """
         try:
-            transform = transforms.Compose([
-                transforms.Resize((224, 224)),
-                transforms.ToTensor(),
-                transforms.Normalize(
-                    mean=[0.485, 0.456, 0.406],
-                    std=[0.229, 0.224, 0.225]
-                )
-            ])
-            return transform(image).unsqueeze(0)  # Add batch dimension
+            with metrics.timer(STAGE_METRIC, {"stage": "preprocess"}):
+                return default_preprocessor(image)
         except Exception as e:
             raise ValueError(f"Image preprocessing failed: {e}")
 
@@ -54,49 +98,174 @@ class Prediction:
         :param image_tensor: Preprocessed image tensor.
         :return: Predicted category and confidence score.
         """
+        return self.predict_batch_tensor(image_tensor)[0]
+
+    def predict_batch_tensor(self, batch_tensor):
+        """
+        Performs prediction on a batch of preprocessed images in a single forward pass.
+
+        :param batch_tensor: Preprocessed image tensor of shape (N, C, H, W).
+        :return: List of (predicted category, confidence score) tuples, one per image.
+        """
+        model = self.config.model_name
         try:
-            self.model.eval()
             with torch.no_grad():
-                image_tensor = image_tensor.to(self.config.device)
-                output = self.model(image_tensor)
-                _, predicted_idx = torch.max(output, dim=1)
-                confidence = torch.softmax(output, dim=1)[0, predicted_idx].item()
-                return self.classes[predicted_idx.item()], confidence
+                with metrics.timer(STAGE_METRIC, {"model": model, "stage": "transfer"}):
+                    batch_tensor = batch_tensor.to(self.config.device)
+                with metrics.timer(STAGE_METRIC, {"model": model, "stage": "forward"}):
+                    output = self.model(batch_tensor)
+                with metrics.timer(STAGE_METRIC, {"model": model, "stage": "softmax"}):
+                    confidences, predicted_idx = torch.max(torch.softmax(output, dim=1), dim=1)
+                    predicted_idx, confidences = predicted_idx.tolist(), confidences.tolist()
+                with metrics.timer(STAGE_METRIC, {"model": model, "stage": "classification_lookup"}):
+                    results = [(self.classes[idx], confidence) for idx, confidence in zip(predicted_idx, confidences)]
+            metrics.inc("predictions_total", {"model": model}, len(results))
+            return results
         except Exception as e:
+            metrics.inc("prediction_errors_total", {"model": model}, batch_tensor.shape[0])
             self.logger.error(f"Prediction failed: {e}")
             raise ValueError(f"Prediction failed: {e}")
 
+    def build_result(self, prediction: str, confidence: float, total_time: float) -> dict:
+        """
+        Builds the response dictionary for a successful prediction.
+
+        :param prediction: Predicted category.
+        :param confidence: Confidence score in [0, 1].
+        :param total_time: Elapsed time in seconds.
+        :return: Result dictionary.
+        """
+        return {
+            "status": 200,
+            "message": "Prediction successful",
+            "model": self.config.model_name,
+            "prediction": prediction,
+            "confidence": f"{confidence * 100:.2f}%",
+            "total_time": f"{total_time:.3f} seconds"
+        }
+
+    @staticmethod
+    def build_error(error: Exception) -> dict:
+        """
+        Builds the response dictionary for a failed prediction.
+
+        :param error: The exception raised by the pipeline.
+        :return: Error dictionary.
+        """
+        return {
+            "status": 400,
+            "message": f"Error: {str(error)}"
+        }
+
+    def _load_and_preprocess(self, source: Union[str, Image.Image]):
+        """
+        Decodes and resizes one image to a uint8 tensor; failures are returned instead of raised.
+
+        :param source: Image file path or PIL Image object.
+        :return: (source label, uint8 image tensor or None, exception or None).
+        """
+        label = source if isinstance(source, str) else None
+        try:
+            with metrics.timer(STAGE_METRIC, {"stage": "decode"}):
+                image = default_preprocessor.decode(source)
+            with metrics.timer(STAGE_METRIC, {"stage": "preprocess"}):
+                return label, default_preprocessor.resize(image), None
+        except Exception as e:
+            return label, None, ValueError(f"Image preprocessing failed: {e}")
+
+    def predict_batch(self, images: Iterable[Union[str, Image.Image]], batch_size: int = 32, num_workers: int = 4):
+        """
+        Classifies a stream of images, yielding one result per image as soon as its batch is done.
+
+        Images are decoded and resized in a thread pool, grouped into batches of
+        ``batch_size``, normalized together into a reused buffer and sent through
+        the model in one forward pass per batch. Only
+        a bounded window of images is held in memory, so the input may be an
+        arbitrarily long generator.
+
+        :param images: Iterable of image file paths or PIL Image objects.
+        :param batch_size: Number of images per forward pass.
+        :param num_workers: Number of decode/resize threads.
+        :return: Generator of result dictionaries in input order; file inputs carry a "source" key.
+        """
+        with ThreadPoolExecutor(max_workers=num_workers) as executor:
+            decoded = _bounded_map(executor, self._load_and_preprocess, images, prefetch=2 * batch_size)
+            batch = []
+            for item in decoded:
+                batch.append(item)
+                if len(batch) == batch_size:
+                    yield from self._predict_decoded(batch)
+                    batch = []
+            if batch:
+                yield from self._predict_decoded(batch)
+
+    def predict_directory(self, path: str, recursive: bool = True, batch_size: int = 32, num_workers: int = 4):
+        """
+        Classifies every image file under a directory, streaming results.
+
+        :param path: Directory to scan.
+        :param recursive: Also descend into subdirectories.
+        :param batch_size: Number of images per forward pass.
+        :param num_workers: Number of decode/resize threads.
+        :return: Generator of result dictionaries, each with a "source" key.
+        """
+        if not os.path.isdir(path):
+            raise ValueError(f"Not a directory: {path}")
+        return self.predict_batch(iter_image_files(path, recursive), batch_size, num_workers)
+
+    def _predict_decoded(self, batch):
+        """
+        Runs one forward pass over the successfully decoded items of a batch.
+
+        :param batch: List of (source label, tensor or None, exception or None) tuples.
+        :return: Generator of result dictionaries in batch order.
+        """
+        start_time = time.perf_counter()
+        tensors = [tensor for _, tensor, _ in batch if tensor is not None]
+        try:
+            if tensors:
+                with metrics.timer(STAGE_METRIC, {"stage": "preprocess"}):
+                    batch_tensor = default_preprocessor.normalize_batch(tensors)
+                predictions = iter(self.predict_batch_tensor(batch_tensor))
+            else:
+                predictions = iter(())
+            batch_error = None
+        except Exception as e:
+            predictions, batch_error = iter(()), e
+        per_image_time = (time.perf_counter() - start_time) / len(batch)
+
+        for label, tensor, error in batch:
+            if tensor is not None and batch_error is None:
+                result = self.build_result(*next(predictions), per_image_time)
+            else:
+                result = self.build_error(error or batch_error)
+            if label is not None:
+                result["source"] = label
+            yield result
+
     def run(self, image: Image.Image):
         """
         Runs the full prediction pipeline.
 
-        :param image_path: Path to the image to be classified.
+        :param image: Image to be classified (PIL Image object).
         :return: JSON result containing prediction details.
         """
         try:
-            start_time = time.time()
+            start_time = time.perf_counter()
             # Preprocess image
             image_tensor = self.preprocess_image(image)
 
             # Perform prediction
             prediction, confidence = self.predict(image_tensor)
-            total_time = time.time() - start_time
-
-            result = {
-                "status": 200,
-                "message": "Prediction successful",
-                "model": self.config.model_name,
-                "prediction": prediction,
-                "confidence": f"{confidence * 100:.2f}%",
-                "total_time": f"{total_time:.3f} seconds"
-            }
-            self.logger.info(f"Prediction completed: {result}")
+            total_time = time.perf_counter() - start_time
+            metrics.observe("prediction_latency_seconds", total_time, {"model": self.config.model_name})
+
+            result = self.build_result(prediction, confidence, total_time)
+            if self.log_results:
+                self.logger.info(f"Prediction completed: {result}")
             return json.dumps(result, ensure_ascii=False, indent=4)
         except Exception as e:
-            error_response = {
-                "status": 400,
-                "message": f"Error: {str(e)}"
-            }
+            error_response = self.build_error(e)
             self.logger.error(f"Prediction failed: {error_response}")
             return json.dumps(error_response, ensure_ascii=False, indent=4)
 
@@ -104,20 +273,24 @@ class Prediction:
 def main():
     """
     Main function to test the Prediction class.
+
+    Usage: python predictions.py [image file or directory]
     """
     try:
         config = TrainingConfig(
             model_name='AlexNet',
             num_classes=12,
-            image_path='../predict/test.jpg',
+            image_path=sys.argv[1] if len(sys.argv) > 1 else '../predict/test.jpg',
             pretrained_weights='./weights/AlexNet_model_92.04%.pth'
         )
-        model_choose = ModelChoose(config)
-        model = model_choose.initialize_model()
-
-        predictor = Prediction(config, model, model_choose.logger)
-        result = predictor.run(config.image_path)
-        print(result)
+        predictor = Prediction(config)
+        if os.path.isdir(config.image_path):
+            for result in predictor.predict_directory(config.image_path):
+                print(json.dumps(result, ensure_ascii=False))
+        else:
+            with Image.open(config.image_path) as image:
+                result = predictor.run(image.convert("RGB"))
+            print(result)
     except Exception as e:
         print(f"Main function failed: {e}")
 
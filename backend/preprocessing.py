@@ -0,0 +1,120 @@
+import io
+import threading
+from typing import List, Sequence, Tuple, Union
+
+import torch
+import torchvision.transforms.functional as F
+from PIL import Image
+from torchvision.io import ImageReadMode, decode_image, read_file
+
+# File extensions treated as images when scanning folders
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.jfif', '.bmp', '.webp')
+
+# ImageNet statistics the bundled weights were trained with
+IMAGENET_MEAN = (0.485, 0.456, 0.406)
+IMAGENET_STD = (0.229, 0.224, 0.225)
+
+
+class Preprocessor:
+    """
+    Tensor-native replacement for the Resize -> ToTensor -> Normalize pipeline.
+
+    Everything that does not depend on the input is built once: images are decoded
+    straight to uint8 CHW tensors, resized with antialiasing on the tensor, and the
+    ToTensor scaling plus Normalize are fused into a single multiply-add with
+    precomputed per-channel ``scale = 1 / (255 * std)`` and ``shift = -mean / std``.
+    Batched calls write into per-thread preallocated buffers.
+    """
+
+    def __init__(
+            self,
+            size: Tuple[int, int] = (224, 224),
+            mean: Sequence[float] = IMAGENET_MEAN,
+            std: Sequence[float] = IMAGENET_STD
+    ):
+        self.size = tuple(size)
+        mean = torch.tensor(mean, dtype=torch.float32).view(1, 3, 1, 1)
+        std = torch.tensor(std, dtype=torch.float32).view(1, 3, 1, 1)
+        self.scale = 1.0 / (255.0 * std)
+        self.shift = -mean / std
+        self._buffers = threading.local()
+
+    @staticmethod
+    def decode(source: Union[str, bytes, Image.Image]) -> torch.Tensor:
+        """
+        Decode an image to a uint8 RGB tensor of shape (3, H, W).
+
+        :param source: File path, encoded image bytes or PIL Image object.
+        :return: uint8 image tensor.
+        """
+        if isinstance(source, Image.Image):
+            return F.pil_to_tensor(source.convert("RGB"))
+        data = read_file(source) if isinstance(source, str) else torch.frombuffer(bytearray(source), dtype=torch.uint8)
+        try:
+            return decode_image(data, mode=ImageReadMode.RGB)
+        except RuntimeError:
+            # Formats torchvision cannot decode natively go through PIL
+            with Image.open(source if isinstance(source, str) else io.BytesIO(source)) as image:
+                return F.pil_to_tensor(image.convert("RGB"))
+
+    def resize(self, image: torch.Tensor) -> torch.Tensor:
+        """
+        Resize a uint8 image tensor to the model input size.
+
+        :param image: uint8 tensor of shape (3, H, W).
+        :return: uint8 tensor of shape (3, *size).
+        """
+        if tuple(image.shape[-2:]) == self.size:
+            return image
+        return F.resize(image, list(self.size), antialias=True)
+
+    def load(self, source: Union[str, bytes, Image.Image]) -> torch.Tensor:
+        """
+        Decode and resize one image; safe to call from worker threads.
+
+        :param source: File path, encoded image bytes or PIL Image object.
+        :return: uint8 tensor of shape (3, *size).
+        """
+        return self.resize(self.decode(source))
+
+    def _buffers_for(self, batch_size: int) -> Tuple[torch.Tensor, torch.Tensor]:
+        """Return this thread's uint8 staging and float output buffers, growing them if needed"""
+        staging = getattr(self._buffers, "staging", None)
+        if staging is None or staging.shape[0] < batch_size:
+            staging = torch.empty((batch_size, 3) + self.size, dtype=torch.uint8)
+            self._buffers.staging = staging
+            self._buffers.output = torch.empty(staging.shape, dtype=torch.float32)
+        return staging[:batch_size], self._buffers.output[:batch_size]
+
+    def normalize_batch(self, images: List[torch.Tensor], out: torch.Tensor = None) -> torch.Tensor:
+        """
+        Stack resized uint8 images and normalize them in one fused op.
+
+        Without ``out`` the result is a view of a per-thread buffer that is
+        overwritten by the next call on the same thread; pass ``out`` (or copy)
+        when the tensor has to outlive that.
+
+        :param images: uint8 tensors of shape (3, *size).
+        :param out: Optional float32 tensor of shape (N, 3, *size) to write into.
+        :return: Normalized float32 batch of shape (N, 3, *size).
+        """
+        staging, output = self._buffers_for(len(images))
+        if out is not None:
+            output = out
+        torch.stack(images, out=staging)
+        torch.mul(staging, self.scale, out=output)
+        return output.add_(self.shift)
+
+    def __call__(self, image: Union[str, bytes, Image.Image]) -> torch.Tensor:
+        """
+        Preprocess a single image into a freshly allocated (1, 3, *size) tensor.
+
+        :param image: File path, encoded image bytes or PIL Image object.
+        :return: Normalized float32 tensor with a batch dimension.
+        """
+        out = torch.empty((1, 3) + self.size, dtype=torch.float32)
+        return self.normalize_batch([self.load(image)], out=out)
+
+
+# Shared instance used by Prediction
+default_preprocessor = Preprocessor()
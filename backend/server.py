@@ -0,0 +1,195 @@
+import io
+import json
+import signal
+import asyncio
+import logging
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple, Union
+from urllib.parse import parse_qs, urlsplit
+
+from PIL import Image
+
+from metrics import metrics
+from prediction_service import PredictionService
+from waste_classification import WasteClassificationService
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 503: "Service Unavailable"}
+
+
+class RequestError(Exception):
+    """A malformed or rejected HTTP request"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class InferenceServer:
+    """
+    Standalone asyncio HTTP front end for PredictionService.
+
+    Endpoints:
+        - POST /predict?model=<name>  body: raw image bytes -> prediction, category and guidelines as JSON
+        - GET /healthz                 liveness: the event loop is responsive
+        - GET /readyz                  readiness: models are loaded and the server is not overloaded
+        - GET /metrics                 pipeline metrics in Prometheus text format
+        - GET /metrics.json            the same metrics as a JSON snapshot
+
+    Decoding and forward passes run in a thread pool so the event loop only does I/O;
+    concurrent requests meet in the model's batching engine. At most ``max_pending``
+    requests are admitted at once; beyond that the server answers 503 with
+    Retry-After instead of queueing without bound.
+    """
+
+    def __init__(self, host: str = "0.0.0.0", port: int = 8000, workers: int = 8, max_pending: int = 64,
+                 max_body_bytes: int = 20 * 2 ** 20, models=("AlexNet",), logger: Optional[logging.Logger] = None):
+        self.host = host
+        self.port = port
+        self.max_pending = max_pending
+        self.max_body_bytes = max_body_bytes
+        self.models = list(models)
+        self.logger = logger or logging.getLogger(__name__)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="inference")
+        self.pending = 0
+        self.ready = False
+
+    async def start(self) -> asyncio.AbstractServer:
+        loop = asyncio.get_running_loop()
+        server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.logger.info(f"Listening on {self.host}:{self.port}, warming up {self.models}")
+        await loop.run_in_executor(self.executor, PredictionService.warm_up, self.models)
+        self.ready = True
+        self.logger.info("Models loaded, ready for requests")
+        return server
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                method, target, headers, body = request
+                status, payload, extra_headers = await self._dispatch(method, target, body)
+                keep_alive = headers.get("connection", "").lower() != "close"
+                await self._write_response(writer, status, payload, extra_headers, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except RequestError as e:
+            await self._write_response(writer, e.status, {"status": e.status, "message": f"Error: {e}"}, {}, False)
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+        """Parse one HTTP/1.1 request; None when the client closed the connection"""
+        request_line = await reader.readline()
+        if not request_line.strip():
+            return None
+        try:
+            method, target, _ = request_line.decode("latin-1").split(" ", 2)
+        except ValueError:
+            raise RequestError(400, "malformed request line")
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            raise RequestError(400, "invalid Content-Length")
+        if length > self.max_body_bytes:
+            raise RequestError(413, f"request body too large ({length} bytes)")
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), target, headers, body
+
+    async def _dispatch(self, method: str, target: str, body: bytes) -> Tuple[int, Union[Dict, str], Dict[str, str]]:
+        url = urlsplit(target)
+        if url.path == "/metrics":
+            return 200, metrics.render_prometheus(), {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+        if url.path == "/metrics.json":
+            return 200, metrics.snapshot(), {}
+        if url.path == "/healthz":
+            return 200, {"status": "ok"}, {}
+        if url.path == "/readyz":
+            ready = self.ready and self.pending < self.max_pending
+            return (200 if ready else 503), {"ready": ready, "pending": self.pending}, {}
+        if url.path != "/predict":
+            return 404, {"status": 404, "message": "Not found"}, {}
+        if method != "POST":
+            return 405, {"status": 405, "message": "Use POST"}, {"Allow": "POST"}
+        if not self.ready or self.pending >= self.max_pending:
+            return 503, {"status": 503, "message": "Server busy, retry later"}, {"Retry-After": "1"}
+
+        model_name = parse_qs(url.query).get("model", [self.models[0]])[0]
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self.executor, self._classify, body, model_name)
+        finally:
+            self.pending -= 1
+        return result.get("status", 200), result, {}
+
+    @staticmethod
+    def _classify(body: bytes, model_name: str) -> Dict:
+        """Decode, predict and attach disposal guidance; runs in a worker thread"""
+        try:
+            with metrics.timer("prediction_stage_seconds", {"stage": "decode"}):
+                image = Image.open(io.BytesIO(body)).convert("RGB")
+            prediction_result = PredictionService.predict_image(image, model_name=model_name)
+        except Exception as e:
+            return {"status": 400, "message": f"Error: {e}"}
+        return WasteClassificationService.process_prediction_result(prediction_result)
+
+    @staticmethod
+    async def _write_response(writer: asyncio.StreamWriter, status: int, payload: Union[Dict, str],
+                              extra_headers: Dict[str, str], keep_alive: bool):
+        body = (payload if isinstance(payload, str) else json.dumps(payload, ensure_ascii=False)).encode()
+        headers = {
+            "Content-Type": "application/json; charset=utf-8",
+            "Content-Length": str(len(body)),
+            "Connection": "keep-alive" if keep_alive else "close",
+            **extra_headers,
+        }
+        head = f"HTTP/1.1 {status} {REASONS.get(status, 'Error')}\r\n" + \
+               "".join(f"{k}: {v}\r\n" for k, v in headers.items()) + "\r\n"
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+
+async def serve(server: InferenceServer):
+    listener = await server.start()
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:  # Windows
+            pass
+    async with listener:
+        await stop.wait()
+    server.executor.shutdown(wait=True)
+    PredictionService.unload()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP inference service for waste classification")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=8, help="Threads for decoding and inference")
+    parser.add_argument("--max-pending", type=int, default=64, help="Requests admitted before answering 503")
+    parser.add_argument("--models", nargs="+", default=["AlexNet"], help="Models to warm up; the first is the default")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s: %(message)s',
+                        datefmt='%Y-%m-%d %H:%M:%S')
+    asyncio.run(serve(InferenceServer(args.host, args.port, args.workers, args.max_pending, models=args.models)))
+
+
+if __name__ == '__main__':
+    main()
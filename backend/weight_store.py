@@ -0,0 +1,122 @@
+import os
+import sys
+import json
+import mmap
+import struct
+from typing import Dict
+
+import torch
+
+# Flat weight file layout:
+#   MAGIC | uint64 little-endian header length | JSON header | padding | tensor data
+# The header maps every state_dict key to {"dtype", "shape", "offset", "nbytes"}. The data
+# section starts at the first ALIGNMENT boundary after the header and offsets are relative
+# to it, each aligned to ALIGNMENT bytes.
+MAGIC = b"SBWEIGHT"
+ALIGNMENT = 64
+FLAT_SUFFIX = ".sbw"
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def save_flat(state_dict: Dict[str, torch.Tensor], path: str):
+    """
+    Write a state dict as a flat, mmap-able weight file.
+
+    :param state_dict: Mapping of parameter names to tensors.
+    :param path: Output file.
+    """
+    tensors = {name: t.detach().cpu().contiguous() for name, t in state_dict.items()}
+    entries, offset = {}, 0
+    for name, tensor in tensors.items():
+        nbytes = tensor.element_size() * tensor.nelement()
+        entries[name] = {"dtype": str(tensor.dtype).replace("torch.", ""), "shape": list(tensor.shape),
+                         "offset": offset, "nbytes": nbytes}
+        offset = _align(offset + nbytes)
+
+    header = json.dumps(entries).encode()
+    data_start = _align(len(MAGIC) + 8 + len(header))
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC + struct.pack("<Q", len(header)) + header)
+        for name, tensor in tensors.items():
+            f.write(b"\0" * (data_start + entries[name]["offset"] - f.tell()))
+            if tensor.nelement():
+                f.write(tensor.reshape(-1).view(torch.uint8).numpy().tobytes())
+    os.replace(tmp_path, path)
+
+
+def load_flat(path: str) -> Dict[str, torch.Tensor]:
+    """
+    Map a flat weight file into tensors without copying or unpickling.
+
+    The file is mapped copy-on-write: tensors share the page cache until a
+    parameter is modified, so loading costs one mmap call regardless of file size
+    and processes loading the same file share physical memory.
+
+    :param path: Flat weight file.
+    :return: Mapping of parameter names to tensors backed by the mapping.
+    """
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a flat weight file")
+        (header_length,) = struct.unpack("<Q", f.read(8))
+        entries = json.loads(f.read(header_length))
+        data_start = _align(len(MAGIC) + 8 + header_length)
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+
+    state = {}
+    for name, entry in entries.items():
+        dtype = getattr(torch, entry["dtype"])
+        count = entry["nbytes"] // torch.empty((), dtype=dtype).element_size()
+        if count:
+            tensor = torch.frombuffer(mapping, dtype=dtype, count=count, offset=data_start + entry["offset"])
+        else:
+            tensor = torch.empty(0, dtype=dtype)
+        state[name] = tensor.view(entry["shape"])
+    return state
+
+
+def is_flat_file(path: str) -> bool:
+    return path.endswith(FLAT_SUFFIX)
+
+
+def preferred_weights(path: str) -> str:
+    """
+    Use the converted flat file next to a checkpoint when it is at least as new.
+
+    :param path: Path of a .pth checkpoint.
+    :return: The flat file path if available, else the original path.
+    """
+    flat_path = os.path.splitext(path)[0] + FLAT_SUFFIX
+    if os.path.isfile(flat_path) and (not os.path.isfile(path) or os.path.getmtime(flat_path) >= os.path.getmtime(path)):
+        return flat_path
+    return path
+
+
+def convert_checkpoint(path: str) -> str:
+    """
+    Convert a .pth checkpoint (state dict, {'state_dict': ...} or pickled model) to the flat format.
+
+    This is the only place that unpickles a checkpoint, so run it on trusted files only.
+
+    :param path: Checkpoint to convert.
+    :return: Path of the written flat file.
+    """
+    state = torch.load(path, map_location="cpu", weights_only=False)
+    if isinstance(state, torch.nn.Module):
+        state = state.state_dict()
+    elif isinstance(state, dict) and 'state_dict' in state:
+        state = state['state_dict']
+    out_path = os.path.splitext(path)[0] + FLAT_SUFFIX
+    save_flat(state, out_path)
+    return out_path
+
+
+if __name__ == '__main__':
+    # Usage: python weight_store.py weights/AlexNet_model_92.04%.pth [...]
+    for checkpoint in sys.argv[1:]:
+        print(f"{checkpoint} -> {convert_checkpoint(checkpoint)}")
@@ -0,0 +1,151 @@
+import copy
+import time
+import queue
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+import torch
+import torch.multiprocessing as mp
+
+
+def _worker_main(model: torch.nn.Module, input_buffer: torch.Tensor, output_buffer: torch.Tensor,
+                 connection, num_threads: int):
+    """
+    Worker process loop: run the shared model on the first ``n`` rows of the shared input buffer.
+
+    The parent sends the row count over the pipe and receives either None (success,
+    logits are in the shared output buffer) or an error message.
+    """
+    torch.set_num_threads(num_threads)
+    model.eval()
+    with torch.no_grad():
+        while True:
+            n = connection.recv()
+            if n is None:
+                break
+            try:
+                output_buffer[:n].copy_(model(input_buffer[:n]))
+                connection.send(None)
+            except Exception as e:
+                connection.send(f"{type(e).__name__}: {e}")
+
+
+class ProcessPoolModel:
+    """
+    Callable stand-in for a model that runs forward passes in a pool of worker processes.
+
+    A CPU copy of the parameters is moved to shared memory once and handed to every
+    worker, so N workers hold one copy of the weights; the model passed in (usually the
+    registry's, possibly on CUDA and used by other predictors) is left untouched. Each worker owns a shared input and output
+    buffer sized for ``max_batch_size`` images: the parent copies a batch into it,
+    signals the row count over a pipe and reads the logits back, so image data never
+    goes through pickling. Calls from several threads run on different workers in
+    parallel; a call blocks while all workers are busy.
+
+    Only float CPU models are supported: quantized packed weights cannot be shared.
+    """
+
+    def __init__(self, model: torch.nn.Module, num_classes: int, num_workers: int = 2, threads_per_worker: int = 1,
+                 max_batch_size: int = 32, input_shape=(3, 224, 224), logger: Optional[logging.Logger] = None):
+        self.logger = logger or logging.getLogger(__name__)
+        self.max_batch_size = max_batch_size
+        # The model this pool was built from, to tell when the registry has replaced it
+        self.source = model
+        self.model = copy.deepcopy(model).cpu().eval()
+        self.model.share_memory()
+
+        context = mp.get_context("spawn")
+        self._idle: "queue.Queue[int]" = queue.Queue()
+        self._workers = []
+        for worker_id in range(num_workers):
+            input_buffer = torch.empty((max_batch_size,) + tuple(input_shape)).share_memory_()
+            output_buffer = torch.empty(max_batch_size, num_classes).share_memory_()
+            parent_end, child_end = context.Pipe()
+            process = context.Process(
+                target=_worker_main,
+                args=(self.model, input_buffer, output_buffer, child_end, threads_per_worker),
+                name=f"inference-worker-{worker_id}",
+                daemon=True
+            )
+            process.start()
+            self._workers.append((process, parent_end, input_buffer, output_buffer))
+            self._idle.put(worker_id)
+        self.logger.info(f"Started {num_workers} inference workers x {threads_per_worker} threads")
+
+    @property
+    def num_workers(self) -> int:
+        return len(self._workers)
+
+    def eval(self):
+        """Workers always run in eval mode; kept for nn.Module call compatibility"""
+        return self
+
+    def state_dict(self):
+        """The shared parameters, as held by the parent process"""
+        return self.model.state_dict()
+
+    def __call__(self, batch: torch.Tensor) -> torch.Tensor:
+        """
+        Run a forward pass on an idle worker.
+
+        :param batch: Preprocessed images of shape (N, C, H, W); split when N exceeds max_batch_size.
+        :return: Logits of shape (N, num_classes).
+        """
+        if batch.shape[0] > self.max_batch_size:
+            return torch.cat([self(chunk) for chunk in batch.split(self.max_batch_size)])
+
+        worker_id = self._idle.get()
+        try:
+            _, connection, input_buffer, output_buffer = self._workers[worker_id]
+            n = batch.shape[0]
+            input_buffer[:n].copy_(batch)
+            connection.send(n)
+            error = connection.recv()
+            if error is not None:
+                raise RuntimeError(f"Inference worker {worker_id} failed: {error}")
+            return output_buffer[:n].clone()
+        finally:
+            self._idle.put(worker_id)
+
+    def close(self, timeout: float = 5.0):
+        """Stop all workers once they finish their current batch."""
+        for _ in self._workers:
+            worker_id = self._idle.get()
+            self._workers[worker_id][1].send(None)
+        for process, connection, _, _ in self._workers:
+            process.join(timeout)
+            connection.close()
+
+
+def scaling_benchmark(model: torch.nn.Module, num_classes: int, worker_counts: List[int], batches: int = 32,
+                      batch_size: int = 8, threads_per_worker: int = 1) -> List[dict]:
+    """
+    Measure throughput of the process pool for several worker counts.
+
+    :param model: Float model to serve.
+    :param num_classes: Number of output classes.
+    :param worker_counts: Pool sizes to try.
+    :param batches: Number of batches pushed through each pool.
+    :param batch_size: Images per batch.
+    :param threads_per_worker: torch intra-op threads per worker.
+    :return: One record per pool size with images/sec.
+    """
+    batch = torch.randn(batch_size, 3, 224, 224)
+    results = []
+    for workers in worker_counts:
+        pool = ProcessPoolModel(model, num_classes, workers, threads_per_worker, max_batch_size=batch_size)
+        try:
+            pool(batch)  # warm-up
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                start = time.perf_counter()
+                list(executor.map(lambda _: pool(batch), range(batches)))
+                elapsed = time.perf_counter() - start
+        finally:
+            pool.close()
+        results.append({
+            "workers": workers,
+            "threads_per_worker": threads_per_worker,
+            "images_per_sec": batches * batch_size / elapsed,
+        })
+    return results
@@ -0,0 +1,218 @@
+import time
+import datetime
+import threading
+from typing import Callable, Dict, Iterable, List, Optional
+
+import pandas as pd
+
+import rollups
+from database import COLLECT_RUBBISH, COLLECTION_STATS, DUSTBINS, NOTIFICATION, RUBBISH, USER_ACCOUNT
+from storage import (COLLECTION_FIELDS, DUSTBIN_FIELDS, NOTIFICATION_FIELDS, PERIOD_FIELDS, RUBBISH_FIELDS,
+                     TOTAL_FIELDS, USER_FIELDS, get_store)
+
+# How long cached reads are served before going back to the database. Writes made
+# through this module invalidate the affected collections immediately; the TTL only
+# bounds staleness for writes made by other processes (e.g. the sensor ingestion).
+CACHE_TTL_SECONDS = 30
+
+# Default page size of the raw collection history table
+HISTORY_PAGE_SIZE = 50
+
+# Period units accepted by collection_totals_by_period
+PERIOD_UNITS = rollups.PERIOD_SCOPES
+
+
+class TTLCache:
+    """Thread-safe cache of query results, invalidated per collection or by age"""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: Dict[tuple, tuple] = {}
+
+    def get_or_load(self, key: tuple, collections: Iterable[str], loader: Callable):
+        """
+        Return the cached value for ``key`` or compute it with ``loader``.
+
+        :param key: Cache key; the first element should identify the query.
+        :param collections: Collections the result depends on, for invalidation.
+        :param loader: Zero-argument function running the query.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                return entry[2]
+        value = loader()
+        with self._lock:
+            self._entries[key] = (now + self.ttl, frozenset(collections), value)
+        return value
+
+    def invalidate(self, *collections: str):
+        """Drop cached results depending on any of the given collections (all when none given)."""
+        with self._lock:
+            if not collections:
+                self._entries.clear()
+                return
+            stale = [k for k, (_, deps, _) in self._entries.items() if deps.intersection(collections)]
+            for key in stale:
+                del self._entries[key]
+
+
+_cache = TTLCache(CACHE_TTL_SECONDS)
+
+
+def invalidate(*collections: str):
+    """Drop cached reads for the given collections (all when none given)."""
+    _cache.invalidate(*collections)
+
+
+def _frame(key: tuple, collections: Iterable[str], loader: Callable[[], List[Dict]], columns: List[str]) -> pd.DataFrame:
+    """Run a store read through the cache and return a fresh DataFrame copy"""
+    def load():
+        return pd.DataFrame(loader(), columns=columns)
+    # Callers rename/filter in place, so never hand out the cached frame itself
+    return _cache.get_or_load(key, collections, load).copy()
+
+
+# --- Reads ---
+
+def load_dustbins(statuses: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Dustbins for the location tab, optionally filtered by status in the store.
+
+    :param statuses: Only return bins whose status is in this list.
+    :return: DataFrame with DUSTBIN_FIELDS columns.
+    """
+    return _frame(("dustbins", tuple(statuses or ())), [DUSTBINS], lambda: get_store().dustbins(statuses),
+                  DUSTBIN_FIELDS)
+
+
+def load_uncollected_notifications() -> pd.DataFrame:
+    """
+    :return: Notifications not yet collected, with NOTIFICATION_FIELDS columns.
+    """
+    return _frame(("uncollected_notifications",), [NOTIFICATION], get_store().uncollected_notifications,
+                  NOTIFICATION_FIELDS)
+
+
+def load_rubbish_types() -> pd.DataFrame:
+    """
+    :return: Rubbish types and their current price per kg.
+    """
+    return _frame(("rubbish_types",), [RUBBISH], get_store().rubbish_types, RUBBISH_FIELDS)
+
+
+def load_collection_history(page: int = 0, page_size: int = HISTORY_PAGE_SIZE) -> pd.DataFrame:
+    """
+    One page of collection records, newest first.
+
+    :param page: Zero-based page number.
+    :param page_size: Records per page.
+    :return: DataFrame with COLLECTION_FIELDS columns.
+    """
+    return _frame(("collection_history", page, page_size), [COLLECT_RUBBISH],
+                  lambda: get_store().collection_history(page, page_size), COLLECTION_FIELDS)
+
+
+def count_collection_history() -> int:
+    """
+    :return: Number of collection records, for paging.
+    """
+    return _cache.get_or_load(("collection_count",), [COLLECT_RUBBISH], get_store().count_collection_history)
+
+
+def collection_totals_by_type() -> pd.DataFrame:
+    """
+    :return: Total weight, value and record count per rubbish type.
+    """
+    return _frame(("totals_by_type",), [COLLECTION_STATS], lambda: get_store().totals("type"), TOTAL_FIELDS["type"])
+
+
+def collection_totals_by_dustbin(limit: int = 20) -> pd.DataFrame:
+    """
+    :param limit: Number of dustbins to return, heaviest first.
+    :return: Total weight, value, record count and last collection time per dustbin.
+    """
+    return _frame(("totals_by_dustbin", limit), [COLLECTION_STATS], lambda: get_store().totals("dustbin", limit),
+                  TOTAL_FIELDS["dustbin"])
+
+
+def collection_totals_by_period(unit: str = "month", since: Optional[datetime.datetime] = None) -> pd.DataFrame:
+    """
+    Total weight and value per time bucket and rubbish type.
+
+    :param unit: One of PERIOD_UNITS.
+    :param since: Only include buckets starting at or after this time.
+    :return: DataFrame with period, rubbish_type, weight and value columns, oldest period first.
+    """
+    if unit not in PERIOD_UNITS:
+        raise ValueError(f"Unsupported period unit: {unit}. Available: {PERIOD_UNITS}")
+    return _frame(("totals_by_period", unit, since), [COLLECTION_STATS],
+                  lambda: get_store().period_totals(unit, since), PERIOD_FIELDS)
+
+
+def users_with_uncollected_bins() -> pd.DataFrame:
+    """
+    Owners of dustbins that have an uncollected notification, joined in the store.
+
+    :return: DataFrame with USER_FIELDS columns.
+    """
+    return _frame(("users_with_uncollected_bins",), [NOTIFICATION, USER_ACCOUNT],
+                  get_store().users_with_uncollected_bins, USER_FIELDS)
+
+
+def get_dustbin(dustbin_id: str) -> Optional[Dict]:
+    """Single dustbin document (without _id), or None."""
+    return _cache.get_or_load(("dustbin", dustbin_id), [DUSTBINS], lambda: get_store().get_dustbin(dustbin_id))
+
+
+def get_user_account(dustbin_id: str) -> Optional[Dict]:
+    """User account owning a dustbin (without _id), or None."""
+    return _cache.get_or_load(("user_account", dustbin_id), [USER_ACCOUNT],
+                              lambda: get_store().get_user_account(dustbin_id))
+
+
+# --- Writes (each invalidates the collections it touches) ---
+
+def add_dustbin(dustbin_id: str, location: str, status: str = "Empty") -> bool:
+    """
+    Register a new dustbin unless its ID or location is already taken.
+
+    :return: True if inserted, False for a duplicate.
+    """
+    added = get_store().add_dustbin(dustbin_id, location, status)
+    if added:
+        invalidate(DUSTBINS)
+    return added
+
+
+def update_prices(prices: Dict[str, float]):
+    """Set the price per kg of each rubbish type."""
+    get_store().update_prices(prices)
+    invalidate(RUBBISH)
+
+
+def place_collection_order(dustbin_id: str, name: str, phone: str, email: str, address: str):
+    """
+    Mark a user's dustbin as full, update (or create) the bin and account, and notify the admin.
+    """
+    get_store().place_collection_order(dustbin_id, name, phone, email, address)
+    invalidate(DUSTBINS, USER_ACCOUNT, NOTIFICATION)
+
+
+def settle_reward(owner_name: str, total_value: float, chart_data: List[Dict]) -> Optional[float]:
+    """
+    Credit a reward to an owner, close their notification, empty their bin and log the collection.
+
+    The whole settlement is one transaction with an atomic increment of the reward, so
+    concurrent settlements never overwrite each other (see the store implementations).
+
+    :param owner_name: Owner selected in the reward form.
+    :param total_value: Reward to add.
+    :param chart_data: Collected items as {"Rubbish Type", "Weight (kg)", "Value ($)"} dicts.
+    :return: The owner's new total reward, or None if the owner does not exist.
+    """
+    new_reward = get_store().settle_reward(owner_name, total_value, chart_data)
+    invalidate(USER_ACCOUNT, NOTIFICATION, DUSTBINS, COLLECT_RUBBISH, COLLECTION_STATS)
+    return new_reward
@@ -0,0 +1,165 @@
+import os
+import time
+import threading
+from typing import Dict
+
+from dotenv import load_dotenv
+from pymongo import MongoClient, monitoring
+
+load_dotenv()
+
+DB_NAME = "smartbin"
+
+# Collection names of the smartbin database
+DUSTBINS = "dustbins"
+NOTIFICATION = "notification"
+COLLECT_RUBBISH = "collectRubbish"
+USER_ACCOUNT = "userAccount"
+RUBBISH = "rubbish"
+# Pre-aggregated collection totals maintained by rollups.py
+COLLECTION_STATS = "collectRubbishStats"
+
+# Client settings, overridable through the environment (.env)
+MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "2"))
+MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000"))
+CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "20000"))
+WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "2000"))
+RETRY_READS = os.getenv("MONGO_RETRY_READS", "true").lower() == "true"
+RETRY_WRITES = os.getenv("MONGO_RETRY_WRITES", "true").lower() == "true"
+# Transactions always read from the primary regardless of this setting
+READ_PREFERENCE = os.getenv("MONGO_READ_PREFERENCE", "primary")
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """Connection pool event counters and checkout wait times for the shared client"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.connections_created = 0
+        self.connections_closed = 0
+        self.checked_out = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.checkout_wait_total = 0.0
+        self.checkout_wait_max = 0.0
+        self.pool_clears = 0
+
+    def stats(self) -> Dict[str, float]:
+        """
+        :return: Open and in-use connections, checkout counts and wait times in milliseconds.
+        """
+        with self._lock:
+            return {
+                "max_pool_size": MAX_POOL_SIZE,
+                "open_connections": self.connections_created - self.connections_closed,
+                "in_use": self.checked_out,
+                "utilisation": self.checked_out / MAX_POOL_SIZE,
+                "connections_created": self.connections_created,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "checkout_wait_mean_ms": 1000 * self.checkout_wait_total / self.checkouts if self.checkouts else 0.0,
+                "checkout_wait_max_ms": 1000 * self.checkout_wait_max,
+                "pool_clears": self.pool_clears,
+            }
+
+    # Checkouts happen on the requesting thread, so the start time is kept thread-local
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        wait = time.perf_counter() - getattr(self._local, "started", time.perf_counter())
+        with self._lock:
+            self.checked_out += 1
+            self.checkouts += 1
+            self.checkout_wait_total += wait
+            self.checkout_wait_max = max(self.checkout_wait_max, wait)
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.checkout_failures += 1
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
+
+    def connection_created(self, event):
+        with self._lock:
+            self.connections_created += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.connections_closed += 1
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pool_clears += 1
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+
+pool_metrics = PoolMetrics()
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> MongoClient:
+    """
+    Return the process-wide MongoClient, creating it on first use.
+
+    Streamlit re-executes the app script on every interaction, but imported modules
+    persist, so the client (and its connection pool) survives reruns and sessions.
+    The client is thread-safe; every app and worker thread in the process shares it.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = MongoClient(
+                    os.getenv("MONGO_URI"),
+                    maxPoolSize=MAX_POOL_SIZE,
+                    minPoolSize=MIN_POOL_SIZE,
+                    maxIdleTimeMS=MAX_IDLE_TIME_MS,
+                    connectTimeoutMS=CONNECT_TIMEOUT_MS,
+                    serverSelectionTimeoutMS=SERVER_SELECTION_TIMEOUT_MS,
+                    socketTimeoutMS=SOCKET_TIMEOUT_MS,
+                    waitQueueTimeoutMS=WAIT_QUEUE_TIMEOUT_MS,
+                    retryReads=RETRY_READS,
+                    retryWrites=RETRY_WRITES,
+                    readPreference=READ_PREFERENCE,
+                    event_listeners=[pool_metrics]
+                )
+    return _client
+
+
+def get_database():
+    """Return the smartbin database handle."""
+    return get_client()[DB_NAME]
+
+
+def pool_stats() -> Dict[str, float]:
+    """Connection pool utilisation of the shared client (see PoolMetrics.stats)."""
+    return pool_metrics.stats()
+
+
+def close_client():
+    """Close the shared client, e.g. at shutdown; the next get_client() opens a new one."""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
@@ -1,24 +1,73 @@
 import os
-from dotenv import load_dotenv 
-from pymongo import MongoClient
+import sys
+import tempfile
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 
-load_dotenv()
+from database import (COLLECT_RUBBISH, DUSTBINS, NOTIFICATION, RUBBISH, USER_ACCOUNT, get_client, get_database,
+                      pool_stats)
+from storage import SUPPORTED_STORES, MongoStore, SQLiteStore
 
-# Database setup and connection
-client = MongoClient(os.getenv("MONGO_URI"))
-db = client["smartbin"]
+# Shared pooled client (see database.py)
+db = get_database()
 
 # Collections
-dustbin_col = db["dustbins"]
-notification_col = db["notification"]
-collect_rubbish_col = db["collectRubbish"]
-user_account_col = db["userAccount"]
-rubbish_col = db["rubbish"]
-
-sample = dustbin_col.find_one()
-# print(sample)
-
-# sample_df = pd.DataFrame(sample, index=[0])
-dustbin_df = pd.DataFrame(list(dustbin_col.find()))
-print(dustbin_df)
\ No newline at end of file
+dustbin_col = db[DUSTBINS]
+notification_col = db[NOTIFICATION]
+collect_rubbish_col = db[COLLECT_RUBBISH]
+user_account_col = db[USER_ACCOUNT]
+rubbish_col = db[RUBBISH]
+
+
+@contextmanager
+def scratch_store(kind):
+    """An empty store of the given kind, removed afterwards, so checks never touch live data."""
+    if kind == "sqlite":
+        with tempfile.TemporaryDirectory() as directory:
+            yield SQLiteStore(os.path.join(directory, "check.db"))
+    else:
+        client = get_client()
+        try:
+            yield MongoStore(client["smartbin_check"])
+        finally:
+            client.drop_database("smartbin_check")
+
+
+def check_concurrent_settlement(store, settlements=50, workers=8, reward=1.25):
+    """Settle rewards for one owner from many threads and verify that none is lost."""
+    owner, dustbin_id, rubbish_type = "__settlement_check__", "__CHECK__", "__check__"
+    chart_data = [{"Rubbish Type": rubbish_type, "Weight (kg)": 1.0, "Value ($)": reward}]
+
+    store.ensure_schema()
+    # A new bin, so the order also creates the owner's account with no reward yet
+    store.place_collection_order(dustbin_id, owner, "", "", "Settlement check")
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(lambda _: store.settle_reward(owner, reward, chart_data), range(settlements)))
+
+    total = store.get_user_account(dustbin_id)["total_reward"]
+    records = store.count_collection_history()
+    rollup = next((row for row in store.totals("type") if row["rubbish_type"] == rubbish_type), {})
+    expected = settlements * reward
+    print(f"total_reward={total} (expected {expected}), records={records} (expected {settlements}), "
+          f"rollup records={rollup.get('records')}")
+    return total == expected and records == settlements and rollup.get("records") == settlements
+
+
+if __name__ == '__main__':
+    # Usage: python dbtest.py [settlement [sqlite] [mongo]]   (settlement checks both stores by default)
+    if sys.argv[1:2] == ["settlement"]:
+        passed = True
+        for kind in sys.argv[2:] or SUPPORTED_STORES:
+            with scratch_store(kind) as store:
+                print(f"{kind}:")
+                passed = check_concurrent_settlement(store) and passed
+        print(f"Connection pool: {pool_stats()}")
+        sys.exit(0 if passed else 1)
+
+    sample = dustbin_col.find_one()
+    # print(sample)
+
+    # sample_df = pd.DataFrame(sample, index=[0])
+    dustbin_df = pd.DataFrame(list(dustbin_col.find()))
+    print(dustbin_df)
\ No newline at end of file
@@ -0,0 +1,206 @@
+import sys
+import json
+import math
+import time
+import random
+import asyncio
+import logging
+import argparse
+import platform
+from typing import Dict, List, Optional
+
+from ingestion import BinStateTable, IngestionService, MemorySink
+
+# Fill level -> status the firmware reports. "Low" means little capacity left.
+STATUS_THRESHOLDS = ((0.4, "Empty"), (0.75, "Half-full"), (math.inf, "Low"))
+CALIBRATION_LINE = "Calibrating..."
+
+
+def status_for(level: float) -> str:
+    for threshold, status in STATUS_THRESHOLDS:
+        if level < threshold:
+            return status
+    return STATUS_THRESHOLDS[-1][1]
+
+
+class SimulatedBin:
+    """
+    One smart bin: a fill level rising linearly to full, read by a noisy sensor.
+
+    Full bins are emptied after a random delay and start filling again.
+    """
+
+    __slots__ = ("dustbin_id", "fill_rate", "noise", "level", "emptied_at", "status", "status_since", "next_due")
+
+    def __init__(self, dustbin_id: str, fill_seconds: float, noise: float, start: float):
+        self.dustbin_id = dustbin_id
+        self.fill_rate = 1.0 / fill_seconds
+        self.noise = noise
+        self.level = random.random()
+        self.emptied_at = None
+        self.status = None
+        self.status_since = start
+        self.next_due = start
+
+    def read(self, now: float, elapsed: float) -> str:
+        """Advance the fill curve by ``elapsed`` seconds and return a (noisy) status reading."""
+        if self.level >= 1.0:
+            if self.emptied_at is None:
+                self.emptied_at = now + random.uniform(5.0, 30.0)
+            elif now >= self.emptied_at:
+                self.level, self.emptied_at = 0.0, None
+        else:
+            self.level = min(1.0, self.level + self.fill_rate * elapsed)
+        status = status_for(self.level + random.gauss(0.0, self.noise))
+        if status != self.status:
+            # Start of a run of this reading, the reference point for end-to-end lag
+            self.status, self.status_since = status, now
+        return status
+
+
+class FleetSimulator:
+    """
+    Emulates a fleet of bins reporting through TCP gateways into the ingestion service.
+
+    Bins are spread over ``gateways`` connections speaking the ``<dustbin_id>,<status>``
+    line protocol. Each bin reports every ``interval`` seconds (phases are staggered),
+    and a ``calibration_rate`` fraction of lines are calibration chatter that ingestion
+    must skip.
+    """
+
+    def __init__(self, bins: int, gateways: int = 10, interval: float = 1.0, noise: float = 0.03,
+                 fill_seconds=(60.0, 600.0), calibration_rate: float = 0.01, prefix: str = "FLEET"):
+        start = time.perf_counter()
+        self.interval = interval
+        self.calibration_rate = calibration_rate
+        self.bins: Dict[str, SimulatedBin] = {}
+        for i in range(bins):
+            dustbin_id = f"{prefix}{i + 1:05d}"
+            simulated = SimulatedBin(dustbin_id, random.uniform(*fill_seconds), noise, start)
+            simulated.next_due = start + random.uniform(0, interval)
+            self.bins[dustbin_id] = simulated
+        ids = list(self.bins)
+        self.gateways = [ids[i::gateways] for i in range(max(1, min(gateways, bins)))]
+        self.lines_sent = 0
+        self.readings_sent = 0
+        self.lags: List[float] = []
+
+    def record_write(self, events):
+        """Sink callback: lag from the start of the reading run to the write."""
+        now = time.perf_counter()
+        for event in events:
+            simulated = self.bins.get(event.dustbin_id)
+            if simulated is not None and simulated.status == event.status:
+                self.lags.append(now - simulated.status_since)
+
+    async def run_gateway(self, host: str, port: int, dustbin_ids: List[str], until: float, tick: float = 0.05):
+        _, writer = await asyncio.open_connection(host, port)
+        try:
+            while (now := time.perf_counter()) < until:
+                lines = []
+                for dustbin_id in dustbin_ids:
+                    simulated = self.bins[dustbin_id]
+                    if simulated.next_due > now:
+                        continue
+                    simulated.next_due += self.interval
+                    lines.append(f"{dustbin_id},{simulated.read(now, self.interval)}\n")
+                    if random.random() < self.calibration_rate:
+                        lines.append(CALIBRATION_LINE + "\n")
+                if lines:
+                    writer.write("".join(lines).encode())
+                    await writer.drain()
+                    self.lines_sent += len(lines)
+                    self.readings_sent += sum(1 for line in lines if "," in line)
+                await asyncio.sleep(tick)
+        finally:
+            writer.close()
+
+
+async def run_load_test(simulator: FleetSimulator, service: IngestionService, duration: float,
+                        host: str = "127.0.0.1") -> Dict:
+    """
+    Drive the ingestion service with the fleet for ``duration`` seconds.
+
+    :return: Sustained throughput, end-to-end lag and write amplification.
+    """
+    server = await service.serve_tcp(host, 0)
+    port = server.sockets[0].getsockname()[1]
+    flusher = asyncio.create_task(service.run_flusher())
+
+    start = time.perf_counter()
+    await asyncio.gather(*(simulator.run_gateway(host, port, ids, start + duration) for ids in simulator.gateways))
+    # Let the last lines arrive and the final window flush
+    await asyncio.sleep(service.flush_interval + 0.2)
+    service.stop()
+    server.close()
+    await flusher
+    elapsed = time.perf_counter() - start
+
+    stats = service.stats()
+    lags = sorted(simulator.lags)
+
+    def lag_percentile(p: float) -> float:
+        return 1000 * lags[min(len(lags) - 1, int(p / 100 * len(lags)))] if lags else 0.0
+
+    return {
+        "bins": len(simulator.bins),
+        "gateways": len(simulator.gateways),
+        "duration_s": elapsed,
+        "lines_sent": simulator.lines_sent,
+        "readings_sent": simulator.readings_sent,
+        "events_per_sec": stats["events"] / elapsed,
+        "lines_per_sec": stats["lines"] / elapsed,
+        "transitions_written": stats["flushed_events"],
+        "writes": stats["writes"],
+        "write_amplification": stats["writes"] / stats["events"] if stats["events"] else 0.0,
+        "lag_p50_ms": lag_percentile(50),
+        "lag_p95_ms": lag_percentile(95),
+        "lag_max_ms": 1000 * lags[-1] if lags else 0.0,
+        "ingestion": stats,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Smart bin fleet simulator and ingestion load generator")
+    parser.add_argument("--bins", type=int, default=2000)
+    parser.add_argument("--gateways", type=int, default=20, help="TCP connections the bins are spread over")
+    parser.add_argument("--interval", type=float, default=1.0, help="Seconds between readings of one bin")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to run")
+    parser.add_argument("--noise", type=float, default=0.03, help="Sensor noise (std dev of the fill level)")
+    parser.add_argument("--fill-seconds", type=float, nargs=2, default=[60.0, 600.0], metavar=("MIN", "MAX"),
+                        help="Range of time a bin takes from empty to full")
+    parser.add_argument("--calibration-rate", type=float, default=0.01, help="Fraction of calibration lines")
+    parser.add_argument("--flush-ms", type=float, default=200.0)
+    parser.add_argument("--max-batch", type=int, default=500)
+    parser.add_argument("--confirm-readings", type=int, default=3)
+    parser.add_argument("--no-state", action="store_true", help="Write every reading (baseline for amplification)")
+    parser.add_argument("--latency-ms", type=float, default=2.0, help="Emulated round trip per bulk write")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    random.seed(args.seed)
+    simulator = FleetSimulator(args.bins, args.gateways, args.interval, args.noise, tuple(args.fill_seconds),
+                               args.calibration_rate)
+    sink = MemorySink(args.latency_ms, on_write=simulator.record_write)
+    states = None if args.no_state else BinStateTable(args.confirm_readings)
+    service = IngestionService(sink, args.flush_ms, args.max_batch, states)
+
+    results = asyncio.run(run_load_test(simulator, service, args.duration))
+    report = {
+        "benchmark": "fleet",
+        "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")},
+        "config": vars(args),
+        "results": results,
+    }
+    print(json.dumps(report, indent=4))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,538 @@
+import os
+import sys
+import time
+import random
+import signal
+import asyncio
+import logging
+import argparse
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import serial
+
+import storage
+
+# Status lines the bin firmware prints (see the Arduino sketch)
+VALID_STATUSES = ("Empty", "Half-full", "Low")
+DEFAULT_LOCATION = "Block A"
+DEFAULT_BIN_TYPE = "recycle"
+
+
+class BinEvent:
+    """One status reading of a dustbin"""
+
+    __slots__ = ("dustbin_id", "status", "timestamp", "received", "source")
+
+    def __init__(self, dustbin_id: str, status: str, source: str = ""):
+        self.dustbin_id = dustbin_id
+        self.status = status
+        self.timestamp = datetime.datetime.now()
+        # Monotonic receive time, for end-to-end lag
+        self.received = time.perf_counter()
+        self.source = source
+
+
+def parse_line(line: str, default_dustbin_id: Optional[str] = None, source: str = "") -> Optional[BinEvent]:
+    """
+    Parse one line of the sensor protocol.
+
+    A line is either a bare status (``Half-full``) from a port wired to a single bin, or
+    ``<dustbin_id>,<status>`` from a gateway multiplexing several bins. Anything else
+    (debug output, calibration messages) is ignored.
+
+    :param line: Decoded line without the newline.
+    :param default_dustbin_id: Bin the source is wired to, for bare status lines.
+    :param source: Name of the source, for logging.
+    :return: The event, or None if the line is not a status reading.
+    """
+    line = line.strip()
+    if "," in line:
+        dustbin_id, status = (part.strip() for part in line.split(",", 1))
+    else:
+        dustbin_id, status = default_dustbin_id, line
+    if not dustbin_id or status not in VALID_STATUSES:
+        return None
+    return BinEvent(dustbin_id, status, source)
+
+
+class BinState:
+    """Persisted status of one bin plus the candidate status it may be moving to"""
+
+    __slots__ = ("status", "candidate", "candidate_count", "candidate_since")
+
+    def __init__(self, status: Optional[str] = None):
+        self.status = status
+        self.candidate = None
+        self.candidate_count = 0
+        self.candidate_since = 0.0
+
+
+class BinStateTable:
+    """
+    In-memory status of every bin, so only real transitions are written.
+
+    A reading equal to the persisted status is dropped. A different status becomes a
+    candidate and is only accepted once it has been read ``confirm_readings`` times in
+    a row and has lasted ``min_dwell_ms``; a reading in between resets the candidate.
+    This debounces a sensor flickering between two levels around a threshold, which
+    would otherwise flip the bin (and its notification) on every line. The first reading
+    of a bin that is not in the table is accepted at once.
+
+    Other processes change statuses too (settling a reward empties the bin), so the
+    table must be reconciled with the store periodically; otherwise a bin settled while
+    its sensor still reads the old status would never be written again.
+    """
+
+    def __init__(self, confirm_readings: int = 3, min_dwell_ms: float = 0.0):
+        self.confirm_readings = max(1, confirm_readings)
+        self.min_dwell = min_dwell_ms / 1000
+        self._states: Dict[str, BinState] = {}
+
+    def seed(self, statuses: Dict[str, str]):
+        """Load the statuses already stored, so a restart does not rewrite every bin."""
+        for dustbin_id, status in statuses.items():
+            self._states[dustbin_id] = BinState(status)
+
+    def reconcile(self, statuses: Dict[str, str], skip=()) -> int:
+        """
+        Replace the table with the statuses stored now.
+
+        :param statuses: Stored status of every bin.
+        :param skip: Bins with a write still pending, whose entry is already newer than the store.
+        :return: Number of bins whose status differed from the store.
+        """
+        changed = 0
+        for dustbin_id in list(self._states):
+            if dustbin_id not in statuses and dustbin_id not in skip:
+                del self._states[dustbin_id]
+                changed += 1
+        for dustbin_id, status in statuses.items():
+            if dustbin_id in skip:
+                continue
+            state = self._states.get(dustbin_id)
+            if state is None or state.status != status:
+                self._states[dustbin_id] = BinState(status)
+                changed += 1
+        return changed
+
+    def observe(self, event: BinEvent) -> bool:
+        """
+        :param event: A new reading.
+        :return: True if the reading is a confirmed transition that must be persisted.
+        """
+        state = self._states.get(event.dustbin_id)
+        if state is None:
+            # Unknown bin: nothing stored to debounce against, so persist it right away
+            self._states[event.dustbin_id] = BinState(event.status)
+            return True
+        if event.status == state.status:
+            state.candidate = None
+            return False
+        if event.status != state.candidate:
+            state.candidate = event.status
+            state.candidate_count = 0
+            state.candidate_since = event.received
+        state.candidate_count += 1
+        if state.candidate_count < self.confirm_readings or event.received - state.candidate_since < self.min_dwell:
+            return False
+        state.status, state.candidate = event.status, None
+        return True
+
+    def __len__(self):
+        return len(self._states)
+
+
+class StoreSink:
+    """Writes batches of bin events to the configured store (bulk upserts on dustbins and notification)"""
+
+    def __init__(self, store, location: str = DEFAULT_LOCATION, bin_type: str = DEFAULT_BIN_TYPE):
+        self.store = store
+        self.location = location
+        self.bin_type = bin_type
+
+    def load_statuses(self) -> Dict[str, str]:
+        """
+        :return: Stored status of every bin, for seeding the state table.
+        """
+        return self.store.load_statuses()
+
+    def write(self, events: List[BinEvent]) -> int:
+        """
+        Upsert the latest status of each bin and raise its signal notification.
+
+        :param events: At most one event per bin.
+        :return: Number of write operations sent.
+        """
+        if not events:
+            return 0
+        return self.store.upsert_bin_statuses(events, self.location, self.bin_type)
+
+
+class MemorySink:
+    """
+    In-process stand-in for the database, for simulations and load tests.
+
+    Applies the same upserts as StoreSink to dicts and can add a fixed delay per bulk
+    write to emulate a network round trip.
+    """
+
+    def __init__(self, latency_ms: float = 0.0, on_write=None):
+        self.latency = latency_ms / 1000
+        self.on_write = on_write
+        self.statuses: Dict[str, str] = {}
+        self.notifications: Dict[str, datetime.datetime] = {}
+        self.bulk_writes = 0
+
+    def load_statuses(self) -> Dict[str, str]:
+        return dict(self.statuses)
+
+    def write(self, events: List[BinEvent]) -> int:
+        if not events:
+            return 0
+        if self.latency:
+            time.sleep(self.latency)
+        for event in events:
+            self.statuses[event.dustbin_id] = event.status
+            self.notifications[event.dustbin_id] = event.timestamp
+        self.bulk_writes += 2
+        if self.on_write is not None:
+            self.on_write(events)
+        return 2 * len(events)
+
+
+class IngestionService:
+    """
+    Asyncio sensor ingestion: many line sources in, coalesced bulk writes out.
+
+    Sources (serial ports, TCP gateway connections) push parsed events through the
+    optional state table, which drops readings that do not change a bin's status.
+    What is left goes into a pending table keyed by dustbin ID, so repeated changes of
+    a bin within one window collapse into its latest status. The table is flushed to the sink every ``flush_interval_ms``
+    or as soon as it holds ``max_batch`` bins; the write runs in a worker thread so the
+    event loop keeps reading while the database round trip is in flight.
+    """
+
+    def __init__(self, sink, flush_interval_ms: float = 200.0, max_batch: int = 500,
+                 states: Optional[BinStateTable] = None, reconcile_interval: float = 30.0,
+                 logger: Optional[logging.Logger] = None):
+        self.sink = sink
+        self.states = states
+        self.reconcile_interval = reconcile_interval
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_batch = max_batch
+        self.logger = logger or logging.getLogger(__name__)
+        self._pending: Dict[str, BinEvent] = {}
+        self._batch_ready: Optional[asyncio.Event] = None
+        self._flush_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingestion-flush")
+        self._serial_ports = []
+        self._gateways = set()
+        self._running = True
+        self.counters = {"lines": 0, "events": 0, "ignored": 0, "unchanged": 0, "coalesced": 0, "flushes": 0,
+                         "flushed_events": 0, "writes": 0, "flush_errors": 0, "reconciled": 0}
+        self._lag_total = 0.0
+        self._lag_max = 0.0
+
+    def submit(self, event: BinEvent):
+        """Add an event to the pending window (event loop thread only)."""
+        self.counters["events"] += 1
+        if self.states is not None and not self.states.observe(event):
+            self.counters["unchanged"] += 1
+            return
+        if event.dustbin_id in self._pending:
+            self.counters["coalesced"] += 1
+        self._pending[event.dustbin_id] = event
+        if len(self._pending) >= self.max_batch and self._batch_ready is not None:
+            self._batch_ready.set()
+
+    def handle_line(self, line: str, default_dustbin_id: Optional[str], source: str):
+        self.counters["lines"] += 1
+        event = parse_line(line, default_dustbin_id, source)
+        if event is None:
+            self.counters["ignored"] += 1
+            self.logger.debug(f"{source}: {line}")
+            return
+        self.submit(event)
+
+    async def flush(self):
+        """Write the pending window to the sink."""
+        if not self._pending:
+            return
+        events, self._pending = list(self._pending.values()), {}
+        loop = asyncio.get_running_loop()
+        try:
+            writes = await loop.run_in_executor(self._flush_executor, self.sink.write, events)
+        except Exception as e:
+            # Keep the newest reading per bin for the next attempt, unless a newer one arrived
+            self.counters["flush_errors"] += 1
+            self.logger.error(f"Flush of {len(events)} bins failed: {e}")
+            for event in events:
+                self._pending.setdefault(event.dustbin_id, event)
+            return
+        now = time.perf_counter()
+        for event in events:
+            lag = now - event.received
+            self._lag_total += lag
+            self._lag_max = max(self._lag_max, lag)
+        self.counters["flushes"] += 1
+        self.counters["flushed_events"] += len(events)
+        self.counters["writes"] += writes
+
+    async def run_flusher(self):
+        """Flush on the time window or when a full batch is pending, until stopped."""
+        self._batch_ready = asyncio.Event()
+        while self._running:
+            try:
+                await asyncio.wait_for(self._batch_ready.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._batch_ready.clear()
+            await self.flush()
+        await self.flush()
+
+    async def reconcile(self):
+        """Reload the state table from the store, picking up statuses written by other processes."""
+        loop = asyncio.get_running_loop()
+        # Runs on the flush thread, so it reads after any write in flight has landed
+        statuses = await loop.run_in_executor(self._flush_executor, self.sink.load_statuses)
+        changed = self.states.reconcile(statuses, skip=self._pending)
+        self.counters["reconciled"] += changed
+        if changed:
+            self.logger.info(f"Reconciled {changed} bins with the store")
+
+    async def run_reconciler(self):
+        """Reconcile the state table every ``reconcile_interval`` seconds until stopped."""
+        while self._running:
+            await asyncio.sleep(self.reconcile_interval)
+            try:
+                await self.reconcile()
+            except Exception as e:
+                self.logger.error(f"Reconciling bin states failed: {e}")
+
+    async def read_serial(self, port: str, dustbin_id: Optional[str], baudrate: int = 9600):
+        """
+        Read status lines from a serial port (or pty) until stopped.
+
+        pyserial has no asyncio API, so the blocking readline runs in a thread of its own
+        with a short timeout; lines are handed back to the event loop for parsing.
+        """
+        loop = asyncio.get_running_loop()
+        connection = serial.Serial(port=port, baudrate=baudrate, timeout=0.5)
+        self._serial_ports.append(connection)
+        self.logger.info(f"Reading {port}" + (f" as {dustbin_id}" if dustbin_id else ""))
+
+        done = loop.create_future()
+
+        def reader():
+            try:
+                while self._running:
+                    raw = connection.readline()
+                    if raw:
+                        line = raw.decode(errors='ignore').strip()
+                        loop.call_soon_threadsafe(self.handle_line, line, dustbin_id, port)
+            except Exception as e:
+                self.logger.error(f"{port}: {e}")
+            finally:
+                connection.close()
+                loop.call_soon_threadsafe(lambda: done.done() or done.set_result(None))
+
+        threading.Thread(target=reader, name=f"serial-{os.path.basename(port)}", daemon=True).start()
+        await done
+
+    async def serve_tcp(self, host: str, port: int) -> asyncio.AbstractServer:
+        """Accept gateway connections speaking the ``<dustbin_id>,<status>`` line protocol."""
+        async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+            peer = "{}:{}".format(*writer.get_extra_info("peername")[:2])
+            self._gateways.add(writer)
+            try:
+                while self._running:
+                    raw = await reader.readline()
+                    if not raw:
+                        break
+                    self.handle_line(raw.decode(errors='ignore'), None, peer)
+            except ConnectionError:
+                pass
+            finally:
+                self._gateways.discard(writer)
+                writer.close()
+
+        server = await asyncio.start_server(handle, host, port)
+        self.logger.info(f"Accepting sensor gateways on {host}:{port}")
+        return server
+
+    def calibrate(self):
+        """Send Enter to every serial bin, which triggers sensor calibration."""
+        for connection in self._serial_ports:
+            if connection.is_open:
+                connection.write(b'\n')
+        self.logger.info(f"Calibrating {len(self._serial_ports)} bins...")
+
+    def stop(self):
+        """Stop reading; open gateway connections are closed, serial readers exit within their timeout."""
+        self._running = False
+        for writer in list(self._gateways):
+            writer.close()
+        if self._batch_ready is not None:
+            self._batch_ready.set()
+
+    def stats(self) -> Dict[str, float]:
+        """
+        :return: Line/event/write counters, coalescing ratio and end-to-end lag in milliseconds.
+        """
+        flushed = self.counters["flushed_events"]
+        events = self.counters["events"]
+        return dict(
+            self.counters,
+            pending=len(self._pending),
+            tracked_bins=len(self.states) if self.states is not None else 0,
+            writes_per_event=self.counters["writes"] / events if events else 0.0,
+            lag_mean_ms=1000 * self._lag_total / flushed if flushed else 0.0,
+            lag_max_ms=1000 * self._lag_max,
+        )
+
+
+class PtySimulator:
+    """
+    Stand-in for Arduino bins: one pseudo-terminal per bin printing random status lines.
+
+    The slave side of each pty behaves like a serial port, so the ingestion path is
+    exercised unchanged without hardware (POSIX only).
+    """
+
+    def __init__(self, count: int, interval: float = 1.0, prefix: str = "SIM"):
+        import tty
+        self.interval = interval
+        self.bins = []
+        for i in range(count):
+            master, slave = os.openpty()
+            tty.setraw(slave)
+            self.bins.append((f"{prefix}{i + 1:03d}", master, slave, os.ttyname(slave)))
+
+    @property
+    def ports(self) -> Dict[str, str]:
+        """Dustbin ID -> serial device path"""
+        return {dustbin_id: port for dustbin_id, _, _, port in self.bins}
+
+    async def run(self):
+        while True:
+            for _, master, _, _ in self.bins:
+                os.write(master, (random.choice(VALID_STATUSES) + "\r\n").encode())
+            await asyncio.sleep(self.interval)
+
+    def close(self):
+        for _, master, slave, _ in self.bins:
+            os.close(master)
+            os.close(slave)
+
+
+def _watch_stdin(loop: asyncio.AbstractEventLoop, service: IngestionService, stop: asyncio.Event):
+    """Console control on a daemon thread: Enter calibrates, 'q' quits"""
+    for line in sys.stdin:
+        if line.strip().lower() == 'q':
+            loop.call_soon_threadsafe(stop.set)
+            return
+        if not line.strip():
+            loop.call_soon_threadsafe(service.calibrate)
+
+
+async def serve(service: IngestionService, serial_sources: Dict[str, Optional[str]], tcp: Optional[str] = None,
+                simulator: Optional[PtySimulator] = None, stats_interval: float = 10.0):
+    """
+    Run the ingestion service until SIGINT/SIGTERM or 'q' on stdin.
+
+    :param service: The ingestion service.
+    :param serial_sources: Serial port -> dustbin ID (None for gateways sending IDs).
+    :param tcp: Optional "host:port" to accept gateway connections on.
+    :param simulator: Optional pty simulator whose ports are added as sources.
+    :param stats_interval: Seconds between stats log lines.
+    """
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:  # Windows
+            pass
+    if sys.stdin and sys.stdin.isatty():
+        threading.Thread(target=_watch_stdin, args=(loop, service, stop), daemon=True).start()
+
+    sources = dict(serial_sources)
+    tasks = []
+    if simulator is not None:
+        sources.update({port: dustbin_id for dustbin_id, port in simulator.ports.items()})
+        tasks.append(asyncio.create_task(simulator.run()))
+    readers = [asyncio.create_task(service.read_serial(port, dustbin_id)) for port, dustbin_id in sources.items()]
+    flusher = asyncio.create_task(service.run_flusher())
+    if service.states is not None and service.reconcile_interval > 0:
+        tasks.append(asyncio.create_task(service.run_reconciler()))
+    server = None
+    if tcp:
+        host, port = tcp.rsplit(":", 1)
+        server = await service.serve_tcp(host, int(port))
+
+    async def report():
+        while True:
+            await asyncio.sleep(stats_interval)
+            service.logger.info(f"Ingestion stats: {service.stats()}")
+    tasks.append(asyncio.create_task(report()))
+
+    print("Connected. Press Enter to calibrate, or 'q' to quit.")
+    await stop.wait()
+
+    # Readers notice the stop within their read timeout; the flusher writes what is left
+    service.stop()
+    if server is not None:
+        server.close()
+    await asyncio.gather(*readers, return_exceptions=True)
+    await flusher
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    if simulator is not None:
+        simulator.close()
+    service.logger.info(f"Final ingestion stats: {service.stats()}")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Batched sensor ingestion for smart bins")
+    parser.add_argument("--serial", action="append", default=[], metavar="PORT[=DUSTBIN_ID]",
+                        help="Serial port to read; give the bin ID for ports wired to one bin (repeatable)")
+    parser.add_argument("--tcp", metavar="HOST:PORT", help="Accept '<dustbin_id>,<status>' lines over TCP")
+    parser.add_argument("--simulate", type=int, default=0, metavar="N", help="Add N simulated bins on ptys")
+    parser.add_argument("--simulate-interval", type=float, default=1.0, help="Seconds between simulated readings")
+    parser.add_argument("--flush-ms", type=float, default=200.0, help="Write window in milliseconds")
+    parser.add_argument("--max-batch", type=int, default=500, help="Bins per write before flushing early")
+    parser.add_argument("--location", default=DEFAULT_LOCATION, help="Location of bins first seen by ingestion")
+    parser.add_argument("--confirm-readings", type=int, default=3,
+                        help="Consecutive identical readings needed to accept a status change")
+    parser.add_argument("--min-dwell-ms", type=float, default=0.0,
+                        help="How long a new status must persist before it is accepted")
+    parser.add_argument("--reconcile-seconds", type=float, default=30.0,
+                        help="How often bin states are reloaded from the store (0 disables)")
+    parser.add_argument("--no-state", action="store_true", help="Write every reading, without change detection")
+    parser.add_argument("--store", choices=storage.SUPPORTED_STORES, default=None,
+                        help="Storage backend (default: SMARTBIN_STORE or mongo)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s: %(message)s',
+                        datefmt='%Y-%m-%d %H:%M:%S')
+    sources = {}
+    for spec in args.serial:
+        port, _, dustbin_id = spec.partition("=")
+        sources[port] = dustbin_id or None
+
+    store = storage.get_store(args.store)
+    sink = StoreSink(store, args.location)
+    states = None
+    if not args.no_state:
+        states = BinStateTable(args.confirm_readings, args.min_dwell_ms)
+        states.seed(sink.load_statuses())
+    service = IngestionService(sink, args.flush_ms, args.max_batch, states, args.reconcile_seconds)
+    simulator = PtySimulator(args.simulate, args.simulate_interval) if args.simulate else None
+    asyncio.run(serve(service, sources, args.tcp, simulator))
+
+
+if __name__ == '__main__':
+    main()
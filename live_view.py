@@ -0,0 +1,167 @@
+import time
+import logging
+import threading
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from database import DUSTBINS, NOTIFICATION
+from storage import DUSTBIN_FIELDS, LIVE_FIELDS, NOTIFICATION_FIELDS, Change, ChangeFeedLost, get_store
+
+# How long one poll of the change feed waits for changes, and how often the whole
+# view is reloaded to pick up anything a feed cannot see (e.g. deletes while polling
+# by timestamp, or writes that bypass the store)
+LIVE_POLL_SECONDS = 1.0
+LIVE_RESYNC_SECONDS = 300.0
+# Pause before reopening the feed after an error
+LIVE_RETRY_SECONDS = 5.0
+# Pause before reloading after the feed is lost; doubles while losses repeat
+LIVE_RELOAD_BACKOFF_SECONDS = 1.0
+LIVE_RELOAD_BACKOFF_MAX_SECONDS = 60.0
+
+
+class LiveView:
+    """
+    In-memory view of the dustbins and open notifications, kept current by a change feed.
+
+    A background thread loads a snapshot once and then applies each change to the
+    view, so keeping it current costs work per change instead of a full reload of
+    both collections per dashboard rerun. Reads return DataFrames built from memory
+    and cached until the next change.
+    """
+
+    def __init__(self, store=None, poll_seconds: float = LIVE_POLL_SECONDS,
+                 resync_seconds: float = LIVE_RESYNC_SECONDS, logger: Optional[logging.Logger] = None):
+        self.store = store
+        self.poll_seconds = poll_seconds
+        self.resync_seconds = resync_seconds
+        self.logger = logger or logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._tables: Dict[str, Dict[str, Dict]] = {DUSTBINS: {}, NOTIFICATION: {}}
+        self._frames: Dict[tuple, pd.DataFrame] = {}
+        self._ready = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.mode = None
+        self.version = 0
+        self.changes_applied = 0
+        self.resyncs = 0
+        self.last_change = None
+
+    def start(self) -> "LiveView":
+        """Start following changes in a daemon thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="live-view", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    @property
+    def ready(self) -> bool:
+        """True once the first snapshot is loaded"""
+        return self._ready.is_set()
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """
+        :return: True once the first snapshot is loaded.
+        """
+        return self._ready.wait(timeout)
+
+    def _run(self):
+        backoff = LIVE_RELOAD_BACKOFF_SECONDS
+        while not self._stop.is_set():
+            feed = None
+            try:
+                store = self.store or get_store()
+                # Step 1: Open the feed before reading the snapshot, so no change is missed
+                feed = store.change_feed(self.poll_seconds)
+                self._load(feed.snapshot(), feed.mode)
+                # Step 2: Apply changes until the next resync
+                resync_at = time.monotonic() + self.resync_seconds
+                while not self._stop.is_set() and time.monotonic() < resync_at:
+                    changes = feed.poll(self.poll_seconds)
+                    if changes:
+                        self._apply(changes)
+                backoff = LIVE_RELOAD_BACKOFF_SECONDS
+            except ChangeFeedLost as e:
+                # Keep serving the current view rather than reloading in a tight loop
+                self.logger.info(f"Reloading live view in {backoff:.0f}s: {e}")
+                self._stop.wait(backoff)
+                backoff = min(2 * backoff, LIVE_RELOAD_BACKOFF_MAX_SECONDS)
+            except Exception as e:
+                self.logger.error(f"Live view feed failed: {e}")
+                self._stop.wait(LIVE_RETRY_SECONDS)
+            finally:
+                if feed is not None:
+                    feed.close()
+
+    def _load(self, snapshot: Dict[str, Dict[str, Dict]], mode: str):
+        with self._lock:
+            self._tables = {DUSTBINS: {}, NOTIFICATION: {}}
+            for collection, docs in snapshot.items():
+                for key, doc in docs.items():
+                    self._patch(collection, key, doc)
+            self._frames.clear()
+            self.mode = mode
+            self.version += 1
+            self.resyncs += 1
+        self._ready.set()
+        self.logger.info(f"Live view loaded {len(self._tables[DUSTBINS])} dustbins and "
+                         f"{len(self._tables[NOTIFICATION])} open notifications ({mode})")
+
+    def _patch(self, collection: str, key: str, doc: Optional[Dict]):
+        """Apply one change; closed notifications leave the view. Caller holds the lock."""
+        table = self._tables[collection]
+        if doc is None or (collection == NOTIFICATION and doc.get("isCollected")):
+            table.pop(key, None)
+        else:
+            table[key] = {field: doc.get(field) for field in LIVE_FIELDS[collection]}
+
+    def _apply(self, changes: List[Change]):
+        with self._lock:
+            for collection, key, doc in changes:
+                self._patch(collection, key, doc)
+            self._frames.clear()
+            self.version += 1
+            self.changes_applied += len(changes)
+            self.last_change = time.time()
+
+    def _frame(self, key: tuple, collection: str, columns: List[str], keep=None) -> pd.DataFrame:
+        with self._lock:
+            frame = self._frames.get(key)
+            if frame is None:
+                rows = [doc for doc in self._tables[collection].values() if keep is None or keep(doc)]
+                frame = self._frames[key] = pd.DataFrame(rows, columns=columns)
+        # Callers rename/filter in place, so never hand out the cached frame itself
+        return frame.copy()
+
+    def dustbins(self, statuses: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        :param statuses: Only return bins whose status is in this list.
+        :return: DataFrame with DUSTBIN_FIELDS columns, like data_layer.load_dustbins.
+        """
+        wanted = set(statuses or ())
+        return self._frame(("dustbins", tuple(sorted(wanted))), DUSTBINS, DUSTBIN_FIELDS,
+                           (lambda doc: doc["status"] in wanted) if wanted else None)
+
+    def uncollected_notifications(self) -> pd.DataFrame:
+        """
+        :return: DataFrame with NOTIFICATION_FIELDS columns, like data_layer.load_uncollected_notifications.
+        """
+        return self._frame(("uncollected_notifications",), NOTIFICATION, NOTIFICATION_FIELDS)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "dustbins": len(self._tables[DUSTBINS]),
+                "open_notifications": len(self._tables[NOTIFICATION]),
+                "changes_applied": self.changes_applied,
+                "resyncs": self.resyncs,
+                "last_change_age_s": round(time.time() - self.last_change, 1) if self.last_change else None,
+            }
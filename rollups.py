@@ -0,0 +1,147 @@
+import datetime
+from typing import Dict, Iterable, List
+
+from pymongo import UpdateOne
+
+from database import COLLECT_RUBBISH, COLLECTION_STATS, get_database
+
+# Rollup scopes maintained in the collection statistics collection. Each rollup document
+# holds the running weight, value and record count of one bucket:
+#   type    -> per rubbish type
+#   dustbin -> per dustbin (plus the last collection time)
+#   day/week/month -> per period start and rubbish type (weeks start on Monday)
+PERIOD_SCOPES = ("day", "week", "month")
+SCOPES = ("type", "dustbin") + PERIOD_SCOPES
+
+
+def period_start(timestamp: datetime.datetime, unit: str) -> datetime.datetime:
+    """
+    Truncate a timestamp to the start of its day, week (Monday) or month.
+
+    Matches ``$dateTrunc`` with ``startOfWeek: "monday"`` so backfilled and
+    incrementally updated buckets line up.
+    """
+    day = datetime.datetime(timestamp.year, timestamp.month, timestamp.day)
+    if unit == "day":
+        return day
+    if unit == "week":
+        return day - datetime.timedelta(days=day.weekday())
+    if unit == "month":
+        return day.replace(day=1)
+    raise ValueError(f"Unsupported period unit: {unit}. Available: {PERIOD_SCOPES}")
+
+
+def _bucket_id(scope: str, *parts) -> str:
+    return "|".join([scope] + [p.isoformat() if isinstance(p, datetime.datetime) else str(p) for p in parts])
+
+
+def rollup_buckets(records: Iterable[Dict]) -> Dict[str, Dict]:
+    """
+    Sum collection records into the rollup buckets they fall in.
+
+    :param records: collectRubbish documents (dustbin_id, timestamp, rubbish_type, weight, price).
+    :return: Bucket ID -> {"fields", "weight", "value", "records", "last_collected"}.
+    """
+    buckets: Dict[str, Dict] = {}
+
+    def add(bucket_id: str, fields: Dict, record: Dict):
+        bucket = buckets.setdefault(bucket_id, {"fields": fields, "weight": 0.0, "value": 0.0, "records": 0,
+                                                "last_collected": record["timestamp"]})
+        bucket["weight"] += record["weight"]
+        bucket["value"] += record["price"]
+        bucket["records"] += 1
+        bucket["last_collected"] = max(bucket["last_collected"], record["timestamp"])
+
+    for record in records:
+        add(_bucket_id("type", record["rubbish_type"]),
+            {"scope": "type", "rubbish_type": record["rubbish_type"]}, record)
+        add(_bucket_id("dustbin", record["dustbin_id"]),
+            {"scope": "dustbin", "dustbin_id": record["dustbin_id"]}, record)
+        for unit in PERIOD_SCOPES:
+            period = period_start(record["timestamp"], unit)
+            add(_bucket_id(unit, period, record["rubbish_type"]),
+                {"scope": unit, "period": period, "rubbish_type": record["rubbish_type"]}, record)
+    return buckets
+
+
+def rollup_updates(records: Iterable[Dict]) -> List[UpdateOne]:
+    """
+    Build the upserts that add collection records to every rollup bucket they fall in.
+
+    Records are pre-summed per bucket, so a settlement of N rubbish types costs one
+    update per touched bucket rather than one per record and bucket.
+
+    :param records: collectRubbish documents (dustbin_id, timestamp, rubbish_type, weight, price).
+    :return: UpdateOne operations for a bulk_write on the statistics collection.
+    """
+    return [
+        UpdateOne(
+            {"_id": bucket_id},
+            {"$setOnInsert": bucket["fields"],
+             "$inc": {"weight": bucket["weight"], "value": bucket["value"], "records": bucket["records"]},
+             "$max": {"last_collected": bucket["last_collected"]}},
+            upsert=True
+        )
+        for bucket_id, bucket in rollup_buckets(records).items()
+    ]
+
+
+def apply_rollups(records: Iterable[Dict], session=None, db=None):
+    """
+    Add newly inserted collection records to the rollups in one bulk write.
+
+    :param records: The collectRubbish documents just inserted.
+    :param session: Optional client session, to update rollups in the same transaction.
+    :param db: Database handle; defaults to the smartbin database.
+    """
+    updates = rollup_updates(records)
+    if updates:
+        (db if db is not None else get_database())[COLLECTION_STATS].bulk_write(updates, ordered=False,
+                                                                                 session=session)
+
+
+def backfill(batch_size: int = 1000, db=None) -> int:
+    """
+    Rebuild all rollups from the raw collection records.
+
+    Totals are computed by aggregation pipelines on the server and written in
+    batches. Run it while no rewards are being settled, otherwise settlements made
+    during the rebuild may be counted twice or lost.
+
+    :param batch_size: Rollup documents per bulk write.
+    :param db: Database handle; defaults to the smartbin database.
+    :return: Number of rollup documents written.
+    """
+    db = db if db is not None else get_database()
+    db[COLLECTION_STATS].delete_many({})
+
+    totals = {"weight": {"$sum": "$weight"}, "value": {"$sum": "$price"}, "records": {"$sum": 1},
+              "last_collected": {"$max": "$timestamp"}}
+    pipelines = {
+        "type": ({"rubbish_type": "$rubbish_type"}, ["rubbish_type"]),
+        "dustbin": ({"dustbin_id": "$dustbin_id"}, ["dustbin_id"]),
+    }
+    for unit in PERIOD_SCOPES:
+        trunc = {"$dateTrunc": {"date": "$timestamp", "unit": unit, "startOfWeek": "monday"}}
+        pipelines[unit] = ({"period": trunc, "rubbish_type": "$rubbish_type"}, ["period", "rubbish_type"])
+
+    written, batch = 0, []
+    for scope, (group_key, key_fields) in pipelines.items():
+        for row in db[COLLECT_RUBBISH].aggregate([{"$group": dict(totals, _id=group_key)}], allowDiskUse=True):
+            key = {field: row["_id"][field] for field in key_fields}
+            doc = dict(key, scope=scope, weight=row["weight"], value=row["value"],
+                       records=row["records"], last_collected=row["last_collected"])
+            batch.append(UpdateOne({"_id": _bucket_id(scope, *key.values())}, {"$set": doc}, upsert=True))
+            if len(batch) >= batch_size:
+                db[COLLECTION_STATS].bulk_write(batch, ordered=False)
+                written, batch = written + len(batch), []
+    if batch:
+        db[COLLECTION_STATS].bulk_write(batch, ordered=False)
+        written += len(batch)
+    return written
+
+
+if __name__ == '__main__':
+    # Usage: python rollups.py   (rebuilds the collection statistics of the configured store, see storage.py)
+    import storage
+    print(f"Wrote {storage.get_store().rebuild_rollups()} rollup documents")
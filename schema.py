@@ -0,0 +1,156 @@
+import sys
+import logging
+import datetime
+from typing import Dict, List, Optional
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+from database import (COLLECT_RUBBISH, COLLECTION_STATS, DUSTBINS, NOTIFICATION, RUBBISH, USER_ACCOUNT,
+                      get_database)
+
+logger = logging.getLogger(__name__)
+
+# Indexes of the smartbin database, per collection. Names are explicit so that
+# re-running ensure_indexes is a no-op and changed definitions fail loudly instead
+# of silently creating a second index.
+INDEXES: Dict[str, List[IndexModel]] = {
+    DUSTBINS: [
+        IndexModel([("dustbin_id", ASCENDING)], name="dustbin_id_unique", unique=True),
+        IndexModel([("location", ASCENDING)], name="location"),
+        IndexModel([("status", ASCENDING)], name="status"),
+        IndexModel([("updated_at", ASCENDING), ("_id", ASCENDING)], name="updated_at_id"),
+    ],
+    NOTIFICATION: [
+        IndexModel([("dustbin_id", ASCENDING), ("isCollected", ASCENDING)], name="dustbin_id_isCollected"),
+        IndexModel([("isCollected", ASCENDING), ("dustbin_id", ASCENDING)], name="isCollected_dustbin_id"),
+        IndexModel([("timestamp", DESCENDING)], name="timestamp"),
+        IndexModel([("updated_at", ASCENDING), ("_id", ASCENDING)], name="updated_at_id"),
+    ],
+    USER_ACCOUNT: [
+        IndexModel([("dustbin_id", ASCENDING)], name="dustbin_id"),
+        IndexModel([("owner_name", ASCENDING)], name="owner_name"),
+    ],
+    COLLECT_RUBBISH: [
+        IndexModel([("timestamp", DESCENDING)], name="timestamp"),
+        IndexModel([("dustbin_id", ASCENDING), ("timestamp", DESCENDING)], name="dustbin_id_timestamp"),
+    ],
+    RUBBISH: [
+        IndexModel([("type", ASCENDING)], name="type_unique", unique=True),
+    ],
+    COLLECTION_STATS: [
+        IndexModel([("scope", ASCENDING), ("period", ASCENDING)], name="scope_period"),
+        IndexModel([("scope", ASCENDING), ("weight", DESCENDING)], name="scope_weight"),
+    ],
+}
+
+# Point lookups and filtered reads issued by admin.py, backend/app.py and detection.py
+# (through data_layer and the live view). Each is (description, collection, filter, sort); none may plan
+# a full collection scan.
+HOT_QUERIES = [
+    ("dustbin by id", DUSTBINS, {"dustbin_id": "BIN001"}, None),
+    ("dustbin by id or location", DUSTBINS, {"$or": [{"dustbin_id": "BIN001"}, {"location": "Block A"}]}, None),
+    ("dustbins by status", DUSTBINS, {"status": {"$in": ["Full"]}}, None),
+    ("notification by dustbin", NOTIFICATION, {"dustbin_id": "BIN001"}, None),
+    ("open notification of dustbin", NOTIFICATION, {"dustbin_id": "BIN001", "isCollected": False}, None),
+    ("uncollected notifications", NOTIFICATION, {"isCollected": False}, None),
+    ("dustbins changed since", DUSTBINS, {"updated_at": {"$gte": datetime.datetime(2025, 1, 1)}}, None),
+    ("notifications changed since", NOTIFICATION, {"updated_at": {"$gte": datetime.datetime(2025, 1, 1)}}, None),
+    ("user account by dustbin", USER_ACCOUNT, {"dustbin_id": "BIN001"}, None),
+    ("user account by owner", USER_ACCOUNT, {"owner_name": "owner"}, None),
+    ("rubbish type", RUBBISH, {"type": "Plastic"}, None),
+    ("collection history page", COLLECT_RUBBISH, {}, [("timestamp", DESCENDING)]),
+    ("rollups by scope", COLLECTION_STATS, {"scope": "month"}, [("period", ASCENDING)]),
+    ("top dustbins", COLLECTION_STATS, {"scope": "dustbin"}, [("weight", DESCENDING)]),
+]
+
+_ensured = False
+
+
+def ensure_indexes(force: bool = False, db=None, strict: bool = True) -> List[str]:
+    """
+    Create all declared indexes. Idempotent; runs once per process unless forced.
+
+    Unique indexes cannot be built while the collection holds duplicates (E11000), and
+    an existing index with the same keys under another name conflicts
+    (IndexOptionsConflict); clean those up and re-run ``python schema.py``.
+
+    :param force: Re-apply even if already done in this process.
+    :param db: Database to index; defaults to the smartbin database (and is always applied when given).
+    :param strict: Raise OperationFailure on the first index that cannot be built; otherwise
+        log it, skip it and build the rest.
+    :return: "<collection>.<index>" of every index that could not be built (non-strict only).
+    """
+    global _ensured
+    if _ensured and not force and db is None:
+        return []
+    database = db if db is not None else get_database()
+    failed = []
+    for collection, indexes in INDEXES.items():
+        try:
+            names = database[collection].create_indexes(indexes)
+            logger.debug(f"Indexes on {collection}: {names}")
+        except OperationFailure:
+            if strict:
+                raise
+            # One bad index fails the whole command; build the others one by one
+            for index in indexes:
+                name = index.document["name"]
+                try:
+                    database[collection].create_indexes([index])
+                except OperationFailure as e:
+                    failed.append(f"{collection}.{name}")
+                    logger.error(f"Index {collection}.{name} not built ({e}); "
+                                 f"fix the data and run 'python schema.py'")
+    if db is None and not failed:
+        _ensured = True
+    return failed
+
+
+def _plan_stages(plan: Dict) -> List[str]:
+    """All stage names in a (nested) explain plan"""
+    stages = [plan["stage"]] if "stage" in plan else []
+    for child_key in ("inputStage", "inputStages", "queryPlan"):
+        children = plan.get(child_key)
+        if isinstance(children, dict):
+            children = [children]
+        for child in children or []:
+            stages += _plan_stages(child)
+    return stages
+
+
+def check_query_plans(queries: Optional[List] = None) -> List[str]:
+    """
+    Explain every hot query and report those whose winning plan scans a whole collection.
+
+    :param queries: (description, collection, filter, sort) tuples; defaults to HOT_QUERIES.
+    :return: One message per query planning a COLLSCAN (empty when all use indexes).
+    """
+    db = get_database()
+    failures = []
+    for description, collection, query, sort in queries or HOT_QUERIES:
+        cursor = db[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        stages = _plan_stages(cursor.explain()["queryPlanner"]["winningPlan"])
+        if "COLLSCAN" in stages:
+            failures.append(f"{description}: {collection}.find({query}) plans {' <- '.join(stages)}")
+    return failures
+
+
+def main() -> int:
+    logging.basicConfig(level=logging.INFO)
+    ensure_indexes(force=True)
+    failures = check_query_plans()
+    for failure in failures:
+        logger.error(f"Collection scan: {failure}")
+    if failures:
+        return 1
+    logger.info(f"All {len(HOT_QUERIES)} hot queries use indexes")
+    return 0
+
+
+if __name__ == '__main__':
+    # Usage: python schema.py   (applies indexes, exits 1 if any hot query plans a COLLSCAN)
+    # Unique indexes need duplicate dustbin_id/type documents removed first; this run fails on them
+    sys.exit(main())
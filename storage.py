@@ -0,0 +1,1051 @@
+import os
+import sys
+import json
+import time
+import logging
+import sqlite3
+import argparse
+import datetime
+import platform
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pymongo import DESCENDING, ReadPreference, ReturnDocument, UpdateOne
+from pymongo.errors import OperationFailure
+
+import rollups
+import schema
+from database import (COLLECT_RUBBISH, COLLECTION_STATS, DUSTBINS, NOTIFICATION, RUBBISH, USER_ACCOUNT, get_client,
+                      get_database)
+
+# Fields each dashboard view displays; everything else stays in the store
+DUSTBIN_FIELDS = ["dustbin_id", "status", "location", "type"]
+NOTIFICATION_FIELDS = ["dustbin_id", "location", "timestamp", "notification_type"]
+RUBBISH_FIELDS = ["type", "price"]
+USER_FIELDS = ["owner_name", "dustbin_id"]
+COLLECTION_FIELDS = ["dustbin_id", "timestamp", "rubbish_type", "weight", "price"]
+TOTAL_FIELDS = {
+    "type": ["rubbish_type", "weight", "value", "records"],
+    "dustbin": ["dustbin_id", "weight", "value", "records", "last_collected"],
+}
+PERIOD_FIELDS = ["period", "rubbish_type", "weight", "value"]
+
+# Fields the live dashboard view keeps per collection (isCollected decides whether a
+# notification stays in the view)
+LIVE_FIELDS = {
+    DUSTBINS: DUSTBIN_FIELDS,
+    NOTIFICATION: NOTIFICATION_FIELDS + ["isCollected"],
+}
+
+logger = logging.getLogger(__name__)
+
+# Backend selection: SMARTBIN_STORE=mongo (default) or sqlite
+STORE_KIND = os.getenv("SMARTBIN_STORE", "mongo")
+# The default file is untracked (see .gitignore); the bundled waste_management.db is left alone
+SQLITE_PATH = os.getenv("SMARTBIN_SQLITE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                             "smartbin.db"))
+SUPPORTED_STORES = ("mongo", "sqlite")
+
+# Change feeds: at most this many changes are returned per poll (and collection).
+# Timestamp polling only reads stamps at least this old, to tolerate clock skew between
+# writers and writes still in flight. The SQLite change log keeps this many entries.
+CHANGE_BATCH_SIZE = 1000
+POLL_SETTLE_SECONDS = 2.0
+CHANGE_LOG_RETAIN = 10000
+
+# (collection, document key, document or None when deleted)
+Change = Tuple[str, str, Optional[Dict]]
+
+
+class ChangeFeedLost(Exception):
+    """The feed can no longer be resumed (log pruned, stream invalidated); reload the snapshot."""
+
+
+def collection_records(dustbin_id: str, chart_data: List[Dict], timestamp: datetime.datetime) -> List[Dict]:
+    """collectRubbish rows for the items of one settlement"""
+    return [{
+        "dustbin_id": dustbin_id,
+        "timestamp": timestamp,
+        "rubbish_type": entry["Rubbish Type"],
+        "weight": entry["Weight (kg)"],
+        "price": entry["Value ($)"]
+    } for entry in chart_data]
+
+
+class Store(ABC):
+    """
+    Storage operations of the smartbin apps over the five collections plus the rollups.
+
+    Reads return plain dicts with the field names of the Mongo documents, so callers
+    do not depend on the backend. Implementations: MongoStore, SQLiteStore; a backend
+    missing any operation cannot be instantiated.
+    """
+
+    @abstractmethod
+    def ensure_schema(self):
+        """Create tables/indexes (idempotent)."""
+        ...
+
+    # --- Dashboard reads ---
+
+    @abstractmethod
+    def dustbins(self, statuses: Optional[List[str]] = None) -> List[Dict]:
+        ...
+
+    @abstractmethod
+    def uncollected_notifications(self) -> List[Dict]:
+        ...
+
+    @abstractmethod
+    def users_with_uncollected_bins(self) -> List[Dict]:
+        ...
+
+    @abstractmethod
+    def rubbish_types(self) -> List[Dict]:
+        ...
+
+    @abstractmethod
+    def collection_history(self, page: int, page_size: int) -> List[Dict]:
+        ...
+
+    @abstractmethod
+    def count_collection_history(self) -> int:
+        ...
+
+    @abstractmethod
+    def totals(self, scope: str, limit: int = 0) -> List[Dict]:
+        """Rollup rows of the "type" (by rubbish type) or "dustbin" (heaviest first) scope."""
+        ...
+
+    @abstractmethod
+    def period_totals(self, unit: str, since: Optional[datetime.datetime] = None) -> List[Dict]:
+        """Rollup rows of a period scope, oldest first."""
+        ...
+
+    @abstractmethod
+    def get_dustbin(self, dustbin_id: str) -> Optional[Dict]:
+        ...
+
+    @abstractmethod
+    def get_user_account(self, dustbin_id: str) -> Optional[Dict]:
+        ...
+
+    # --- Writes ---
+
+    @abstractmethod
+    def add_dustbin(self, dustbin_id: str, location: str, status: str) -> bool:
+        ...
+
+    @abstractmethod
+    def update_prices(self, prices: Dict[str, float]):
+        ...
+
+    @abstractmethod
+    def place_collection_order(self, dustbin_id: str, name: str, phone: str, email: str, address: str):
+        ...
+
+    @abstractmethod
+    def settle_reward(self, owner_name: str, total_value: float, chart_data: List[Dict]) -> Optional[float]:
+        ...
+
+    @abstractmethod
+    def rebuild_rollups(self) -> int:
+        """
+        Recompute all rollups from the raw collection records (run while no rewards are settled).
+
+        :return: Number of rollup rows written.
+        """
+        ...
+
+    # --- Sensor ingestion ---
+
+    @abstractmethod
+    def load_statuses(self) -> Dict[str, str]:
+        """Stored status of every bin"""
+        ...
+
+    @abstractmethod
+    def upsert_bin_statuses(self, events: Iterable, location: str, bin_type: str) -> int:
+        """
+        Write the latest status of each bin and raise its signal notification.
+
+        :param events: ingestion.BinEvent objects, at most one per bin.
+        :return: Number of write operations.
+        """
+        ...
+
+    # --- Change feed ---
+
+    @abstractmethod
+    def change_feed(self, poll_seconds: float = 1.0):
+        """
+        Open a feed of changes to dustbins and notifications.
+
+        The feed's ``snapshot()`` returns the LIVE_FIELDS of every dustbin and open
+        notification keyed by document ID; ``poll(timeout)`` then returns the changes
+        made since, as ``Change`` tuples, and raises ChangeFeedLost when it falls too
+        far behind. ``close()`` releases it.
+
+        :param poll_seconds: Interval of backends that poll for changes.
+        """
+        ...
+
+
+class MongoStore(Store):
+    """Store on the smartbin MongoDB database (the shared pooled client by default)"""
+
+    # Error code of "Transaction numbers are only allowed on a replica set member or mongos"
+    NO_TRANSACTIONS_CODE = 20
+
+    def __init__(self, db=None):
+        self.db = db if db is not None else get_database()
+        # Cleared the first time the server turns out to be a standalone mongod
+        self.transactions = True
+
+    @staticmethod
+    def _projection(fields: List[str]) -> Dict[str, int]:
+        return dict({field: 1 for field in fields}, _id=0)
+
+    def ensure_schema(self):
+        # Indexes that existing data prevents (e.g. duplicate dustbin IDs) are logged and skipped,
+        # so the apps still start; `python schema.py` reports them as errors
+        schema.ensure_indexes(db=self.db, strict=False)
+
+    def dustbins(self, statuses=None):
+        query = {"status": {"$in": list(statuses)}} if statuses else {}
+        return list(self.db[DUSTBINS].find(query, self._projection(DUSTBIN_FIELDS)))
+
+    def uncollected_notifications(self):
+        return list(self.db[NOTIFICATION].find({"isCollected": False}, self._projection(NOTIFICATION_FIELDS)))
+
+    def users_with_uncollected_bins(self):
+        pipeline = [
+            {"$match": {"isCollected": False}},
+            {"$group": {"_id": "$dustbin_id"}},
+            {"$lookup": {"from": USER_ACCOUNT, "localField": "_id", "foreignField": "dustbin_id",
+                         "pipeline": [{"$project": self._projection(USER_FIELDS)}], "as": "user"}},
+            {"$unwind": "$user"},
+            {"$replaceRoot": {"newRoot": "$user"}},
+            {"$sort": {"owner_name": 1}},
+        ]
+        return list(self.db[NOTIFICATION].aggregate(pipeline))
+
+    def rubbish_types(self):
+        return list(self.db[RUBBISH].find({}, self._projection(RUBBISH_FIELDS)))
+
+    def collection_history(self, page, page_size):
+        cursor = (self.db[COLLECT_RUBBISH]
+                  .find({}, self._projection(COLLECTION_FIELDS))
+                  .sort("timestamp", DESCENDING)
+                  .skip(page * page_size)
+                  .limit(page_size))
+        return list(cursor)
+
+    def count_collection_history(self):
+        return self.db[COLLECT_RUBBISH].estimated_document_count()
+
+    def totals(self, scope, limit=0):
+        sort = [("rubbish_type", 1)] if scope == "type" else [("weight", -1)]
+        cursor = self.db[COLLECTION_STATS].find({"scope": scope}, self._projection(TOTAL_FIELDS[scope]))
+        return list(cursor.sort(sort).limit(limit))
+
+    def period_totals(self, unit, since=None):
+        query = {"scope": unit}
+        if since:
+            query["period"] = {"$gte": rollups.period_start(since, unit)}
+        cursor = self.db[COLLECTION_STATS].find(query, self._projection(PERIOD_FIELDS))
+        return list(cursor.sort([("period", 1), ("rubbish_type", 1)]))
+
+    def get_dustbin(self, dustbin_id):
+        return self.db[DUSTBINS].find_one({"dustbin_id": dustbin_id}, {"_id": 0})
+
+    def get_user_account(self, dustbin_id):
+        return self.db[USER_ACCOUNT].find_one({"dustbin_id": dustbin_id}, {"_id": 0})
+
+    def add_dustbin(self, dustbin_id, location, status):
+        dustbins = self.db[DUSTBINS]
+        if dustbins.find_one({"$or": [{"dustbin_id": dustbin_id}, {"location": location}]}, {"_id": 1}):
+            return False
+        dustbins.insert_one({"dustbin_id": dustbin_id, "status": status, "location": location,
+                             "updated_at": datetime.datetime.utcnow()})
+        return True
+
+    def update_prices(self, prices):
+        if prices:
+            self.db[RUBBISH].bulk_write([UpdateOne({"type": rubbish_type}, {"$set": {"price": price}})
+                                         for rubbish_type, price in prices.items()], ordered=False)
+
+    def place_collection_order(self, dustbin_id, name, phone, email, address):
+        db = self.db
+        current_time = datetime.datetime.utcnow()
+
+        if db[DUSTBINS].find_one({'dustbin_id': dustbin_id}, {"_id": 1}):
+            # Update status to "Full"
+            db[DUSTBINS].update_one(
+                {'dustbin_id': dustbin_id},
+                {'$set': {'status': 'Full', 'timeUpdate': current_time, 'location': address,
+                          'updated_at': current_time}}
+            )
+            db[USER_ACCOUNT].update_one(
+                {'dustbin_id': dustbin_id},
+                {'$set': {'owner_name': name, 'location': address, 'email': email, 'phone': phone}}
+            )
+        else:
+            # Create new dustbin entry
+            db[DUSTBINS].insert_one({
+                'dustbin_id': dustbin_id,
+                'status': 'Full',
+                'location': address,
+                'timeUpdate': current_time,
+                'type': 'recycle',
+                'updated_at': current_time
+            })
+            db[USER_ACCOUNT].insert_one({
+                'owner_name': name,
+                'dustbin_id': dustbin_id,
+                'location': address,
+                'total_reward': 0,
+                'email': email,
+                'phone': phone
+            })
+
+        db[NOTIFICATION].insert_one({
+            'dustbin_id': dustbin_id,
+            'location': address,
+            'timestamp': current_time,
+            'notification_type': 'call',
+            'isCollected': False,
+            'updated_at': current_time
+        })
+
+    def settle_reward(self, owner_name, total_value, chart_data):
+        """
+        Everything runs in one transaction (requires a replica set, e.g. Atlas): the reward
+        is added with an atomic $inc, so concurrent settlements never overwrite each other,
+        and the collection records are written with a single insert_many. The transaction
+        is retried on transient errors such as write conflicts.
+
+        A standalone mongod rejects transactions before anything is written; settlements
+        then run the same steps without one. The reward stays an atomic $inc, but a failure
+        part way can leave the notification, bin or rollups out of step with it.
+        """
+        db = self.db
+
+        def settle(session) -> Optional[float]:
+            # Step 1: Add the reward atomically and read back the owner's dustbin and new total
+            user_doc = db[USER_ACCOUNT].find_one_and_update(
+                {"owner_name": owner_name},
+                {"$inc": {"total_reward": total_value}},
+                projection={"_id": 0, "dustbin_id": 1, "total_reward": 1},
+                return_document=ReturnDocument.AFTER,
+                session=session
+            )
+            if not user_doc:
+                return None
+
+            # Step 2: Close the notification and empty the bin
+            updated_at = datetime.datetime.utcnow()
+            db[NOTIFICATION].update_one(
+                {"dustbin_id": user_doc["dustbin_id"], "isCollected": False},
+                {"$set": {"isCollected": True, "updated_at": updated_at}},
+                session=session
+            )
+            db[DUSTBINS].update_one({"dustbin_id": user_doc["dustbin_id"]},
+                                    {"$set": {"status": 'Empty', "updated_at": updated_at}}, session=session)
+
+            # Step 3: Log the collected rubbish and update the rollups in bulk
+            records = collection_records(user_doc["dustbin_id"], chart_data, datetime.datetime.now())
+            if records:
+                db[COLLECT_RUBBISH].insert_many(records, session=session)
+                rollups.apply_rollups(records, session=session, db=db)
+            return user_doc["total_reward"]
+
+        if self.transactions:
+            try:
+                with db.client.start_session() as session:
+                    return session.with_transaction(settle, read_preference=ReadPreference.PRIMARY)
+            except OperationFailure as e:
+                if e.code != self.NO_TRANSACTIONS_CODE:
+                    raise
+                logger.warning("MongoDB deployment does not support transactions; "
+                               "settling rewards without them")
+                self.transactions = False
+        return settle(None)
+
+    def rebuild_rollups(self):
+        return rollups.backfill(db=self.db)
+
+    def load_statuses(self):
+        return {doc["dustbin_id"]: doc.get("status")
+                for doc in self.db[DUSTBINS].find({}, {"_id": 0, "dustbin_id": 1, "status": 1})}
+
+    def upsert_bin_statuses(self, events, location, bin_type):
+        dustbin_ops, notification_ops = [], []
+        updated_at = datetime.datetime.utcnow()
+        for event in events:
+            dustbin_ops.append(UpdateOne(
+                {"dustbin_id": event.dustbin_id},
+                {"$set": {"status": event.status, "updated_at": updated_at},
+                 "$setOnInsert": {"location": location, "timestamp": event.timestamp, "type": bin_type}},
+                upsert=True
+            ))
+            notification_ops.append(UpdateOne(
+                {"dustbin_id": event.dustbin_id},
+                {"$set": {"timestamp": event.timestamp, "notification_type": "signal", "isCollected": False,
+                          "updated_at": updated_at},
+                 "$setOnInsert": {"location": location}},
+                upsert=True
+            ))
+        if not dustbin_ops:
+            return 0
+        self.db[DUSTBINS].bulk_write(dustbin_ops, ordered=False)
+        self.db[NOTIFICATION].bulk_write(notification_ops, ordered=False)
+        return len(dustbin_ops) + len(notification_ops)
+
+    def change_feed(self, poll_seconds=1.0):
+        """Change streams where the deployment supports them (replica sets), else timestamp polling."""
+        try:
+            return MongoChangeStreamFeed(self.db)
+        except OperationFailure as e:
+            # Standalone servers reject $changeStream
+            return MongoPollingFeed(self.db, poll_seconds, reason=str(e))
+
+
+def _mongo_snapshot(db) -> Dict[str, Dict[str, Dict]]:
+    """LIVE_FIELDS of all dustbins and open notifications, keyed by _id"""
+    def projection(collection):
+        return {field: 1 for field in LIVE_FIELDS[collection]}
+    return {
+        DUSTBINS: {str(doc.pop("_id")): doc for doc in db[DUSTBINS].find({}, projection(DUSTBINS))},
+        NOTIFICATION: {str(doc.pop("_id")): doc
+                       for doc in db[NOTIFICATION].find({"isCollected": False}, projection(NOTIFICATION))},
+    }
+
+
+class MongoChangeStreamFeed:
+    """
+    Follows a database change stream filtered to dustbins and notifications.
+
+    The stream is opened before the snapshot is read, so no change falls between the
+    two; changes made while the snapshot is read are delivered again, which is harmless.
+    Only the LIVE_FIELDS of each full document travel back.
+    """
+
+    mode = "change stream"
+
+    def __init__(self, db, max_await_ms: int = 500):
+        self.db = db
+        fields = sorted(set(LIVE_FIELDS[DUSTBINS]) | set(LIVE_FIELDS[NOTIFICATION]))
+        pipeline = [
+            {"$match": {"ns.coll": {"$in": [DUSTBINS, NOTIFICATION]}}},
+            {"$project": dict({"operationType": 1, "ns": 1, "documentKey": 1},
+                              **{f"fullDocument.{field}": 1 for field in fields})},
+        ]
+        self.stream = db.watch(pipeline, full_document="updateLookup", max_await_time_ms=max_await_ms)
+
+    def snapshot(self):
+        return _mongo_snapshot(self.db)
+
+    def poll(self, timeout: float) -> List[Change]:
+        deadline = time.monotonic() + timeout
+        changes = []
+        while len(changes) < CHANGE_BATCH_SIZE:
+            event = self.stream.try_next()
+            if event is None:
+                if changes or time.monotonic() >= deadline:
+                    break
+                continue
+            operation = event["operationType"]
+            if operation in ("drop", "rename", "dropDatabase", "invalidate"):
+                raise ChangeFeedLost(f"Change stream {operation}")
+            collection = event["ns"]["coll"]
+            if collection not in LIVE_FIELDS:
+                continue
+            # fullDocument is missing for deletes, and None if the document is gone by lookup time
+            changes.append((collection, str(event["documentKey"]["_id"]), event.get("fullDocument")))
+        return changes
+
+    def close(self):
+        self.stream.close()
+
+
+class MongoPollingFeed:
+    """
+    Polls dustbins and notifications by their updated_at stamp, for servers without change streams.
+
+    Each collection is paged through with an (updated_at, _id) cursor on the
+    updated_at_id index, so every changed document is read once however many change
+    per interval; while a page comes back full the next poll does not wait. Only
+    writes made through MongoStore set updated_at, and deletes are not seen; both are
+    picked up by the periodic resync of the view.
+    """
+
+    mode = "timestamp polling"
+
+    def __init__(self, db, poll_seconds: float = 1.0, reason: str = ""):
+        self.db = db
+        self.poll_seconds = poll_seconds
+        self.reason = reason
+        self._behind = False
+        self._reset_cursors()
+
+    def _reset_cursors(self):
+        # (updated_at, _id) of the last document read; no _id until the first page
+        start = datetime.datetime.utcnow() - datetime.timedelta(seconds=POLL_SETTLE_SECONDS)
+        self.cursors = {collection: (start, None) for collection in LIVE_FIELDS}
+
+    def snapshot(self):
+        self._reset_cursors()
+        return _mongo_snapshot(self.db)
+
+    def poll(self, timeout: float) -> List[Change]:
+        if not self._behind:
+            time.sleep(min(timeout, self.poll_seconds))
+        settled = datetime.datetime.utcnow() - datetime.timedelta(seconds=POLL_SETTLE_SECONDS)
+        changes, self._behind = [], False
+        for collection, fields in LIVE_FIELDS.items():
+            updated_at, last_id = self.cursors[collection]
+            if last_id is None:
+                query = {"updated_at": {"$gte": updated_at, "$lte": settled}}
+            else:
+                query = {"updated_at": {"$lte": settled},
+                         "$or": [{"updated_at": {"$gt": updated_at}},
+                                 {"updated_at": updated_at, "_id": {"$gt": last_id}}]}
+            projection = dict({field: 1 for field in fields}, updated_at=1)
+            docs = list(self.db[collection].find(query, projection)
+                        .sort([("updated_at", 1), ("_id", 1)]).limit(CHANGE_BATCH_SIZE))
+            if docs:
+                self.cursors[collection] = (docs[-1]["updated_at"], docs[-1]["_id"])
+                self._behind = self._behind or len(docs) == CHANGE_BATCH_SIZE
+            for doc in docs:
+                doc.pop("updated_at")
+                changes.append((collection, str(doc.pop("_id")), doc))
+        return changes
+
+    def close(self):
+        pass
+
+
+# SQLite schema mirroring the Mongo collections (same table and field names). Timestamps
+# are ISO-8601 text, which sorts chronologically.
+SQLITE_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS {DUSTBINS} (
+    dustbin_id TEXT PRIMARY KEY,
+    status TEXT,
+    location TEXT,
+    type TEXT,
+    timestamp TEXT,
+    timeUpdate TEXT
+);
+CREATE INDEX IF NOT EXISTS {DUSTBINS}_location ON {DUSTBINS} (location);
+CREATE INDEX IF NOT EXISTS {DUSTBINS}_status ON {DUSTBINS} (status);
+
+CREATE TABLE IF NOT EXISTS {NOTIFICATION} (
+    id INTEGER PRIMARY KEY,
+    dustbin_id TEXT NOT NULL,
+    location TEXT,
+    timestamp TEXT,
+    notification_type TEXT,
+    isCollected INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS {NOTIFICATION}_dustbin_id_isCollected ON {NOTIFICATION} (dustbin_id, isCollected);
+CREATE INDEX IF NOT EXISTS {NOTIFICATION}_isCollected_dustbin_id ON {NOTIFICATION} (isCollected, dustbin_id);
+
+CREATE TABLE IF NOT EXISTS {USER_ACCOUNT} (
+    id INTEGER PRIMARY KEY,
+    owner_name TEXT,
+    dustbin_id TEXT,
+    location TEXT,
+    total_reward REAL NOT NULL DEFAULT 0,
+    email TEXT,
+    phone TEXT
+);
+CREATE INDEX IF NOT EXISTS {USER_ACCOUNT}_dustbin_id ON {USER_ACCOUNT} (dustbin_id);
+CREATE INDEX IF NOT EXISTS {USER_ACCOUNT}_owner_name ON {USER_ACCOUNT} (owner_name);
+
+CREATE TABLE IF NOT EXISTS {COLLECT_RUBBISH} (
+    id INTEGER PRIMARY KEY,
+    dustbin_id TEXT,
+    timestamp TEXT,
+    rubbish_type TEXT,
+    weight REAL,
+    price REAL
+);
+CREATE INDEX IF NOT EXISTS {COLLECT_RUBBISH}_timestamp ON {COLLECT_RUBBISH} (timestamp DESC);
+CREATE INDEX IF NOT EXISTS {COLLECT_RUBBISH}_dustbin_id_timestamp ON {COLLECT_RUBBISH} (dustbin_id, timestamp DESC);
+
+CREATE TABLE IF NOT EXISTS {RUBBISH} (
+    type TEXT PRIMARY KEY,
+    price REAL
+);
+
+CREATE TABLE IF NOT EXISTS {COLLECTION_STATS} (
+    bucket_id TEXT PRIMARY KEY,
+    scope TEXT NOT NULL,
+    rubbish_type TEXT,
+    dustbin_id TEXT,
+    period TEXT,
+    weight REAL NOT NULL DEFAULT 0,
+    value REAL NOT NULL DEFAULT 0,
+    records INTEGER NOT NULL DEFAULT 0,
+    last_collected TEXT
+);
+CREATE INDEX IF NOT EXISTS {COLLECTION_STATS}_scope_period ON {COLLECTION_STATS} (scope, period);
+CREATE INDEX IF NOT EXISTS {COLLECTION_STATS}_scope_weight ON {COLLECTION_STATS} (scope, weight DESC);
+
+-- Change log of dustbins and notifications, filled by triggers and followed by the live
+-- dashboard. Every 1000th entry trims it to the last {CHANGE_LOG_RETAIN}.
+CREATE TABLE IF NOT EXISTS changeLog (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    collection TEXT NOT NULL,
+    doc_key TEXT NOT NULL
+);
+CREATE TRIGGER IF NOT EXISTS changeLog_trim AFTER INSERT ON changeLog WHEN new.seq % 1000 = 0
+BEGIN DELETE FROM changeLog WHERE seq <= new.seq - {CHANGE_LOG_RETAIN}; END;
+"""
+SQLITE_SCHEMA += "".join(
+    f"CREATE TRIGGER IF NOT EXISTS {table}_{op.lower()}_log AFTER {op} ON {table} "
+    f"BEGIN INSERT INTO changeLog (collection, doc_key) VALUES ('{table}', {row}.{key}); END;\n"
+    for table, key in ((DUSTBINS, "dustbin_id"), (NOTIFICATION, "id"))
+    for op, row in (("INSERT", "new"), ("UPDATE", "new"), ("DELETE", "old"))
+)
+
+# Columns holding timestamps, converted back to datetime on read
+_TIMESTAMP_COLUMNS = ("timestamp", "timeUpdate", "period", "last_collected")
+
+
+def _to_text(value: Optional[datetime.datetime]) -> Optional[str]:
+    return value.isoformat(sep=" ") if value is not None else None
+
+
+def _row(row: sqlite3.Row) -> Dict:
+    doc = dict(row)
+    for column in _TIMESTAMP_COLUMNS:
+        if doc.get(column):
+            doc[column] = datetime.datetime.fromisoformat(doc[column])
+    if "isCollected" in doc:
+        doc["isCollected"] = bool(doc["isCollected"])
+    return doc
+
+
+class SQLiteStore(Store):
+    """
+    Store on an embedded SQLite database, for edge deployments and tests without a network.
+
+    Each thread gets its own connection (sqlite3 connections are not shareable across
+    threads); all use WAL mode so dashboard reads never block on the ingestion writer.
+    Queries are constant parameterized SQL, so sqlite3's per-connection statement
+    cache prepares each one once. Multi-row writes run as one IMMEDIATE transaction
+    with executemany.
+    """
+
+    def __init__(self, path: str = SQLITE_PATH, busy_timeout_ms: int = 5000):
+        self.path = path
+        self.busy_timeout_ms = busy_timeout_ms
+        self._local = threading.local()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            # Autocommit mode; write transactions are opened explicitly in _transaction
+            connection = sqlite3.connect(self.path, isolation_level=None, cached_statements=256)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(f"PRAGMA busy_timeout={self.busy_timeout_ms}")
+            self._local.connection = connection
+        return connection
+
+    @contextmanager
+    def _transaction(self):
+        """One write transaction; IMMEDIATE takes the write lock up front so it cannot deadlock on upgrade"""
+        connection = self.connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    def _query(self, sql: str, params=()) -> List[Dict]:
+        return [_row(row) for row in self.connection.execute(sql, params)]
+
+    def _query_one(self, sql: str, params=()) -> Optional[Dict]:
+        row = self.connection.execute(sql, params).fetchone()
+        return _row(row) if row is not None else None
+
+    def ensure_schema(self):
+        self.connection.executescript(SQLITE_SCHEMA)
+
+    def dustbins(self, statuses=None):
+        columns = ", ".join(DUSTBIN_FIELDS)
+        if not statuses:
+            return self._query(f"SELECT {columns} FROM {DUSTBINS}")
+        placeholders = ", ".join("?" * len(statuses))
+        return self._query(f"SELECT {columns} FROM {DUSTBINS} WHERE status IN ({placeholders})", list(statuses))
+
+    def uncollected_notifications(self):
+        return self._query(f"SELECT {', '.join(NOTIFICATION_FIELDS)} FROM {NOTIFICATION} WHERE isCollected = 0")
+
+    def users_with_uncollected_bins(self):
+        return self._query(
+            f"SELECT u.owner_name, u.dustbin_id FROM {USER_ACCOUNT} u "
+            f"WHERE u.dustbin_id IN (SELECT dustbin_id FROM {NOTIFICATION} WHERE isCollected = 0) "
+            f"ORDER BY u.owner_name"
+        )
+
+    def rubbish_types(self):
+        return self._query(f"SELECT type, price FROM {RUBBISH}")
+
+    def collection_history(self, page, page_size):
+        return self._query(
+            f"SELECT {', '.join(COLLECTION_FIELDS)} FROM {COLLECT_RUBBISH} ORDER BY timestamp DESC LIMIT ? OFFSET ?",
+            (page_size, page * page_size)
+        )
+
+    def count_collection_history(self):
+        return self.connection.execute(f"SELECT COUNT(*) FROM {COLLECT_RUBBISH}").fetchone()[0]
+
+    def totals(self, scope, limit=0):
+        order = "rubbish_type" if scope == "type" else "weight DESC"
+        return self._query(
+            f"SELECT {', '.join(TOTAL_FIELDS[scope])} FROM {COLLECTION_STATS} WHERE scope = ? ORDER BY {order} LIMIT ?",
+            (scope, limit or -1)
+        )
+
+    def period_totals(self, unit, since=None):
+        start = _to_text(rollups.period_start(since, unit)) if since else ""
+        return self._query(
+            f"SELECT {', '.join(PERIOD_FIELDS)} FROM {COLLECTION_STATS} "
+            f"WHERE scope = ? AND period >= ? ORDER BY period, rubbish_type",
+            (unit, start)
+        )
+
+    def get_dustbin(self, dustbin_id):
+        return self._query_one(f"SELECT * FROM {DUSTBINS} WHERE dustbin_id = ?", (dustbin_id,))
+
+    def get_user_account(self, dustbin_id):
+        doc = self._query_one(f"SELECT * FROM {USER_ACCOUNT} WHERE dustbin_id = ? LIMIT 1", (dustbin_id,))
+        if doc is not None:
+            doc.pop("id")
+        return doc
+
+    def add_dustbin(self, dustbin_id, location, status):
+        with self._transaction() as connection:
+            if connection.execute(f"SELECT 1 FROM {DUSTBINS} WHERE dustbin_id = ? OR location = ? LIMIT 1",
+                                  (dustbin_id, location)).fetchone():
+                return False
+            connection.execute(f"INSERT INTO {DUSTBINS} (dustbin_id, status, location) VALUES (?, ?, ?)",
+                               (dustbin_id, status, location))
+        return True
+
+    def update_prices(self, prices):
+        with self._transaction() as connection:
+            connection.executemany(f"UPDATE {RUBBISH} SET price = ? WHERE type = ?",
+                                   [(price, rubbish_type) for rubbish_type, price in prices.items()])
+
+    def place_collection_order(self, dustbin_id, name, phone, email, address):
+        current_time = _to_text(datetime.datetime.utcnow())
+        with self._transaction() as connection:
+            if connection.execute(f"SELECT 1 FROM {DUSTBINS} WHERE dustbin_id = ?", (dustbin_id,)).fetchone():
+                connection.execute(f"UPDATE {DUSTBINS} SET status = 'Full', timeUpdate = ?, location = ? "
+                                   f"WHERE dustbin_id = ?", (current_time, address, dustbin_id))
+                connection.execute(f"UPDATE {USER_ACCOUNT} SET owner_name = ?, location = ?, email = ?, phone = ? "
+                                   f"WHERE dustbin_id = ?", (name, address, email, phone, dustbin_id))
+            else:
+                connection.execute(f"INSERT INTO {DUSTBINS} (dustbin_id, status, location, timeUpdate, type) "
+                                   f"VALUES (?, 'Full', ?, ?, 'recycle')", (dustbin_id, address, current_time))
+                connection.execute(f"INSERT INTO {USER_ACCOUNT} (owner_name, dustbin_id, location, total_reward, "
+                                   f"email, phone) VALUES (?, ?, ?, 0, ?, ?)",
+                                   (name, dustbin_id, address, email, phone))
+            connection.execute(f"INSERT INTO {NOTIFICATION} (dustbin_id, location, timestamp, notification_type, "
+                               f"isCollected) VALUES (?, ?, ?, 'call', 0)", (dustbin_id, address, current_time))
+
+    def settle_reward(self, owner_name, total_value, chart_data):
+        """One IMMEDIATE transaction: concurrent settlements are serialized by SQLite's write lock."""
+        with self._transaction() as connection:
+            user = connection.execute(
+                f"UPDATE {USER_ACCOUNT} SET total_reward = total_reward + ? "
+                f"WHERE id = (SELECT id FROM {USER_ACCOUNT} WHERE owner_name = ? LIMIT 1) "
+                f"RETURNING dustbin_id, total_reward",
+                (total_value, owner_name)
+            ).fetchone()
+            if user is None:
+                return None
+            dustbin_id, new_reward = user
+            connection.execute(
+                f"UPDATE {NOTIFICATION} SET isCollected = 1 WHERE id = "
+                f"(SELECT id FROM {NOTIFICATION} WHERE dustbin_id = ? AND isCollected = 0 LIMIT 1)",
+                (dustbin_id,)
+            )
+            connection.execute(f"UPDATE {DUSTBINS} SET status = 'Empty' WHERE dustbin_id = ?", (dustbin_id,))
+
+            records = collection_records(dustbin_id, chart_data, datetime.datetime.now())
+            connection.executemany(
+                f"INSERT INTO {COLLECT_RUBBISH} (dustbin_id, timestamp, rubbish_type, weight, price) "
+                f"VALUES (?, ?, ?, ?, ?)",
+                [(r["dustbin_id"], _to_text(r["timestamp"]), r["rubbish_type"], r["weight"], r["price"])
+                 for r in records]
+            )
+            self._add_to_rollups(connection, rollups.rollup_buckets(records))
+        return new_reward
+
+    @staticmethod
+    def _add_to_rollups(connection: sqlite3.Connection, buckets: Dict[str, Dict]):
+        """Add pre-summed buckets (see rollups.rollup_buckets) to the statistics table"""
+        connection.executemany(
+            f"INSERT INTO {COLLECTION_STATS} (bucket_id, scope, rubbish_type, dustbin_id, period, weight, value, "
+            f"records, last_collected) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            f"ON CONFLICT (bucket_id) DO UPDATE SET weight = weight + excluded.weight, "
+            f"value = value + excluded.value, records = records + excluded.records, "
+            f"last_collected = max(last_collected, excluded.last_collected)",
+            [(bucket_id, b["fields"]["scope"], b["fields"].get("rubbish_type"), b["fields"].get("dustbin_id"),
+              _to_text(b["fields"].get("period")), b["weight"], b["value"], b["records"],
+              _to_text(b["last_collected"]))
+             for bucket_id, b in buckets.items()]
+        )
+
+    def rebuild_rollups(self):
+        """Sums are streamed over collectRubbish in one transaction, so settlements wait rather than race."""
+        with self._transaction() as connection:
+            connection.execute(f"DELETE FROM {COLLECTION_STATS}")
+            records = (_row(row) for row in connection.execute(
+                f"SELECT dustbin_id, timestamp, rubbish_type, weight, price FROM {COLLECT_RUBBISH}"))
+            buckets = rollups.rollup_buckets(records)
+            self._add_to_rollups(connection, buckets)
+        return len(buckets)
+
+    def load_statuses(self):
+        return {row[0]: row[1] for row in self.connection.execute(f"SELECT dustbin_id, status FROM {DUSTBINS}")}
+
+    def upsert_bin_statuses(self, events, location, bin_type):
+        events = list(events)
+        if not events:
+            return 0
+        with self._transaction() as connection:
+            connection.executemany(
+                f"INSERT INTO {DUSTBINS} (dustbin_id, status, location, timestamp, type) VALUES (?, ?, ?, ?, ?) "
+                f"ON CONFLICT (dustbin_id) DO UPDATE SET status = excluded.status",
+                [(e.dustbin_id, e.status, location, _to_text(e.timestamp), bin_type) for e in events]
+            )
+            # Refresh the bin's notification, or create it (matches the Mongo upsert on dustbin_id)
+            missing = []
+            for event in events:
+                cursor = connection.execute(
+                    f"UPDATE {NOTIFICATION} SET timestamp = ?, notification_type = 'signal', isCollected = 0 "
+                    f"WHERE id = (SELECT id FROM {NOTIFICATION} WHERE dustbin_id = ? LIMIT 1)",
+                    (_to_text(event.timestamp), event.dustbin_id)
+                )
+                if cursor.rowcount == 0:
+                    missing.append((event.dustbin_id, location, _to_text(event.timestamp)))
+            connection.executemany(
+                f"INSERT INTO {NOTIFICATION} (dustbin_id, location, timestamp, notification_type, isCollected) "
+                f"VALUES (?, ?, ?, 'signal', 0)", missing
+            )
+        return 2 * len(events)
+
+    def change_feed(self, poll_seconds=1.0):
+        return SQLiteChangeFeed(self, poll_seconds)
+
+
+class SQLiteChangeFeed:
+    """
+    Polls the trigger-maintained change log by sequence number.
+
+    Each poll is an indexed range read of the log plus a primary key lookup of the
+    changed rows, so its cost depends on the number of changes, not on table size.
+    """
+
+    mode = "change log polling"
+
+    def __init__(self, store: SQLiteStore, poll_seconds: float = 1.0):
+        self.store = store
+        self.poll_seconds = poll_seconds
+        self.position = 0
+
+    def snapshot(self):
+        connection = self.store.connection
+        dustbin_columns = ", ".join(LIVE_FIELDS[DUSTBINS])
+        notification_columns = ", ".join(LIVE_FIELDS[NOTIFICATION])
+        # One read transaction, so the position matches the rows read
+        connection.execute("BEGIN")
+        try:
+            self.position = connection.execute("SELECT COALESCE(MAX(seq), 0) FROM changeLog").fetchone()[0]
+            snapshot = {
+                DUSTBINS: {row["dustbin_id"]: _row(row)
+                           for row in connection.execute(f"SELECT {dustbin_columns} FROM {DUSTBINS}")},
+                NOTIFICATION: {str(row["id"]): _row(row) for row in connection.execute(
+                    f"SELECT id, {notification_columns} FROM {NOTIFICATION} WHERE isCollected = 0")},
+            }
+        finally:
+            connection.execute("COMMIT")
+        for doc in snapshot[NOTIFICATION].values():
+            doc.pop("id")
+        return snapshot
+
+    def _fetch(self, collection: str, keys: List[str]) -> Dict[str, Dict]:
+        key_column = "dustbin_id" if collection == DUSTBINS else "id"
+        placeholders = ", ".join("?" * len(keys))
+        rows = self.store.connection.execute(
+            f"SELECT {key_column} AS doc_key, {', '.join(LIVE_FIELDS[collection])} FROM {collection} "
+            f"WHERE {key_column} IN ({placeholders})", keys
+        )
+        docs = {}
+        for row in rows:
+            doc = _row(row)
+            docs[str(doc.pop("doc_key"))] = doc
+        return docs
+
+    def poll(self, timeout: float) -> List[Change]:
+        connection = self.store.connection
+        deadline = time.monotonic() + timeout
+        while True:
+            log = connection.execute("SELECT seq, collection, doc_key FROM changeLog WHERE seq > ? ORDER BY seq "
+                                     "LIMIT ?", (self.position, CHANGE_BATCH_SIZE)).fetchall()
+            if log or time.monotonic() >= deadline:
+                break
+            time.sleep(max(0.0, min(self.poll_seconds, deadline - time.monotonic())))
+        if not log:
+            return []
+        if log[0][0] > self.position + 1:
+            oldest = connection.execute("SELECT MIN(seq) FROM changeLog").fetchone()[0]
+            if oldest > self.position + 1:
+                raise ChangeFeedLost(f"Change log trimmed past position {self.position}")
+        self.position = log[-1][0]
+
+        # Latest state of each changed row, once per row
+        keys: Dict[str, Dict[str, None]] = {DUSTBINS: {}, NOTIFICATION: {}}
+        for _, collection, doc_key in log:
+            keys[collection][str(doc_key)] = None
+        changes = []
+        for collection, collection_keys in keys.items():
+            if collection_keys:
+                docs = self._fetch(collection, list(collection_keys))
+                changes += [(collection, key, docs.get(key)) for key in collection_keys]
+        return changes
+
+    def close(self):
+        pass
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store(kind: Optional[str] = None) -> Store:
+    """
+    Return the process-wide store, creating it (and its schema) on first use.
+
+    :param kind: "mongo" or "sqlite"; defaults to the SMARTBIN_STORE environment variable.
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                kind = kind or STORE_KIND
+                if kind not in SUPPORTED_STORES:
+                    raise ValueError(f"Unsupported store: {kind}. Available: {SUPPORTED_STORES}")
+                store = MongoStore() if kind == "mongo" else SQLiteStore()
+                store.ensure_schema()
+                _store = store
+    return _store
+
+
+class _BenchEvent:
+    __slots__ = ("dustbin_id", "status", "timestamp")
+
+    def __init__(self, dustbin_id: str, status: str):
+        self.dustbin_id, self.status, self.timestamp = dustbin_id, status, datetime.datetime.now()
+
+
+def benchmark(store: Store, bins: int = 1000, batch_size: int = 200, settlements: int = 200,
+              reads: int = 50) -> Dict[str, float]:
+    """
+    Time the apps' hot operations against an empty store.
+
+    :return: Ingestion throughput and per-operation latencies in milliseconds.
+    """
+    store.ensure_schema()
+    statuses = ("Empty", "Half-full", "Low")
+    results = {}
+
+    start = time.perf_counter()
+    for round_ in range(3):
+        for offset in range(0, bins, batch_size):
+            store.upsert_bin_statuses([_BenchEvent(f"BENCH{i:06d}", statuses[(i + round_) % 3])
+                                       for i in range(offset, min(bins, offset + batch_size))], "Bench", "recycle")
+    results["ingest_events_per_sec"] = 3 * bins / (time.perf_counter() - start)
+
+    # New bins, so every order also creates the owner's account
+    for i in range(settlements):
+        store.place_collection_order(f"ORDER{i:06d}", f"owner{i}", "", "", f"Bench {i}")
+    chart_data = [{"Rubbish Type": t, "Weight (kg)": 1.5, "Value ($)": 0.75} for t in ("Plastic", "Paper", "Metal")]
+    start = time.perf_counter()
+    for i in range(settlements):
+        store.settle_reward(f"owner{i}", 2.25, chart_data)
+    results["settle_reward_ms"] = 1000 * (time.perf_counter() - start) / settlements
+
+    reads_to_time = {
+        "read_dustbins_ms": lambda: store.dustbins(["Low"]),
+        "read_uncollected_ms": store.uncollected_notifications,
+        "read_users_with_uncollected_ms": store.users_with_uncollected_bins,
+        "read_history_page_ms": lambda: store.collection_history(0, 50),
+        "read_totals_by_type_ms": lambda: store.totals("type"),
+        "read_period_totals_ms": lambda: store.period_totals("day"),
+        "get_dustbin_ms": lambda: store.get_dustbin("BENCH000001"),
+        "get_user_account_ms": lambda: store.get_user_account("ORDER000001"),
+    }
+    for name, read in reads_to_time.items():
+        start = time.perf_counter()
+        for _ in range(reads):
+            read()
+        results[name] = 1000 * (time.perf_counter() - start) / reads
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the smartbin storage backends against each other")
+    parser.add_argument("--stores", nargs="+", default=["sqlite"], choices=SUPPORTED_STORES)
+    parser.add_argument("--bins", type=int, default=1000)
+    parser.add_argument("--settlements", type=int, default=200)
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for kind in args.stores:
+        if kind == "sqlite":
+            # A scratch file, so the bundled database is not touched
+            with tempfile.TemporaryDirectory() as directory:
+                store = SQLiteStore(os.path.join(directory, "bench.db"))
+                results[kind] = benchmark(store, args.bins, settlements=args.settlements)
+                store.connection.close()
+        else:
+            # A scratch database on the configured server, dropped afterwards
+            client = get_client()
+            try:
+                results[kind] = benchmark(MongoStore(client["smartbin_bench"]), args.bins,
+                                          settlements=args.settlements)
+            finally:
+                client.drop_database("smartbin_bench")
+
+    report = {
+        "benchmark": "storage",
+        "environment": {"python": platform.python_version(), "sqlite": sqlite3.sqlite_version,
+                        "platform": platform.platform(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")},
+        "results": results,
+    }
+    print(json.dumps(report, indent=4))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+    return 0
+
+
+if __name__ == '__main__':
+    # Usage: python storage.py --stores sqlite mongo
+    sys.exit(main())